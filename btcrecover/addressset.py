@@ -25,15 +25,30 @@ import base64
 import io
 import mmap
 import ast
+import hashlib
 import itertools
 import sys
 import gc
 import glob
 import math
+import os
 from os import path
+import collections
+import multiprocessing
+import time
 from datetime import datetime
 import lib.bitcoinlib as bitcoinlib
 
+try:
+    import numpy
+except ImportError:
+    numpy = None  # AddressSet.contains_many() falls back to probing one address at a time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None  # (requires Python 3.8+) AddressSet.share() does nothing
+
 
 def supportedChains(magic):
     switcher = {
@@ -72,8 +87,9 @@ class AddressSet(object):
     MAGIC = b"seedrecover address database\r\n"  # file magic
     HEADER_LEN = 65536
     assert HEADER_LEN % mmap.ALLOCATIONGRANULARITY == 0
+    OPTIONAL_HEADER_ATTRS = ("last_fileoffset", "_updating")  # added later, so missing from older files
 
-    def __init__(self, table_len, bytes_per_addr=8, max_load=0.75):
+    def __init__(self, table_len, bytes_per_addr=8, max_load=0.75, quiet=False):
         """
         :param table_len: hash table size in count of addresses; must be a power of 2
         :type table_len: int
@@ -81,6 +97,8 @@ class AddressSet(object):
         :type bytes_per_addr: int
         :param max_load: max permissible load factor before an exception is raised
         :type max_load: float
+        :param quiet: True to never print a message when creating a large set
+        :type quiet: bool
         """
         if table_len < 1 or 1 << (table_len.bit_length() - 1) != table_len:
             raise ValueError("table_len must be a positive power of 2")
@@ -100,11 +118,16 @@ class AddressSet(object):
         self._dbfile = None  # file object, its .name is req'd for pickling
         self._mmap_access = None  # also required for pickling
         self.last_filenum = None  # will be serialized if set by the user
+        self.last_fileoffset = None  # where in block file last_filenum to resume (None for its beginning)
+        self._updating = False  # True while create_address_db() is updating the set in place, see fromfile()
+        self._filter = None  # an optional AddressFilter consulted before the table, see fromfile()
+        self._shm = None  # if set, a SharedMemory holding the table, see share()
+        self._shm_owner = False  # True if this object created _shm (and so must unlink it)
         if self._bytes_per_addr + self._hash_bytes > 20:
             raise ValueError("not enough bytes for both hashing and storage; "
                              "reduce either the bytes_per_addr or table_len")
 
-        if table_len > 1000:
+        if table_len > 1000 and not quiet:
             # only display this if we are creating an addressDB
             # Print Timestamp that this step occured
             print(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ": ", end="")
@@ -114,6 +137,13 @@ class AddressSet(object):
         # mmaps can't be pickled, so save only what's needed to recreate the object from scratch later
         if isinstance(self._data, mmap.mmap):
             return {"dbfilename": self._dbfile.name, "mmap_access": self._mmap_access}
+        # a table in shared memory is attached to by name instead of being copied
+        elif self._shm is not None:
+            state = self.__dict__.copy()
+            del state["_data"]
+            state["_shm"] = self._shm.name
+            state["_shm_owner"] = False
+            return state
         else:
             return self.__dict__
 
@@ -123,7 +153,13 @@ class AddressSet(object):
             new = self.fromfile(open(state["dbfilename"], "r+b" if state["mmap_access"] == mmap.ACCESS_WRITE else "rb"),
                                 mmap_access=state["mmap_access"], preload=False)
             self.__dict__ = new.__dict__.copy()
-            new._dbfile = new._data = None  # ensure new's __del__() doesn't close() anything
+            new._dbfile = new._data = new._filter = None  # ensure new's __del__() doesn't close() anything
+        elif isinstance(state.get("_shm"), str):
+            self.__dict__ = state
+            # Attaching registers the name with the resource tracker again, but multiprocessing workers
+            # share their parent's tracker, so this is a no-op; only the creator ever unlinks it
+            self._shm = shared_memory.SharedMemory(state["_shm"])
+            self._data = self._shm.buf[:self._table_bytes]
         else:
             self.__dict__ = state
 
@@ -131,6 +167,8 @@ class AddressSet(object):
         return self._len
 
     def __contains__(self, address):
+        if self._filter is not None and address not in self._filter:
+            return False
         return self._find(address) is True
 
     def add(self, address, textAddresses=False, addressType=None, coin=0):
@@ -182,6 +220,18 @@ class AddressSet(object):
             self._data[pos: pos + self._bytes_per_addr] = bytes_to_add
             self._len += 1
 
+    def add_many(self, addresses):
+        """Adds a batch of addresses to the set, with the same result as add()ing each in turn
+
+        :param addresses: the addresses in hash160 (length 20) format to add
+        :type addresses: list of bytes
+        """
+        # Addresses already in the set (typically many of them) are excluded all at once, which
+        # leaves the same insertions as add()ing each, in the same order, for the remainder
+        for address, found in zip(addresses, self.contains_many(addresses)):
+            if not found:
+                self.add(address)
+
     # Hash table with open addressing and linear probing:
     # The hash function is simply some of the address's least significant bits (since
     # most addresses are random hashes, this and linear probing should be sufficient).
@@ -208,6 +258,142 @@ class AddressSet(object):
             if pos >= self._table_bytes:
                 pos = 0
 
+    # The smallest batch for which contains_many() uses NumPy; below this, the fixed
+    # cost of setting up the arrays exceeds the cost of probing one at a time
+    CONTAINS_MANY_MIN_BATCH = 32
+    CONTAINS_MANY_PROBE_WINDOW = 16  # count of consecutive slots probed per address per step
+
+    def contains_many(self, addresses):
+        """Tests a batch of addresses for membership at once
+
+        :param addresses: the addresses in hash160 (length 20) format to test
+        :type addresses: list of bytes
+        :return: a list of bools, True for each address in the set
+        :rtype: list
+        """
+        addr_count = len(addresses)
+        key_len = self._bytes_per_addr + self._hash_bytes
+        if numpy is None or addr_count < self.CONTAINS_MANY_MIN_BATCH or self._hash_bytes > 8:
+            return [address in self for address in addresses]
+        try:
+            addresses_joined = b"".join(addresses)
+        except TypeError:  # (str addresses are only supported one at a time)
+            return [address in self for address in addresses]
+        addr_len = len(addresses_joined) // addr_count
+        if addr_len < key_len or any(len(address) != addr_len for address in addresses):
+            return [address in self for address in addresses]
+        #
+        # Split each address into the bytes used as its hash and the bytes stored in the table,
+        # viewing the latter (and the table itself, without copying it) as one opaque value per slot
+        slot_dtype = numpy.dtype((numpy.void, self._bytes_per_addr))
+        addrs = numpy.frombuffer(addresses_joined, numpy.uint8).reshape(addr_count, addr_len)
+        hashes = numpy.zeros(addr_count, numpy.uint64)
+        for col in range(addr_len - self._hash_bytes, addr_len):  # big-endian, as in bytes_to_int()
+            hashes <<= numpy.uint64(8)
+            hashes |= addrs[:, col]
+        hash_mask = numpy.uint64(self._hash_mask)
+        hashes &= hash_mask
+        stored_addrs = addrs[:, addr_len - key_len: addr_len - self._hash_bytes]
+        #
+        # If there's a filter, only those addresses which pass it need to be looked up in the table
+        if self._filter is not None:
+            pending = numpy.flatnonzero(self._filter._contains_keys(AddressFilter._keys(stored_addrs)))
+            stored_addrs = stored_addrs[pending]
+            hashes = hashes[pending]
+        else:
+            pending = numpy.arange(addr_count)
+        to_find = numpy.ascontiguousarray(stored_addrs).view(slot_dtype).ravel()
+        table = numpy.frombuffer(self._data, slot_dtype, self._dbLength)
+        null_addr = numpy.frombuffer(self._null_addr, slot_dtype)[0]
+        #
+        # Linear probing, as in _find(), of all the addresses not yet found nor ruled out at once, a window
+        # of slots at a time (an address is in the set if it's found before an empty slot is reached)
+        found = numpy.zeros(addr_count, bool)
+        window = numpy.arange(self.CONTAINS_MANY_PROBE_WINDOW, dtype=numpy.uint64)
+        while pending.size:
+            cur_addrs = table[(hashes[:, None] + window) & hash_mask]
+            is_null = cur_addrs == null_addr
+            is_match = cur_addrs == to_find[:, None]
+            has_null = is_null.any(axis=1)
+            has_match = is_match.any(axis=1)
+            is_found = has_match & (~has_null | (is_match.argmax(axis=1) < is_null.argmax(axis=1)))
+            found[pending[is_found]] = True
+            still_pending = ~(has_null | has_match)
+            pending = pending[still_pending]
+            to_find = to_find[still_pending]
+            hashes = hashes[still_pending] + numpy.uint64(self.CONTAINS_MANY_PROBE_WINDOW)
+        del table  # release the buffer so that an mmap can later be closed
+        return found.tolist()
+
+    def merge(self, other):
+        """Adds all the addresses in another set to this one in a single sequential pass over its table
+
+        Only bytes_per_addr bytes of each address are stored, and not the hash bytes which chose its
+        position, so the other set must store the same bytes (have the same bytes_per_addr and hash
+        bytes) and have a table at least as large as this one. This makes it possible to combine sets,
+        or to resize a set to a smaller table, but not to resize one to a larger table.
+
+        :param other: the set whose addresses are added
+        :type other: AddressSet
+        :return: the number of addresses added (those not found already in this set)
+        :rtype: int
+        """
+        if (other._bytes_per_addr, other._hash_bytes) != (self._bytes_per_addr, self._hash_bytes):
+            raise ValueError("can only merge sets with the same bytes_per_addr and hash bytes")
+        if other._dbLength < self._dbLength:
+            raise ValueError("can't merge a set into one with a larger table")
+        #
+        # An address in the other table at slot S was inserted at the first empty slot at or after its hash H,
+        # and every slot from H through S is occupied. Adding it here at the first empty slot at or after
+        # S & _hash_mask (instead of H & _hash_mask, which isn't known) keeps every slot from H through where
+        # it's added occupied, provided each cluster in the other table is added in order from its start.
+        first_slot = 0
+        while other._data[first_slot * other._bytes_per_addr:
+                          (first_slot + 1) * other._bytes_per_addr] != other._null_addr:
+            first_slot += 1
+        added = 0
+        for slot, address in other._occupied_slots(first_slot):
+            if self._add_stored(slot & self._hash_mask, address):
+                added += 1
+        return added
+
+    # Yields a (slot, stored bytes) tuple for each occupied slot in the table, in order
+    # starting with first_slot and wrapping around to the beginning of the table
+    def _occupied_slots(self, first_slot=0):
+        chunk_len = 1 << 20  # in slots
+        for start_slot, end_slot in (first_slot, self._dbLength), (0, first_slot):
+            for chunk_start in range(start_slot, end_slot, chunk_len):
+                chunk_end = min(chunk_start + chunk_len, end_slot)
+                chunk = self._data[chunk_start * self._bytes_per_addr: chunk_end * self._bytes_per_addr]
+                if numpy is None:
+                    slots = (i for i in range(chunk_end - chunk_start)
+                             if chunk[i * self._bytes_per_addr: (i + 1) * self._bytes_per_addr] != self._null_addr)
+                else:
+                    slots = numpy.flatnonzero(
+                        numpy.frombuffer(chunk, numpy.uint8).reshape(-1, self._bytes_per_addr).any(axis=1)).tolist()
+                for i in slots:
+                    yield chunk_start + i, chunk[i * self._bytes_per_addr: (i + 1) * self._bytes_per_addr]
+
+    # Adds the stored bytes of an address at the first empty slot at or after first_slot, unless they're found
+    # first (duplicates before first_slot aren't looked for, see merge()); returns True if they were added
+    def _add_stored(self, first_slot, stored_addr):
+        pos = first_slot * self._bytes_per_addr
+        while True:
+            cur_addr = self._data[pos: pos + self._bytes_per_addr]
+            if cur_addr == self._null_addr:
+                break
+            if cur_addr == stored_addr:
+                return False
+            pos += self._bytes_per_addr  # linear probing
+            if pos >= self._table_bytes:
+                pos = 0
+        if self._len >= self._max_len:
+            raise ValueError("too many addresses for a table of length {} (max_load exceeded)"
+                             .format(self._dbLength))
+        self._data[pos: pos + self._bytes_per_addr] = stored_addr
+        self._len += 1
+        return True
+
     def __iter__(self):
         """Iterates over the set returning the bytes_per_addr stored for each address
         """
@@ -226,9 +412,23 @@ class AddressSet(object):
                 yield cur_addr
             pos -= self._bytes_per_addr
 
+    def share(self):
+        """Moves the table of a set which isn't loaded from a file into shared memory, so that
+        pickled copies (e.g. those sent to multiprocessing workers) attach to it instead of copying it
+        """
+        if shared_memory is None or self._shm is not None:
+            return
+        if not isinstance(self._data, bytearray):
+            raise ValueError("only a set which isn't loaded from a file can be shared")
+        self._shm = shared_memory.SharedMemory(create=True, size=self._table_bytes)
+        self._shm_owner = True
+        self._shm.buf[:self._table_bytes] = self._data
+        self._data = self._shm.buf[:self._table_bytes]  # (the shared memory may be larger than requested)
+
     @staticmethod
     def _remove_nonheader_attribs(attrs):
-        del attrs["_data"], attrs["_dbfile"], attrs["_mmap_access"]
+        del attrs["_data"], attrs["_dbfile"], attrs["_mmap_access"], attrs["_filter"], attrs["_shm"], \
+            attrs["_shm_owner"]
 
     def _header(self):
         # Construct a 64K header with the file magic, this object's attributes, plus the version
@@ -297,8 +497,12 @@ class AddressSet(object):
         self = cls(1)  # (size is irrelevant since it's getting replaced)
         cls._remove_nonheader_attribs(self.__dict__)
         for attr in self.__dict__.keys():  # only load expected attributes from untrusted data
-            self.__dict__[attr] = config[attr]
+            if attr in config or attr not in cls.OPTIONAL_HEADER_ATTRS:
+                self.__dict__[attr] = config[attr]
         self._mmap_access = mmap_access
+        self._filter = None
+        self._shm = None
+        self._shm_owner = False
 
         # Try to create the AddressDB. If the addresset is sufficiently large (eg: BTC) then this requires 64
         # bit python and will crash if attempted with 32 bit Python...
@@ -318,6 +522,21 @@ class AddressSet(object):
             dbfile.close()
         self._dbfile = dbfile
         #
+        # If there's a companion filter built from this database (by create_address_db()), it answers
+        # most membership tests without touching the hash table, so only the filter is preloaded
+        filter_filename = dbfile.name + AddressFilter.FILE_SUFFIX if isinstance(dbfile.name, str) else None
+        if mmap_access == mmap.ACCESS_READ and filter_filename and path.isfile(filter_filename):
+            address_filter = AddressFilter.fromfile(open(filter_filename, "rb"), preload)
+            if (address_filter._len, address_filter._bytes_per_addr, address_filter._hash_bytes) == \
+                    (self._len, self._bytes_per_addr, self._hash_bytes):
+                self._filter = address_filter
+                preload = False
+            else:
+                print("AddressSet: warning: ignoring address filter '{}' which is out of date "
+                      "(recreate it with create-address-db.py --update --filter-fpr RATE)"
+                      .format(filter_filename), file=sys.stderr)
+                address_filter.close()
+        #
         # Most of the time it makes sense to load the file serially instead of letting
         # the OS load each page as it's touched in random order, especially with HDDs;
         # reading a byte from each page is sufficient (CPython doesn't optimize this away)
@@ -325,17 +544,58 @@ class AddressSet(object):
             for i in range(self._table_bytes // mmap.PAGESIZE):
                 self._data[i * mmap.PAGESIZE]
         #
+        # If an update was interrupted, addresses added after its last checkpoint may or may not have
+        # been saved to the table (although those that were are where they'd be if the update resumed
+        # from that checkpoint, so resuming is safe), but they're not in the saved count of addresses
+        if self._updating:
+            self._len = self._count()
+        #
         return self
 
+    # Counts the addresses in the table (without relying on _len)
+    def _count(self):
+        if numpy is None:
+            return sum(1 for addr in self)
+        count = 0
+        chunk_bytes = self._bytes_per_addr << 20
+        for chunk_start in range(0, self._table_bytes, chunk_bytes):
+            addrs = numpy.frombuffer(self._data, numpy.uint8, min(chunk_bytes, self._table_bytes - chunk_start),
+                                     chunk_start).reshape(-1, self._bytes_per_addr)
+            count += int(numpy.count_nonzero(addrs.any(axis=1)))
+        del addrs  # release the buffer so that an mmap can later be closed
+        return count
+
+    def checkpoint(self):
+        """Durably saves the changes made so far to a set loaded with mmap.ACCESS_WRITE, including its header
+        """
+        if not (self._dbfile and not self._dbfile.closed):
+            raise ValueError("must be loaded with mmap.ACCESS_WRITE to checkpoint")
+        self._data.flush()  # the table first, so that the header never describes changes which weren't saved
+        header_pos = self._dbfile.tell()
+        self._dbfile.write(self._header())
+        self._dbfile.flush()
+        os.fsync(self._dbfile.fileno())
+        self._dbfile.seek(header_pos)
+
     def close(self, flush=True):
+        if self._filter is not None:
+            self._filter.close()
+            self._filter = None
         if self._dbfile:  # if present, self._data is an mmap
             if not self._dbfile.closed:  # if not closed, the mmap was opened in write/update mode
-                self._dbfile.write(self._header())  # update the header
-                self._dbfile.close()
                 if flush:
                     self._data.flush()
+                self._dbfile.write(self._header())  # update the header
+                self._dbfile.close()
             self._data.close()
             self._dbfile = None
+        elif self._shm is not None:
+            self._data.release()
+            self._data = bytearray()
+            self._shm.close()
+            if self._shm_owner:
+                self._shm.unlink()
+            self._shm = None
         elif isinstance(self._data, bytearray) and self._data:
             self._data = bytearray()
         if flush:
@@ -346,6 +606,263 @@ class AddressSet(object):
             self.close(flush=False)
 
 
+# Sets of hash160s at least this long are shared by workers, see share_hash160s()
+SHARED_HASH160S_MIN_LEN = 100000
+
+def share_hash160s(hash160s):
+    """Returns a shared-memory AddressSet (see AddressSet.share()) holding the hash160s if there are many
+    of them, so that multiprocessing workers don't each receive (and hold) their own copy of them
+
+    :param hash160s: the hash160s (each of length 20)
+    :type hash160s: set
+    :return: an AddressSet, or the unchanged hash160s if there are too few or they aren't all hash160s
+    :rtype: AddressSet or set
+    """
+    if shared_memory is None or len(hash160s) < SHARED_HASH160S_MIN_LEN \
+            or any(type(hash160) is not bytes or len(hash160) != 20 for hash160 in hash160s):
+        return hash160s
+    # Use a load factor of at most 1/2 to keep the probe sequences (and lookups) short
+    address_set = AddressSet(1 << (2 * len(hash160s) - 1).bit_length(), quiet=True)
+    address_set.add_many(list(hash160s))
+    address_set.share()
+    return address_set
+
+
+# SplitMix64's finalizer, which mixes the bits of a 64-bit integer (or of each element of a NumPy uint64 array)
+_MASK64 = (1 << 64) - 1
+def _mix64(x):
+    if numpy is not None and isinstance(x, numpy.ndarray):
+        x = (x ^ (x >> numpy.uint64(30))) * numpy.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> numpy.uint64(27))) * numpy.uint64(0x94d049bb133111eb)
+        return x ^ (x >> numpy.uint64(31))
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9 & _MASK64
+    x = (x ^ (x >> 27)) * 0x94d049bb133111eb & _MASK64
+    return x ^ (x >> 31)
+
+
+class AddressFilter(object):
+    """
+    A compact, blocked Bloom filter of the addresses in an AddressSet which is stored in
+    a companion file, and which answers most membership tests for addresses that aren't
+    present without touching the (much larger) AddressSet hash table
+    """
+    VERSION = 1
+    MAGIC = b"seedrecover address filter\r\n"  # file magic
+    HEADER_LEN = 65536
+    assert HEADER_LEN % mmap.ALLOCATIONGRANULARITY == 0
+    BLOCK_BYTES = 64  # each key's bits are all set within one block, typically a single cache line
+    FILE_SUFFIX = ".filter"  # the filter for addresses.db is saved in addresses.db.filter
+
+    def __init__(self, address_count, false_positive_rate=0.01, bytes_per_addr=8, hash_bytes=4):
+        """
+        :param address_count: the count of addresses which will be added
+        :type address_count: int
+        :param false_positive_rate: the target false positive rate
+        :type false_positive_rate: float
+        :param bytes_per_addr: the bytes_per_addr of the AddressSet being filtered
+        :type bytes_per_addr: int
+        :param hash_bytes: the count of bytes used for hashing by the AddressSet being filtered
+        :type hash_bytes: int
+        """
+        if not 0.0 < false_positive_rate < 1.0:
+            raise ValueError("false_positive_rate must be between 0.0 and 1.0 exclusive")
+        # A blocked Bloom filter needs roughly 10% more bits per key than a standard one to
+        # reach the same false positive rate (two hashes per key are used, see _probe())
+        bits_per_key = -math.log(false_positive_rate) / math.log(2) ** 2 * 1.1
+        self._block_count = max(1, int(math.ceil(address_count * bits_per_key / (self.BLOCK_BYTES * 8))))
+        if self._block_count >= 1 << 32:
+            raise ValueError("address_count is too large for the filter")
+        self._hash_count = max(1, min(16, int(round(-math.log(false_positive_rate, 2)))))
+        self._false_positive_rate = false_positive_rate
+        self._bytes_per_addr = bytes_per_addr
+        self._hash_bytes = hash_bytes
+        self._len = 0  # count of addresses in the filtered AddressSet (used to detect a stale filter)
+        self._data = bytearray(self._block_count * self.BLOCK_BYTES)  # the filter itself
+        self._dbfile = None  # file object, its .name is req'd for pickling
+
+    def __getstate__(self):
+        # mmaps can't be pickled, so save only what's needed to recreate the object from scratch later
+        if isinstance(self._data, mmap.mmap):
+            return {"dbfilename": self._dbfile.name}
+        else:
+            return self.__dict__
+
+    def __setstate__(self, state):
+        # If the object contained an mmap, recreate it from scratch
+        if "dbfilename" in state:
+            new = self.fromfile(open(state["dbfilename"], "rb"), preload=False)
+            self.__dict__ = new.__dict__.copy()
+            new._dbfile = new._data = None  # ensure new's __del__() doesn't close() anything
+        else:
+            self.__dict__ = state
+
+    # Only the (up to) 8 least significant bytes of those an AddressSet stores for each address
+    # are hashed, so that the filter can be built from the AddressSet's table alone
+    def _key(self, address):
+        if type(address) is str:
+            address = address.encode()
+        key_end = -self._hash_bytes
+        return int.from_bytes(address[max(key_end - 8, -(self._bytes_per_addr + self._hash_bytes)): key_end], "big")
+
+    # Returns the block which a key's bits are set in, and the position of those bits
+    # within the block (as a bit mask) using Kirsch-Mitzenmacher double hashing
+    def _probe(self, key):
+        hash1 = _mix64(key)
+        hash2 = _mix64(hash1)
+        block = ((hash1 >> 32) * self._block_count) >> 32
+        bit_pos = hash2 & 511
+        bit_step = (hash2 >> 9) & 511 | 1
+        mask = 0
+        for i in range(self._hash_count):
+            mask |= 1 << (bit_pos + i * bit_step & 511)
+        return block, mask
+
+    # The NumPy equivalent of _probe(), for arrays of keys; returns the
+    # block and the bit position within the block for each of the hashes
+    def _probe_many(self, keys):
+        hash1 = _mix64(keys)
+        hash2 = _mix64(hash1)
+        blocks = ((hash1 >> numpy.uint64(32)) * numpy.uint64(self._block_count)) >> numpy.uint64(32)
+        bit_pos = hash2 & numpy.uint64(511)
+        bit_step = (hash2 >> numpy.uint64(9)) & numpy.uint64(511) | numpy.uint64(1)
+        for i in range(self._hash_count):
+            yield blocks, (bit_pos + numpy.uint64(i) * bit_step) & numpy.uint64(511)
+
+    def __contains__(self, address):
+        block, mask = self._probe(self._key(address))
+        block_pos = block * self.BLOCK_BYTES
+        return int.from_bytes(self._data[block_pos: block_pos + self.BLOCK_BYTES], "little") & mask == mask
+
+    def _contains_keys(self, keys):
+        """Tests an array of keys (as returned by _keys()) at once, returning an array of bools"""
+        words = numpy.frombuffer(self._data, "<u8")
+        found = numpy.ones(len(keys), bool)
+        for blocks, bit_pos in self._probe_many(keys):
+            found &= (words[blocks * numpy.uint64(self.BLOCK_BYTES // 8) + (bit_pos >> numpy.uint64(6))]
+                      >> (bit_pos & numpy.uint64(63)) & numpy.uint64(1)).astype(bool)
+        del words  # release the buffer so that an mmap can later be closed
+        return found
+
+    # Returns the keys (see _key()) of an array of the bytes that an AddressSet stores per address
+    @staticmethod
+    def _keys(stored_addrs):
+        keys = numpy.zeros(len(stored_addrs), numpy.uint64)
+        for col in range(max(0, stored_addrs.shape[1] - 8), stored_addrs.shape[1]):  # big-endian
+            keys <<= numpy.uint64(8)
+            keys |= stored_addrs[:, col]
+        return keys
+
+    @classmethod
+    def from_address_set(cls, address_set, false_positive_rate=0.01):
+        """Creates a filter of all the addresses in an AddressSet
+
+        :param address_set: the AddressSet to filter
+        :type address_set: AddressSet
+        :param false_positive_rate: the target false positive rate
+        :type false_positive_rate: float
+        """
+        self = cls(len(address_set), false_positive_rate, address_set._bytes_per_addr, address_set._hash_bytes)
+        self._len = len(address_set)
+        if numpy is None:
+            data = self._data
+            for stored_addr in address_set:
+                block, mask = self._probe(int.from_bytes(stored_addr[-8:], "big"))
+                block_pos = block * self.BLOCK_BYTES
+                data[block_pos: block_pos + self.BLOCK_BYTES] = (mask | int.from_bytes(
+                    data[block_pos: block_pos + self.BLOCK_BYTES], "little")).to_bytes(self.BLOCK_BYTES, "little")
+            return self
+        #
+        # The table is read in chunks to limit the memory used by the temporary arrays
+        words = numpy.frombuffer(self._data, "<u8")
+        bytes_per_addr = address_set._bytes_per_addr
+        chunk_len = 1 << 20
+        for chunk_start in range(0, address_set._dbLength, chunk_len):
+            stored_addrs = numpy.frombuffer(address_set._data, numpy.uint8,
+                                            min(chunk_len, address_set._dbLength - chunk_start) * bytes_per_addr,
+                                            chunk_start * bytes_per_addr).reshape(-1, bytes_per_addr)
+            keys = cls._keys(stored_addrs[stored_addrs.any(axis=1)])  # (all 0s is an empty table slot)
+            for blocks, bit_pos in self._probe_many(keys):
+                numpy.bitwise_or.at(words, blocks * numpy.uint64(self.BLOCK_BYTES // 8) + (bit_pos >> numpy.uint64(6)),
+                                    numpy.uint64(1) << (bit_pos & numpy.uint64(63)))
+        del words, stored_addrs
+        return self
+
+    @staticmethod
+    def _remove_nonheader_attribs(attrs):
+        del attrs["_data"], attrs["_dbfile"]
+
+    def _header(self):
+        # Construct a 64K header with the file magic, this object's attributes, plus the version
+        header_dict = self.__dict__.copy()
+        self._remove_nonheader_attribs(header_dict)
+        header_dict["version"] = self.VERSION
+        header = self.MAGIC + repr(header_dict).encode() + b"\r\n"
+        assert len(header) < self.HEADER_LEN
+        return header + b"\0" * (self.HEADER_LEN - len(header))  # appends at least one nul
+
+    def tofile(self, dbfile):
+        """Save the filter to a file
+
+        :param dbfile: an open file object where the filter is saved (overwriting it)
+        :type dbfile: io.FileIO or file
+        """
+        if "b" not in dbfile.mode:
+            raise ValueError("must open file in binary mode")
+        dbfile.truncate(dbfile.tell() + self.HEADER_LEN + len(self._data))
+        dbfile.write(self._header())
+        dbfile.write(self._data)
+
+    @classmethod
+    def fromfile(cls, dbfile, preload=True):
+        """Load the filter from a file
+
+        :param dbfile: an open file object from which the filter is loaded;
+                       it will be closed by AddressFilter when no longer needed
+        :type dbfile: io.FileIO or file
+        :param preload: True to preload the entire filter, False to load on demand
+        :type preload: bool
+        """
+        if "b" not in dbfile.mode:
+            raise ValueError("must open file in binary mode")
+        #
+        # Read in the header safely (ast.literal_eval() is safe for untrusted data)
+        header = dbfile.read(cls.HEADER_LEN)
+        if not header.startswith(cls.MAGIC):
+            raise ValueError("unrecognized file format (invalid magic)")
+        magic_len = len(cls.MAGIC)
+        config_end = header.find(b"\0", magic_len, cls.HEADER_LEN)
+        assert config_end > 0
+        config = ast.literal_eval(header[magic_len:config_end].decode())
+        if config["version"] != cls.VERSION:
+            raise ValueError("can't load address filter version {} (only supports {})"
+                             .format(config["version"], cls.VERSION))
+        #
+        # Create an AddressFilter object and replace its attributes
+        self = cls(1)  # (size is irrelevant since it's getting replaced)
+        cls._remove_nonheader_attribs(self.__dict__)
+        for attr in self.__dict__.keys():  # only load expected attributes from untrusted data
+            self.__dict__[attr] = config[attr]
+        #
+        # The filter is memory-mapped directly from the file instead of being loaded
+        self._data = mmap.mmap(dbfile.fileno(), self._block_count * self.BLOCK_BYTES, access=mmap.ACCESS_READ,
+                               offset=cls.HEADER_LEN)
+        dbfile.close()
+        self._dbfile = dbfile
+        if preload:
+            for i in range(len(self._data) // mmap.PAGESIZE):
+                self._data[i * mmap.PAGESIZE]
+        return self
+
+    def close(self):
+        if self._dbfile:  # if present, self._data is an mmap
+            self._data.close()
+            self._dbfile = None
+
+    def __del__(self):
+        if hasattr(self, "_dbfile"):
+            self.close()
+
+
 # Decodes a Bitcoin-style variable precision integer and
 # returns a tuple containing its value and incremented offset
 def varint(data, offset):
@@ -361,9 +878,232 @@ def varint(data, offset):
     assert False
 
 
+# Yields a (filenum, _parse_block_file() result) tuple for each block file in order starting with
+# first_filenum (at first_fileoffset), parsing up to two block files per thread in parallel ahead
+# of the one being yielded
+def _parse_block_files(blockdir, first_filenum, first_fileoffset, parse_args, threads=None):
+    threads = threads or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(threads) if threads > 1 else None
+    try:
+        pending = collections.deque()
+        for filenum in itertools.count(first_filenum):
+            filename = path.join(blockdir, "blk{:05}.dat".format(filenum))
+            if not path.isfile(filename):
+                break
+            fileoffset = first_fileoffset if filenum == first_filenum else 0
+            if pool:
+                pending.append((filenum, pool.apply_async(_parse_block_file, (filename, fileoffset) + parse_args)))
+                if len(pending) >= 2 * threads:
+                    filenum, result = pending.popleft()
+                    yield filenum, result.get()
+            else:
+                yield filenum, _parse_block_file(filename, fileoffset, *parse_args)
+        while pending:
+            filenum, result = pending.popleft()
+            yield filenum, result.get()
+    finally:
+        if pool:
+            pool.terminate()
+
+
+# Parses a block file starting at the block at fileoffset, returning a tuple of: None (or the chain magic
+# of its first block if it isn't supported, in which case parsing stops at once unless addressDB_yolo),
+# a list of the hash160s of the addresses in its outputs in order, a list of their address types (or
+# None if not output_types), the date of its last block (or None if it has none), and the offset just
+# past its last block (where more blocks may be appended later).
+def _parse_block_file(filename, fileoffset, start_date, end_date, addressDB_yolo=False, output_types=False):
+    hash160s = []
+    address_types = [] if output_types else None
+    blockDate = None
+    with open(filename, "rb") as blockfile:
+        blockfile.seek(fileoffset)
+        header = blockfile.read(8)  # read in the magic and remaining (after these 8 bytes) block length
+        chain_magic = header[:4]
+        # print("Found Magic:", chain_magic.encode("hex"))
+        if not addressDB_yolo and len(header) == 8 and header[4:] != b"\0\0\0\0" \
+                and supportedChains(chain_magic) != 1:
+            return chain_magic, hash160s, address_types, blockDate, fileoffset
+        chain_magic = None
+
+        while len(header) == 8 and header[4:] != b"\0\0\0\0":
+            block_len = struct.unpack_from("<I", header, 4)[0]
+            block = blockfile.read(block_len)  # read in the rest of the block
+            if len(block) < block_len:
+                break  # the block is still being written (by a running Bitcoin client), so resume here later
+
+            tx_count, offset = varint(block, 80)  # skips 80 bytes of header
+
+            # Get Block Header Info (Useful for debugging and limiting date range)
+            # (see block header layout at https://en.bitcoin.it/wiki/Block_hashing_algorithm)
+            block_time = struct.unpack_from("<I", block, 68)[0]
+            blockDate = datetime.fromtimestamp(float(block_time))
+
+            # Only add addresses which occur in blocks that are within the time window we are looking at
+            if start_date <= blockDate <= end_date:
+
+                for tx_num in range(tx_count):
+
+                    offset += 4  # skips 4-byte tx version
+                    is_bip144 = block[offset] == 0  # bip-144 marker
+                    if is_bip144:
+                        offset += 2  # skips 1-byte marker & 1-byte flag
+                    txin_count, offset = varint(block, offset)
+                    for txin_num in range(txin_count):
+                        sigscript_len, offset = varint(block, offset + 36)
+                        # skips 32-byte tx id & 4-byte tx index
+                        offset += sigscript_len + 4  # skips sequence number & sigscript
+                    txout_count, offset = varint(block, offset)
+                    for txout_num in range(txout_count):
+                        pkscript_len, offset = varint(block, offset + 8)
+                        # skips 8-byte satoshi count
+
+                        # If this is a P2PKH script (OP_DUP OP_HASH160 PUSH(20) <20 address bytes>
+                        # OP_EQUALVERIFY OP_CHECKSIG)
+                        if pkscript_len == 25 and block[offset:offset + 3] == b"\x76\xa9\x14" and \
+                                block[offset + 23:offset + 25] == b"\x88\xac":
+                            hash160s.append(block[offset + 3:offset + 23])
+                            if output_types:
+                                address_types.append('P2PKH')
+                        elif block[offset:offset + 2] == b"\xa9\x14":  # Check for Segwit Address
+                            hash160s.append(block[offset + 2:offset + 22])
+                            if output_types:
+                                address_types.append('P2SH')
+                        elif block[offset:offset + 2] == b"\x00\x14":  # Check for Native Segwit Address
+                            hash160s.append(block[offset + 2:offset + 22])
+                            if output_types:
+                                address_types.append('Bech32')
+
+                        offset += pkscript_len  # advances past the pubkey script
+                    if is_bip144:
+                        for txin_num in range(txin_count):
+                            stackitem_count, offset = varint(block, offset)
+                            for stackitem_num in range(stackitem_count):
+                                stackitem_len, offset = varint(block, offset)
+                                offset += stackitem_len  # skips this stack item
+                    offset += 4  # skips the 4-byte locktime
+
+            fileoffset += 8 + block_len
+            header = blockfile.read(8)  # read in the next magic and remaining block length
+
+    return chain_magic, hash160s, address_types, blockDate, fileoffset
+
+
+# Address lists are read in blocks of about this many bytes' worth of lines, each of which is decoded by a worker
+ADDRESS_LIST_BLOCK_SIZE = 4 * 2**20
+
+_BASE58_DIGITS = {c: i for i, c in enumerate("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz")}
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+# Decodes a single Base58Check address with a 25-byte payload (a version byte, hash160 and checksum)
+# directly, returning its hash160, or None if it's anything else (which is left to the slow path)
+def _base58_address_to_hash160(address):
+    n = 0
+    try:
+        for c in address:
+            n = n * 58 + _BASE58_DIGITS[c]
+        raw = n.to_bytes(25, "big")
+    except (KeyError, OverflowError):
+        return None
+    leading_ones = len(address) - len(address.lstrip("1"))
+    if leading_ones != len(raw) - len(raw.lstrip(b"\0")):
+        return None  # not in canonical form
+    if hashlib.sha256(hashlib.sha256(raw[:21]).digest()).digest()[:4] != raw[21:]:
+        return None  # (might be a coin with a different checksum, eg Groestlcoin)
+    return raw[1:21]
+
+
+# Decodes a block of lines from an address list, returning a tuple of: a list of the unique hash160s of its
+# addresses in order, a list of the (stripped) lines which aren't valid addresses, and the number of lines.
+# Lowercase Ethereum, Base58Check and Bech32 addresses are decoded directly; everything else (eg XRP, CashAddr
+# and mixed-case EIP55 addresses) goes through the wallets' _addresses_to_hash160s() as create_address_db()
+# always has done, with the same results either way.
+def _decode_address_block(lines):
+    hash160s = []
+    invalid_addresses = []
+    for address in lines:
+        # Strip any and handle  JSON data present for some cryptos in data exported from bigquery
+        if address[2:11] == 'addresses':
+            address = address[15:-4]
+        address = address.rstrip()
+
+        if address[0:2] == '0x':
+            if len(address) == 42 and _HEX_DIGITS.issuperset(address[2:]):
+                hash160s.append(bytes.fromhex(address[2:]))
+            else:
+                import btcrecover.btcrseed
+                hash160s.append(btcrecover.btcrseed.WalletEthereum._addresses_to_hash160s([address]).pop())
+            continue
+
+        hash160 = None
+        # Base58Check addresses with a 20-byte hash160 are 25 to 35 characters long,
+        # and shorter than CashAddr addresses (XRP addresses begin with an "r")
+        if 25 <= len(address) <= 35 and address[0] != "r":
+            hash160 = _base58_address_to_hash160(address)
+        elif len(address) > 35 and "1" in address:  # Bech32 addresses have a "1" separator, CashAddr don't
+            try:
+                hash160 = bitcoinlib.encoding.addr_bech32_to_pubkeyhash(address, prefix='', include_witver=False)
+            except bitcoinlib.encoding.EncodingError:
+                pass
+        try:
+            if hash160 is None:
+                import btcrecover.btcrseed
+                hash160 = btcrecover.btcrseed.WalletBase._addresses_to_hash160s([address]).pop()
+            hash160s.append(hash160)
+        except bitcoinlib.encoding.EncodingError:
+            invalid_addresses.append(address)
+    return list(dict.fromkeys(hash160s)), invalid_addresses, len(lines)
+
+
+# Yields a _decode_address_block() result tuple for each block of lines in addressList_file in order,
+# decoding up to two blocks per thread in parallel ahead of the one being yielded
+def _decode_address_list(addressList_file, threads=None):
+    threads = threads or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(threads) if threads > 1 else None
+    try:
+        pending = collections.deque()
+        while True:
+            lines = addressList_file.readlines(ADDRESS_LIST_BLOCK_SIZE)
+            if not lines:
+                break
+            if pool:
+                pending.append(pool.apply_async(_decode_address_block, (lines,)))
+                if len(pending) >= 2 * threads:
+                    yield pending.popleft().get()
+            else:
+                yield _decode_address_block(lines)
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        if pool:
+            pool.terminate()
+
+
+# Creates the companion filter of an address database, or when updating recreates an existing one with its
+# original false positive rate, or removes one which would otherwise be out of date
+def _save_address_filter(dbfilename, address_set, filter_fpr, update):
+    filter_filename = dbfilename + AddressFilter.FILE_SUFFIX
+    if filter_fpr is None and path.isfile(filter_filename):
+        if update:
+            address_filter = AddressFilter.fromfile(open(filter_filename, "rb"), preload=False)
+            filter_fpr = address_filter._false_positive_rate
+            address_filter.close()
+        else:
+            print("\nRemoving out of date address filter", filter_filename, "...")
+            os.remove(filter_filename)
+    if filter_fpr:
+        print("\nCreating address filter with a false positive rate of", filter_fpr, "...")
+        address_filter = AddressFilter.from_address_set(address_set, filter_fpr)
+        with io.open(filter_filename, "wb") as filter_file:
+            address_filter.tofile(filter_file)
+        print("Saved", filter_filename)
+        del address_filter
+
+
 def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-01", endBlockDate="3000-12-31",
                       startBlockFile=0, addressDB_yolo=False, outputToText=False, update=False, progress_bar=True,
-                      addresslistfile=None, multiFile=False):
+                      addresslistfile=None, multiFile=False, filter_fpr=None, threads=None,
+                      checkpoint_interval=600):
     """Creates an AddressSet database and saves it to a file
 
     :param dbfilename: the file name where the database is saved (overwriting it)
@@ -374,6 +1114,14 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
     :type update: bool
     :param progress_bar: True to enable the progress bar
     :type progress_bar: bool
+    :param filter_fpr: if set, also create a companion AddressFilter with this false positive rate
+    :type filter_fpr: float
+    :param threads: the number of processes which parse block files or decode the address list
+                    (default: number of logical CPU cores)
+    :type threads: int
+    :param checkpoint_interval: the minimum number of seconds between saving the progress of parsing block
+                                files to the database file (an interrupted update can resume from there)
+    :type checkpoint_interval: float
 
     Args:
         multiFile:
@@ -389,10 +1137,16 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
     if update:
         print("Loading address database ...")
         address_set = AddressSet.fromfile(open(dbfilename, "r+b"), mmap_access=mmap.ACCESS_WRITE)
+        if address_set._updating:
+            print("Resuming an interrupted update from its last checkpoint")
         first_filenum = address_set.last_filenum
+        first_fileoffset = address_set.last_fileoffset or 0
+        address_set._updating = True  # (until it's closed, see AddressSet.fromfile())
+        address_set.checkpoint()
         print()
     else:
         first_filenum = startBlockFile
+        first_fileoffset = 0
 
     if not addresslistfile:
         for filename in glob.iglob(path.join(blockdir, "blk*.dat")):
@@ -410,7 +1164,7 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
         try:
             dbfile = io.open(dbfilename, "r+b")
         except IOError:
-            dbfile = io.open(dbfilename, "wb")
+            dbfile = io.open(dbfilename, "w+b")
 
         # Try to create the AddressDB. If the addresset is sufficiently large (eg: BTC) then this requires 64
         # bit python and will crash if attempted with 32 bit Python...
@@ -424,8 +1178,18 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
                 "AddressDB too large for use with 32 bit Python. You will need to install a 64 bit (x64) "
                 "version of Python 3 from python.org and try again")
 
+        if not addresslistfile:
+            # Save the (still empty) database now and update it in place from here on, so that its
+            # progress can be checkpointed, and if interrupted, resumed later with --update
+            dbfile.truncate(0)
+            dbfile.truncate(AddressSet.HEADER_LEN + address_set._table_bytes)  # (the table is all 0s)
+            dbfile.write(address_set._header())
+            dbfile.seek(0)
+            address_set.close()
+            address_set = AddressSet.fromfile(dbfile, mmap_access=mmap.ACCESS_WRITE, preload=False)
+            address_set._updating = True  # (until it's closed, see AddressSet.fromfile())
+
     if addresslistfile:
-        import btcrecover.btcrseed
         print("Initial AddressDB Contains", len(address_set), "Addresses")
         for i in range(9999):
             if multiFile:
@@ -434,25 +1198,16 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
                 with open(addresslistfile) as addressList_file:
                     print("Loading: ", addresslistfile)
                     addresses_loaded = 0
-                    for address in addressList_file:
-                        try:
-                            # Strip any and handle  JSON data present for some cryptos in data exported from bigquery
-                            if address[2:11] == 'addresses':
-                                address = address[15:-4]
-
-                            if address[0:2] != '0x':
-                                address_set.add(
-                                    btcrecover.btcrseed.WalletBase._addresses_to_hash160s([address.rstrip()]).pop())
-                            else:
-                                address_set.add(
-                                    btcrecover.btcrseed.WalletEthereum._addresses_to_hash160s([address.rstrip()]).pop())
-                            addresses_loaded += 1
-                            if addresses_loaded % 1000000 == 0:
-                                print("Checked:", addresses_loaded, "addresses in current file,", len(address_set),
-                                      "in unique Hash160s in AddressDB")
-
-                        except bitcoinlib.encoding.EncodingError:
-                            print("Skipping Invalid Address:", address.rstrip())
+                    for hash160s, invalid_addresses, lines_count in _decode_address_list(addressList_file, threads):
+                        for address in invalid_addresses:
+                            print("Skipping Invalid Address:", address)
+                        address_set.add_many(hash160s)
+                        previous_loaded = addresses_loaded
+                        addresses_loaded += lines_count - len(invalid_addresses)
+                        if addresses_loaded // 1000000 > previous_loaded // 1000000:
+                            print("Checked:", addresses_loaded, "addresses in current file,", len(address_set),
+                                  "in unique Hash160s in AddressDB")
+
                     print("Finished: ", addresslistfile)
                     if not multiFile:
                         break
@@ -490,109 +1245,55 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
             print("-------------------   ------------     -------------     -------------------")
             # e.g. blk00943.dat   255,212,706
 
-        for filenum in itertools.count(first_filenum):
-            filename = path.join(blockdir, "blk{:05}.dat".format(filenum))
-            if not path.isfile(filename):
-                break
-            address_set.last_filenum = filenum
+        # The date window is parsed just once, here
+        parse_args = (datetime.strptime(startBlockDate + " 00:00:00", '%Y-%m-%d %H:%M:%S'),
+                      datetime.strptime(endBlockDate + " 23:59:59", '%Y-%m-%d %H:%M:%S'),
+                      addressDB_yolo, outputToText)
+
+        address_set.last_filenum = first_filenum
+        address_set.last_fileoffset = first_fileoffset
+        address_set.checkpoint()
+        last_checkpoint_time = time.time()
+        blockDate = None  # the date of the last block parsed so far
+
+        # The block files are parsed in parallel, however their addresses are added strictly in
+        # block file order so that the resulting hash table is identical to a serial parse
+        for filenum, (unsupported_magic, hash160s, address_types, last_block_date, end_fileoffset) in \
+                _parse_block_files(blockdir, first_filenum, first_fileoffset, parse_args, threads):
+
+            if not progress_bar:
+                # Print Timestamp that this step occured
+                print(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "   ", end="")
+                print("blk{:05}.dat".format(filenum), end=" ")
+
+            if unsupported_magic is not None:  # Check magic to see if it is a chain we support
+                # Throw an error message and exit if we encounter unsupported magic value
+                if supportedChains(unsupported_magic) == -1:
+                    print("Unrecognised Block Protocol (Unrecognised Magic), Found:", unsupported_magic,
+                          " You can force an AddressDB creation attempt by re-running this tool "
+                          "with the flag --dbyolo")
+
+                if supportedChains(unsupported_magic) == 0:
+                    print(
+                        "Incompatible Block Protocol, You can force an AddressDB creation attempt by "
+                        "re-running this tool with the flag --dbyolo, but it probably won't work")
+
+                exit()
+
+            if address_types:
+                for address, address_type in zip(hash160s, address_types):
+                    address_set.add(address, outputToText, address_type)
+            else:
+                address_set.add_many(hash160s)
+            if last_block_date:
+                blockDate = last_block_date
 
-            with open(filename, "rb") as blockfile:
-                if not progress_bar:
-                    # Print Timestamp that this step occured
-                    print(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "   ", end="")
-                    print(path.basename(filename), end=" ")
-
-                header = blockfile.read(8)  # read in the magic and remaining (after these 8 bytes) block length
-                chain_magic = header[:4]
-                # print("Found Magic:", chain_magic.encode("hex"))
-                while len(header) == 8 and header[4:] != b"\0\0\0\0":
-                    if supportedChains(chain_magic) != 1:  # Check magic to see if it is a chain we support
-                        if not addressDB_yolo:  # Ignore checks on the blockchain type
-                            # Throw an error message and exit if we encounter unsupported magic value
-                            if supportedChains(chain_magic) == -1:
-                                print("Unrecognised Block Protocol (Unrecognised Magic), Found:", chain_magic,
-                                      " You can force an AddressDB creation attempt by re-running this tool "
-                                      "with the flag --dbyolo")
-
-                            if supportedChains(chain_magic) == 0:
-                                print(
-                                    "Incompatible Block Protocol, You can force an AddressDB creation attempt by "
-                                    "re-running this tool with the flag --dbyolo, but it probably won't work")
-
-                            exit()
-
-                    block = blockfile.read(struct.unpack_from("<I", header, 4)[0])  # read in the rest of the block
-
-                    tx_count, offset = varint(block, 80)  # skips 80 bytes of header
-
-                    # Extract Block Header info (Useful for debugging extra new chains)
-                    # print("Block Header: ", block[0:80].encode("hex"))
-                    # print()
-
-                    # Get Block Header Info (Useful for debugging and limiting date range)
-                    block_version = block[0:4]
-                    block_prevHash = block[4:36]
-                    block_merkleRoot = block[36:68]
-                    block_time = struct.unpack("<I", block[68:72])[0]
-                    block_bits = struct.unpack("<I", block[72:76])[0]
-                    block_nonce = struct.unpack("<I", block[76:80])[0]
-
-                    # print_debug = False
-                    # if block_prevHash.encode("hex") =='52aa3101be5119a77cce7a8f2e2a8fcdfcbcf6ca0f3e15000000000000000000':
-                    #    print_debug = True
-                    # print("Block Version: ", block_version.hex())
-                    # print("Block PrevHash: ", block_prevHash.hex())
-                    # print("Block MerkleRoot: ", block_merkleRoot.hex())
-                    # print("Block Bits: ", block_bits)
-                    # print("Block Nonce: ", block_nonce)
-                    # print("Block TIme: ", block_time, " " , datetime.fromtimestamp(float(block_time)))
-
-                    blockDate = datetime.fromtimestamp(float(block_time))
-
-                    # Only add addresses which occur in blocks that are within the time window we are looking at
-                    if datetime.strptime(startBlockDate + " 00:00:00", '%Y-%m-%d %H:%M:%S') <= blockDate <= datetime.\
-                            strptime(endBlockDate + " 23:59:59", '%Y-%m-%d %H:%M:%S'):
-
-                        for tx_num in range(tx_count):
-
-                            offset += 4  # skips 4-byte tx version
-                            is_bip144 = block[offset] == 0  # bip-144 marker
-                            if is_bip144:
-                                offset += 2  # skips 1-byte marker & 1-byte flag
-                            txin_count, offset = varint(block, offset)
-                            for txin_num in range(txin_count):
-                                sigscript_len, offset = varint(block, offset + 36)
-                                # skips 32-byte tx id & 4-byte tx index
-                                offset += sigscript_len + 4  # skips sequence number & sigscript
-                            txout_count, offset = varint(block, offset)
-                            for txout_num in range(txout_count):
-                                pkscript_len, offset = varint(block, offset + 8)
-                                # skips 8-byte satoshi count
-
-                                # if print_debug:
-                                #    print("Tx Data: ", block[offset:offset+100].encode("hex"))
-                                # #Print all TX data (plus more for debugging)
-
-                                # If this is a P2PKH script (OP_DUP OP_HASH160 PUSH(20) <20 address bytes>
-                                # OP_EQUALVERIFY OP_CHECKSIG)
-                                if pkscript_len == 25 and block[offset:offset + 3] == b"\x76\xa9\x14" and \
-                                        block[offset + 23:offset + 25] == b"\x88\xac":
-                                    address_set.add(block[offset + 3:offset + 23], outputToText, 'P2PKH')
-                                elif block[offset:offset + 2] == b"\xa9\x14":  # Check for Segwit Address
-                                    address_set.add(block[offset + 2:offset + 22], outputToText, 'P2SH')
-                                elif block[offset:offset + 2] == b"\x00\x14":  # Check for Native Segwit Address
-                                    address_set.add(block[offset + 2:offset + 22], outputToText, 'Bech32')
-
-                                offset += pkscript_len  # advances past the pubkey script
-                            if is_bip144:
-                                for txin_num in range(txin_count):
-                                    stackitem_count, offset = varint(block, offset)
-                                    for stackitem_num in range(stackitem_count):
-                                        stackitem_len, offset = varint(block, offset)
-                                        offset += stackitem_len  # skips this stack item
-                            offset += 4  # skips the 4-byte locktime
-
-                    header = blockfile.read(8)  # read in the next magic and remaining block length
+            # The next update resumes just past the blocks in this file (to which more may yet be appended)
+            address_set.last_filenum = filenum
+            address_set.last_fileoffset = end_fileoffset
+            if time.time() - last_checkpoint_time >= checkpoint_interval:
+                address_set.checkpoint()
+                last_checkpoint_time = time.time()
 
             if progress_bar:
                 block_bar_widgets[3] = progressbar.FormatLabel(
@@ -608,8 +1309,16 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
         if progress_bar:
             progress_bar.widgets.pop()  # remove the ETA
             progress_bar.finish()
+
+    _save_address_filter(dbfilename, address_set, filter_fpr, update)
+
     if update:
         print("\nSaving changes to address database ...")
+        address_set._updating = False
+        address_set.close()
+    elif not addresslistfile:
+        print("\nSaving address database ...")
+        address_set._updating = False
         address_set.close()
     else:
         print("\nSaving address database ...")
@@ -620,3 +1329,71 @@ def create_address_db(dbfilename, blockdir, table_len, startBlockDate="2019-01-0
     # Print Timestamp that this step occured
     print(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ": ", end="")
     print("\nDone.")
+
+
+def merge_address_dbs(dbfilename, source_dbfilenames, table_len=None, update=False, filter_fpr=None):
+    """Merges AddressSet database files into one (or with a single source file, resizes it), see AddressSet.merge()
+
+    :param dbfilename: the file name where the database is saved (overwriting it unless updating)
+    :type dbfilename: str
+    :param source_dbfilenames: the file names of the databases to merge
+    :type source_dbfilenames: list of str
+    :param table_len: the table size of a new database as a power of 2; it may not be larger than any of
+                      the sources' (default: the same as the smallest source's)
+    :type table_len: int
+    :param update: if True, the sources are merged into the existing database file
+    :type update: bool
+    :param filter_fpr: if set, also create a companion AddressFilter with this false positive rate
+    :type filter_fpr: float
+    """
+    # (the database is written in place, so it can't also be one of those being read from)
+    if path.exists(dbfilename) and any(path.samefile(dbfilename, filename) for filename in source_dbfilenames):
+        raise ValueError("can't merge an AddressDB into itself, the merged AddressDB needs a different file name")
+    sources = [AddressSet.fromfile(open(filename, "rb"), preload=False) for filename in source_dbfilenames]
+    try:
+        layouts = {(source._bytes_per_addr, source._hash_bytes) for source in sources}
+        if len(layouts) > 1:
+            raise ValueError("can only merge AddressDBs which store the same bytes of each address "
+                             "(eg those with a --dblength from 17 to 24, or from 25 to 32)")
+        (bytes_per_addr, hash_bytes), = layouts
+        if update:
+            print("Loading address database ...")
+            address_set = AddressSet.fromfile(open(dbfilename, "r+b"), mmap_access=mmap.ACCESS_WRITE)
+            if (address_set._bytes_per_addr, address_set._hash_bytes) != (bytes_per_addr, hash_bytes):
+                raise ValueError("can only merge AddressDBs which store the same bytes of each address "
+                                 "as the one being updated")
+        else:
+            min_table_len = min(source._dbLength for source in sources).bit_length() - 1
+            if table_len is None:
+                table_len = min_table_len
+            elif table_len > min_table_len:
+                raise ValueError("the database can't be larger than the smallest one merged into it (2^{})"
+                                 .format(min_table_len))
+            # The new database is saved (still empty) and then merged into in place, as in create_address_db()
+            address_set = AddressSet(1 << table_len, bytes_per_addr)
+            # A smaller table would normally use fewer hash bytes, but it must store the same bytes as the sources
+            address_set._hash_bytes = hash_bytes
+            with io.open(dbfilename, "w+b") as dbfile:
+                dbfile.truncate(AddressSet.HEADER_LEN + address_set._table_bytes)  # (the table is all 0s)
+                dbfile.write(address_set._header())
+            address_set.close()
+            address_set = AddressSet.fromfile(open(dbfilename, "r+b"), mmap_access=mmap.ACCESS_WRITE,
+                                              preload=False)
+        address_set._updating = True  # (until it's closed, see AddressSet.fromfile())
+        address_set.checkpoint()
+
+        for filename, source in zip(source_dbfilenames, sources):
+            print("Merging:", filename, "with", len(source), "addresses ...")
+            added = address_set.merge(source)
+            address_set.checkpoint()
+            print("Added", added, "addresses,", len(address_set), "in AddressDB")
+    finally:
+        for source in sources:
+            source.close()
+
+    _save_address_filter(dbfilename, address_set, filter_fpr, update)
+
+    print("\nSaving address database ...")
+    address_set._updating = False
+    address_set.close()
+    print("\nDone.")
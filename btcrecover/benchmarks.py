@@ -0,0 +1,318 @@
+# benchmarks.py -- btcrecover performance benchmark suite
+# Copyright (C) 2024 Stephen Rothery
+#
+# This file is part of btcrecover.
+#
+# btcrecover is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version
+# 2 of the License, or (at your option) any later version.
+#
+# btcrecover is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/
+
+# Runs the same measurement as --performance for every wallet type, both those of btcrecover (using the
+# first test wallet of each type) and those of seedrecover, each for a fixed duration in its own freshly
+# started process using a single core. The results (passwords per second, chunk size, the time split
+# between generating and verifying passwords, and peak memory usage) can be saved as JSON, and later
+# runs compared against such a saved baseline to catch performance regressions.
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None  # (e.g. on Windows) peak memory usage isn't measured
+
+RESULTS_VERSION = 1
+
+TEST_WALLETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test", "test-wallets")
+
+DEFAULT_DURATION = 10.0  # seconds per benchmark
+DEFAULT_REGRESSION_THRESHOLD = 0.10  # a 10% slowdown (or increase in peak memory) is reported as a regression
+
+# The same chunk size target as btcrpass.main() uses for CPU verification
+CHUNKSIZE_SECONDS = 1.0 / 100.0
+
+
+def list_benchmarks():
+    """Finds the available benchmarks, one for each btcrpass and btcrseed wallet type
+
+    :return: (name, kind, target) tuples where kind is "btcrpass" or "btcrseed", and target is
+             the test wallet filename or the seed wallet class name respectively
+    :rtype: list[(str, str, str)]
+    """
+    from . import btcrpass, btcrseed
+    benchmarks = []
+    #
+    # btcrpass wallets are benchmarked using the first (alphabetically) test wallet which loads as each type
+    found_types = set()
+    for filename in sorted(os.listdir(TEST_WALLETS_DIR)):
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                wallet = btcrpass.load_wallet(os.path.join(TEST_WALLETS_DIR, filename))
+        except BaseException as e:  # (load_wallet calls sys.exit() for unrecognized files)
+            if isinstance(e, KeyboardInterrupt):
+                raise
+            continue
+        wallet_type = type(wallet).__name__
+        if wallet_type not in found_types:
+            found_types.add(wallet_type)
+            benchmarks.append(("btcrpass/" + wallet_type, "btcrpass", filename))
+    #
+    for wallet_cls, description in btcrseed.selectable_wallet_classes:
+        benchmarks.append(("btcrseed/" + wallet_cls.__name__, "btcrseed", wallet_cls.__name__))
+    return benchmarks
+
+
+# Configures btcrpass for a --performance run of the benchmark, just as
+# btcrecover.py or seedrecover.py would, and returns the loaded wallet
+def _configure_benchmark(kind, target):
+    from . import btcrpass, btcrseed
+    common_args = ["--performance", "--threads", "1", "--no-eta", "--no-progress", "--no-dupchecks", "--dsw"]
+    if kind == "btcrpass":
+        btcrpass.parse_arguments(["--wallet", os.path.join(TEST_WALLETS_DIR, target)] + common_args)
+        return btcrpass.loaded_wallet
+    #
+    wallet_cls = next(cls for cls, description in btcrseed.selectable_wallet_classes if cls.__name__ == target)
+    # A hash160 which won't ever be found, so that all the addresses are generated and checked
+    wallet = wallet_cls.create_from_params(hash160s={b"\xff" * 20}, address_limit=1, is_performance=True)
+    wallet._savevalidseeds = False
+    btcrseed.loaded_wallet = wallet
+    # A dummy mnemonic; only its language and length are used for anything
+    mnemonic_guess = " ".join("act" for i in range(12))
+    if isinstance(wallet, btcrseed.WalletBIP39):
+        wallet.config_mnemonic(mnemonic_guess, expected_len=12)
+    else:
+        wallet.config_mnemonic(mnemonic_guess)
+    btcrpass.parse_arguments(["--typos", "0"] + common_args, wallet=wallet,
+                             perf_iterator=lambda: wallet.performance_iterator(),
+                             check_only=wallet.verify_mnemonic_syntax, disable_security_warning_param=True)
+    return wallet
+
+
+# Returns the peak resident set size of this process in bytes, or None if it's unavailable
+def _peak_rss():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024  # (on Linux, ru_maxrss is in KiB)
+
+
+def run_benchmark(kind, target, duration=DEFAULT_DURATION):
+    """Runs a single benchmark in this process for about duration seconds
+
+    Passwords are generated by btcrpass.password_generator() and verified by the wallet in chunks sized
+    just as btcrpass.main() would size them, and the time spent in each of these is totalled separately.
+
+    :param kind: "btcrpass" or "btcrseed"
+    :param target: a test wallet filename for btcrpass, or a wallet class name for btcrseed
+    :param duration: how long to spend generating and verifying passwords, in seconds
+    :return: the results, or a dict with just an "error" if the benchmark couldn't be run
+    :rtype: dict
+    """
+    from . import btcrpass
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            wallet = _configure_benchmark(kind, target)
+            #
+            # Estimate the time per password and choose the chunk size as btcrpass.main() does
+            measure_performance_iterations = wallet.passwords_per_seconds(0.5)
+            inner_iterations = int(round(2 * measure_performance_iterations * CHUNKSIZE_SECONDS)) or 1
+            outer_iterations = int(round(measure_performance_iterations / inner_iterations)) or 1
+            performance_generator = btcrpass.performance_base_password_generator()
+            wallet.pre_start_benchmark = True
+            start = time.perf_counter()
+            for o in range(outer_iterations):
+                wallet.return_verified_password_or_false(
+                    list(itertools.islice(performance_generator, inner_iterations)))
+            est_secs_per_password = (time.perf_counter() - start) / (outer_iterations * inner_iterations)
+            wallet.pre_start_benchmark = False
+            del performance_generator
+            chunksize = int(round(CHUNKSIZE_SECONDS / est_secs_per_password)) or 1
+            #
+            l_perf_counter = time.perf_counter
+            password_generator = btcrpass.password_generator(chunksize)
+            generator_seconds = verifier_seconds = 0.0
+            passwords_tried = 0
+            end = l_perf_counter() + duration
+            while l_perf_counter() < end:
+                start = l_perf_counter()
+                passwords = next(password_generator)
+                generated = l_perf_counter()
+                password_found, passwords_checked = wallet.return_verified_password_or_false(passwords)
+                generator_seconds += generated - start
+                verifier_seconds += l_perf_counter() - generated
+                passwords_tried += len(passwords)
+    except BaseException as e:  # (btcrpass and the wallets call sys.exit() for unusable configurations)
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        message = str(e) if str(e) and str(e) != "None" else ""
+        if not message:  # if the error was printed instead, use the last thing printed
+            printed = output.getvalue().strip().splitlines()
+            message = printed[-1].strip() if printed else ""
+        return dict(error="{}: {}".format(type(e).__name__, message) if message else type(e).__name__)
+    #
+    total_seconds = generator_seconds + verifier_seconds
+    return dict(
+        passwords_per_second = passwords_tried / total_seconds,  # for a single core
+        chunksize            = chunksize,
+        passwords            = passwords_tried,
+        generator_seconds    = generator_seconds,
+        verifier_seconds     = verifier_seconds,
+        generator_fraction   = generator_seconds / total_seconds,
+        peak_rss             = _peak_rss())
+
+
+# Runs in a newly started process so that every benchmark begins from the same state, and so
+# that its peak memory usage isn't affected by either the benchmarks before it or this module
+def _run_benchmark_process(params):
+    kind, target, duration = params
+    return run_benchmark(kind, target, duration)
+
+
+def run_benchmarks(benchmarks, duration=DEFAULT_DURATION, progress=None):
+    """Runs each benchmark in a new process, one at a time
+
+    :param benchmarks: (name, kind, target) tuples as returned by list_benchmarks()
+    :param duration: how long to run each benchmark for, in seconds
+    :param progress: if not None, a function called with the name and results of each finished benchmark
+    :return: the results, including information about the system they were measured on
+    :rtype: dict
+    """
+    results = dict(
+        version   = RESULTS_VERSION,
+        time      = time.strftime("%Y-%m-%d %H:%M:%S"),
+        python    = platform.python_version(),
+        platform  = platform.platform(),
+        machine   = platform.machine(),
+        cpu_count = multiprocessing.cpu_count(),
+        duration  = duration,
+        benchmarks = {})
+    # "spawn" starts each process from scratch, where "fork" would begin with a copy of this one
+    pool = multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1)
+    try:
+        for (name, kind, target), result in zip(benchmarks, pool.imap(
+                _run_benchmark_process, ((kind, target, duration) for name, kind, target in benchmarks))):
+            results["benchmarks"][name] = result
+            if progress:
+                progress(name, result)
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+
+def compare_results(results, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Compares benchmark results against an earlier (baseline) run
+
+    :param results: the new results, as returned by run_benchmarks()
+    :param baseline: the baseline results, as returned by run_benchmarks()
+    :param threshold: the fractional slowdown or increase in peak memory usage which counts as a regression
+    :return: (name, passwords_per_second ratio, peak_rss ratio, is_regression) tuples for each benchmark
+             which ran successfully in both; a ratio is None if either run lacks the measurement
+    :rtype: list[(str, float | None, float | None, bool)]
+    """
+    if baseline.get("version") != RESULTS_VERSION:
+        raise ValueError("can't compare against benchmark results version {} (only supports {})"
+                         .format(baseline.get("version"), RESULTS_VERSION))
+    comparisons = []
+    for name, result in results["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name)
+        if not baseline_result or "error" in result or "error" in baseline_result:
+            continue
+        speed_ratio = result["passwords_per_second"] / baseline_result["passwords_per_second"]
+        rss_ratio = result["peak_rss"] / baseline_result["peak_rss"] \
+            if result.get("peak_rss") and baseline_result.get("peak_rss") else None
+        is_regression = speed_ratio < 1.0 - threshold or rss_ratio is not None and rss_ratio > 1.0 + threshold
+        comparisons.append((name, speed_ratio, rss_ratio, is_regression))
+    return comparisons
+
+
+def _print_result(name, result):
+    if "error" in result:
+        print("{:40} skipped ({})".format(name, result["error"]))
+    else:
+        print("{:40} {:12,.1f} p/s   chunksize {:<6} generator {:5.1%}   peak RSS {}".format(
+            name, result["passwords_per_second"], result["chunksize"], result["generator_fraction"],
+            "{:,.1f} MiB".format(result["peak_rss"] / 1048576.0) if result["peak_rss"] else "unknown"))
+    sys.stdout.flush()
+
+
+def main(argv):
+    """Runs the benchmarks as requested on the command line
+
+    :param argv: the command-line arguments (excluding the program name)
+    :type argv: list[str]
+    :return: the exit status, 1 if a regression was found versus the baseline, otherwise 0
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description="Measure the single-core performance of each wallet type.")
+    parser.add_argument("--duration",  type=float, default=DEFAULT_DURATION, metavar="SECONDS",
+                        help="how long to run each benchmark for (default: %(default)s)")
+    parser.add_argument("--only",      action="append", metavar="PATTERN",
+                        help="only run benchmarks whose names match this wildcard pattern, e.g. 'btcrseed/*' "
+                             "(may be specified multiple times)")
+    parser.add_argument("--list",      action="store_true", help="list the available benchmarks and exit")
+    parser.add_argument("--json",      metavar="FILE", help="save the results as JSON to this file")
+    parser.add_argument("--baseline",  metavar="FILE", help="compare the results against those saved by a previous "
+                                                            "run with --json")
+    parser.add_argument("--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD * 100,
+                        metavar="PERCENT", help="the slowdown or increase in peak memory usage versus the baseline "
+                                                "which is reported as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    benchmarks = list_benchmarks()
+    if args.only:
+        benchmarks = [b for b in benchmarks if any(fnmatch.fnmatch(b[0], pattern) for pattern in args.only)]
+        if not benchmarks:
+            sys.exit("no benchmarks match " + ", ".join(args.only))
+    if args.list:
+        for name, kind, target in benchmarks:
+            print(name)
+        return 0
+
+    print("Running", len(benchmarks), "benchmarks for", args.duration, "seconds each ...")
+    results = run_benchmarks(benchmarks, args.duration, _print_result)
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+
+    if baseline is None:
+        return 0
+    if baseline.get("platform") != results["platform"] or baseline.get("python") != results["python"]:
+        print("\nWarning: the baseline was run on a different platform or Python version", file=sys.stderr)
+    print("\nCompared to the baseline from", baseline.get("time", "an unknown time") + ":")
+    regressions = 0
+    for name, speed_ratio, rss_ratio, is_regression in compare_results(results, baseline,
+                                                                       args.regression_threshold / 100.0):
+        print("{:40} speed {:+7.1%}   peak RSS {}{}".format(name, speed_ratio - 1.0,
+              "{:+7.1%}".format(rss_ratio - 1.0) if rss_ratio is not None else "unknown",
+              "   REGRESSION" if is_regression else ""))
+        regressions += is_regression
+    if regressions:
+        print("\n{} regression(s) found".format(regressions))
+        return 1
+    return 0
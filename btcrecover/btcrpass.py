@@ -26,6 +26,8 @@
 import sys
 import argparse
 import itertools
+import functools
+import operator
 import string
 import re
 import multiprocessing
@@ -33,6 +35,8 @@ import signal
 import os
 import pickle
 import gc
+import mmap
+import tempfile
 import time
 import timeit
 import hashlib
@@ -44,6 +48,8 @@ import zlib
 import math
 import json
 import numbers
+import queue
+import threading
 import datetime
 import binascii
 
@@ -69,6 +75,7 @@ disable_security_warnings = True
 # wildcard_nocase_sets = None
 # wildcard_re = None
 # custom_wildcard_cache = None
+# wildcard_plan_cache = None
 # backreference_maps = None
 # backreference_maps_sha1 = None
 # io = None
@@ -106,6 +113,10 @@ except:
     # otherwise use pure python implementation
     from lib.embit.py_ripemd160 import ripemd160
 
+from .hash160batch import hash160_many, ripemd160_many
+from .packedseeds import PackedSeedList, is_packed_seedlist
+from .listindex import IndexedPasswordList, compression_module, is_compressed_file
+
 # Import modules from requirements.txt
 from Crypto.Cipher import AES
 
@@ -220,6 +231,7 @@ def init_wildcards():
     global wildcard_nocase_sets
     global wildcard_re
     global custom_wildcard_cache
+    global wildcard_plan_cache
     global backreference_maps
     global backreference_maps_sha1
     # N.B. that tstr() will not convert string.*case to Unicode correctly if the locale has
@@ -263,6 +275,7 @@ def init_wildcards():
     #
     wildcard_re = None
     custom_wildcard_cache = dict()
+    wildcard_plan_cache = dict()
     backreference_maps = dict()
     backreference_maps_sha1 = None
 
@@ -332,6 +345,13 @@ simple_typo_args["closecase"] = dict(action="store_true", help="like --typos-cas
 simple_typo_args["map"] = dict(metavar="FILE", help="replace specific characters based on a map file")
 simple_typo_args["replace"] = dict(metavar="WILDCARD-STRING",
                                    help="replace a character with another string or wildcard")
+#
+# a dict: simple typo generator function mapped to a "completion" function which, when that typo
+# is applied to the final element of a password, takes (password_prefix, password_base, i) and
+# returns just those replacements for the final element (password_base[i]) which could produce a
+# valid password given the (already typo-modified) password_prefix, in the same order as the typo
+# generator would produce them, or None if it can't narrow them down (see simple_typos_generator())
+simple_typo_completions = {}
 
 # A class decorator which adds a wallet class to the registered list
 wallet_types = []
@@ -483,6 +503,17 @@ def prompt_unicode_password(prompt, error_msg):
     return password
 
 
+# Hashes data iter_count times in a row with hash_function (e.g. hashlib.sha512), returning the final digest;
+# the CPU counterpart of the OpenCL cl_hash_iterations(). With short inputs such as a previous digest, the
+# interpreter's per-iteration overhead costs about as much as the hash itself, so the loop is unrolled.
+def hash_iterations(hash_function, data, iter_count):
+    for i in itertools.repeat(None, iter_count >> 2):
+        data = hash_function(hash_function(hash_function(hash_function(data).digest()).digest()).digest()).digest()
+    for i in itertools.repeat(None, iter_count & 3):
+        data = hash_function(data).digest()
+    return data
+
+
 ############### Bitcoin Core ###############
 
 @register_wallet_class
@@ -649,16 +680,15 @@ class WalletBitcoinCore(object):
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
     # is correct return it, else return False for item 0; return a count of passwords checked for item 1
     def _return_verified_password_or_false_cpu(self, passwords):  # Bitcoin Core
-        # Copy a global into local for a small speed boost
+        # Copy globals into locals for a small speed boost
         l_sha512 = hashlib.sha512
+        l_hash_iterations = hash_iterations
 
         # Convert Unicode strings (lazily) to UTF-8 bytestrings
         passwords = map(lambda p: p.encode("utf_8", "ignore"), passwords)
 
         for count, password in enumerate(passwords, 1):
-            derived_key = password + self._salt
-            for i in range(self._iter_count):
-                derived_key = l_sha512(derived_key).digest()
+            derived_key = l_hash_iterations(l_sha512, password + self._salt, self._iter_count)
             part_master_key = aes256_cbc_decrypt(derived_key[:32], self._part_encrypted_master_key[:16],
                                                  self._part_encrypted_master_key[16:])
             #
@@ -2662,8 +2692,7 @@ class WalletBlockchainSecondpass(WalletBlockchain):
             if iter_count:
                 if isinstance(salt, str): running_hash = salt.encode() + password
                 if isinstance(salt, bytes): running_hash = salt + password
-                for i in range(iter_count):
-                    running_hash = l_sha256(running_hash).digest()
+                running_hash = hash_iterations(l_sha256, running_hash, iter_count)
                 if running_hash == password_hash:
                     # print("Debug: Matched Second pass (Iter-Count present)")
                     # Decrypt wallet and dump if required
@@ -4559,14 +4588,14 @@ class WalletBrainwallet(object):
 
         from . import btcrseed
         # Load addresses
-        from .addressset import AddressSet
+        from .addressset import AddressSet, share_hash160s
 
         input_address_p2sh = False
         input_address_standard = False
         self.address_type_checks = []
 
         if addresses:
-            self.hash160s = btcrseed.WalletBase._addresses_to_hash160s(addresses)
+            self.hash160s = share_hash160s(btcrseed.WalletBase._addresses_to_hash160s(addresses))
             for address in addresses:
                 if address[0] == "3":
                     input_address_p2sh = True
@@ -4631,6 +4660,11 @@ class WalletBrainwallet(object):
         global pbkdf2_hmac
         pubkey_from_secret = coincurve.PublicKey.from_valid_secret
 
+        # The public keys of every password, with the (password, count, private key, whether it's compressed)
+        # each came from, collected so that their hash160s can be computed all at once (see hash160_many())
+        pubkeys = []
+        pubkey_sources = []
+
         for count, password in enumerate(passwords, 1):
             # Generate the initial Keypair
             if self.isWarpwallet:
@@ -4657,37 +4691,47 @@ class WalletBrainwallet(object):
             else:
                 privkey = (l_sha256(password.encode()).digest())
 
-            # Convert the private keys to public keys and addresses for verification.
+            # Convert the private keys to public keys and addresses for verification. (The EC multiplication
+            # is only done once, both the compressed and uncompressed public keys are formatted from its result.)
+            pubkey_point = pubkey_from_secret(privkey)
             for isCompressed in self.compression_checks:
-                if isCompressed:
-                    privcompress = bytes([0x1])
-                else:
-                    privcompress = bytes([])
+                pubkeys.append(pubkey_point.format(compressed=isCompressed))
+                pubkey_sources.append((password, count, privkey, isCompressed))
 
-                pubkey = pubkey_from_secret(privkey).format(compressed=isCompressed)
+        pubkey_hash160s = hash160_many(pubkeys)
 
-                pubkey_hash160 = ripemd160(l_sha256(pubkey).digest())
+        # Handle P2SH Segwit Addresses
+        if True in self.address_type_checks:
+            WITNESS_VERSION = "\x00\x14"
+            witness_hash160s = hash160_many([WITNESS_VERSION.encode() + pubkey_hash160
+                                             for pubkey_hash160 in pubkey_hash160s])
+        else:
+            witness_hash160s = pubkey_hash160s
 
-                for input_address_p2sh in self.address_type_checks:
-                    if (input_address_p2sh):  # Handle P2SH Segwit Address
-                        WITNESS_VERSION = "\x00\x14"
-                        witness_program = WITNESS_VERSION.encode() + pubkey_hash160
+        for (password, password_count, privkey, isCompressed), pubkey_hash160, witness_hash160 in \
+                zip(pubkey_sources, pubkey_hash160s, witness_hash160s):
+            if isCompressed:
+                privcompress = bytes([0x1])
+            else:
+                privcompress = bytes([])
 
-                        hash160 = ripemd160(l_sha256(witness_program).digest())
-                    else:
-                        hash160 = pubkey_hash160
+            for input_address_p2sh in self.address_type_checks:
+                if (input_address_p2sh):  # Handle P2SH Segwit Address
+                    hash160 = witness_hash160
+                else:
+                    hash160 = pubkey_hash160
 
-                    if hash160 in self.hash160s:
-                        privkey_wif = base58.b58encode_check(bytes([0x80]) + privkey + privcompress)
-                        print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ": NOTE Brainwallet Found using ",
-                              end="")
-                        if isCompressed:
-                            print("COMPRESSED address")
-                        else:
-                            print("UNCOMPRESSED address")
+                if hash160 in self.hash160s:
+                    privkey_wif = base58.b58encode_check(bytes([0x80]) + privkey + privcompress)
+                    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ": NOTE Brainwallet Found using ",
+                          end="")
+                    if isCompressed:
+                        print("COMPRESSED address")
+                    else:
+                        print("UNCOMPRESSED address")
 
-                        # print("Password Found:", password, ", PrivKey:", privkey_wif, ", Compressed: ", isCompressed)
-                        return password, count
+                    # print("Password Found:", password, ", PrivKey:", privkey_wif, ", Compressed: ", isCompressed)
+                    return password, password_count
 
         return False, count
 
@@ -4772,24 +4816,21 @@ class WalletBrainwallet(object):
             # Standard Sha256 Passphrase Hash
             clResult_privkeys = self.opencl_algo.cl_sha256(self.opencl_context_sha256, passwords)
 
-        # Convert the private keys to public keys and addresses for verification.
+        # Convert the private keys to public keys and addresses for verification. (The EC multiplications
+        # are only done once for the batch, for both the compressed and uncompressed public keys.)
+        pubkey_points = [pubkey_from_secret(privkey) for privkey in clResult_privkeys]
         for isCompressed in self.compression_checks:
 
-            pubkeys = []
-            for privkey in clResult_privkeys:
-
-                if isCompressed:
-                    privcompress = bytes([0x1])
-                else:
-                    privcompress = bytes([])
+            if isCompressed:
+                privcompress = bytes([0x1])
+            else:
+                privcompress = bytes([])
 
-                pubkeys.append(pubkey_from_secret(privkey).format(compressed=isCompressed))
+            pubkeys = [pubkey_point.format(compressed=isCompressed) for pubkey_point in pubkey_points]
 
             clResult_hashed_pubkey = self.opencl_algo.cl_sha256(self.opencl_context_sha256, pubkeys)
 
-            hash160s_standard = []
-            for hashed_pubkey in clResult_hashed_pubkey:
-                hash160s_standard.append(ripemd160(hashed_pubkey))
+            hash160s_standard = ripemd160_many(clResult_hashed_pubkey)
 
             hash160s = []
             for pubkey_hash160 in hash160s_standard:
@@ -4869,7 +4910,7 @@ class WalletRawPrivateKey(object):
 
         from . import btcrseed
         # Load addresses
-        from .addressset import AddressSet
+        from .addressset import AddressSet, share_hash160s
 
         input_address_p2sh = False
         input_address_standard = False
@@ -4877,10 +4918,10 @@ class WalletRawPrivateKey(object):
 
         if addresses:
             if self.crypto == 'ethereum':
-                self.hash160s = btcrseed.WalletEthereum._addresses_to_hash160s(addresses)
+                self.hash160s = share_hash160s(btcrseed.WalletEthereum._addresses_to_hash160s(addresses))
                 input_address_standard = True
             else:
-                self.hash160s = btcrseed.WalletBase._addresses_to_hash160s(addresses)
+                self.hash160s = share_hash160s(btcrseed.WalletBase._addresses_to_hash160s(addresses))
 
                 for address in addresses:
                     if address[0] == "3":
@@ -4932,6 +4973,11 @@ class WalletRawPrivateKey(object):
         hashlib_new = hashlib.new
         pubkey_from_secret = coincurve.PublicKey.from_valid_secret
 
+        # The public keys of every private key, with the (password, count, private key, compression flag) each came from,
+        # collected so that their hash160s can be computed all at once (see hash160_many())
+        pubkeys = []
+        pubkey_sources = []
+
         for count, password in enumerate(passwords, 1):
             # Generate the initial Keypair
             # print("Key:", password, " Length:", len(password))
@@ -4973,7 +5019,9 @@ class WalletRawPrivateKey(object):
                 print(message)
                 continue
 
-            # Convert the private keys to public keys and addresses for verification.
+            # Convert the private keys to public keys and addresses for verification. (The EC multiplication
+            # is only done once, both the compressed and uncompressed public keys are formatted from its result.)
+            pubkey_point = pubkey_from_secret(privkey)
             for isCompressed in self.compression_checks:
 
                 if isCompressed:
@@ -4981,29 +5029,38 @@ class WalletRawPrivateKey(object):
                 else:
                     privcompress = bytes([])
 
-                pubkey = pubkey_from_secret(privkey).format(compressed=isCompressed)
+                pubkeys.append(pubkey_point.format(compressed=isCompressed))
+                pubkey_sources.append((password, count, privkey, privcompress if WIFPrivKey else None))
 
-                if self.crypto == 'ethereum':
-                    pubkey_hash160 = keccak(pubkey[1:])[-20:]
-                else:
-                    pubkey_hash160 = ripemd160(l_sha256(pubkey).digest())
+        if self.crypto == 'ethereum':
+            pubkey_hash160s = [keccak(pubkey[1:])[-20:] for pubkey in pubkeys]
+        else:
+            pubkey_hash160s = hash160_many(pubkeys)
 
-                for input_address_p2sh in self.address_type_checks:
-                    if (input_address_p2sh):  # Handle P2SH Segwit Address
-                        WITNESS_VERSION = "\x00\x14"
-                        witness_program = WITNESS_VERSION.encode() + pubkey_hash160
-                        hash160 = ripemd160(l_sha256(witness_program).digest())
-                    else:
-                        hash160 = pubkey_hash160
+        # Handle P2SH Segwit Addresses
+        if True in self.address_type_checks:
+            WITNESS_VERSION = "\x00\x14"
+            witness_hash160s = hash160_many([WITNESS_VERSION.encode() + pubkey_hash160
+                                             for pubkey_hash160 in pubkey_hash160s])
+        else:
+            witness_hash160s = pubkey_hash160s
 
-                    if hash160 in self.hash160s:
+        for (password, password_count, privkey, privcompress), pubkey_hash160, witness_hash160 in \
+                zip(pubkey_sources, pubkey_hash160s, witness_hash160s):
+            for input_address_p2sh in self.address_type_checks:
+                if (input_address_p2sh):  # Handle P2SH Segwit Address
+                    hash160 = witness_hash160
+                else:
+                    hash160 = pubkey_hash160
+
+                if hash160 in self.hash160s:
+                    # if self.crypto == 'bitcoin':
+                    #    print("\n* * * * *\nPrivkey Found (HEX):", password, "\n* * * * *")
+                    if privcompress is not None:  # (if it was a WIF private key)
                         privkey_wif = base58.b58encode_check(bytes([0x80]) + privkey + privcompress)
-                        # if self.crypto == 'bitcoin':
-                        #    print("\n* * * * *\nPrivkey Found (HEX):", password, ", PrivKey (WIF):", privkey_wif, ", Compressed: ", isCompressed, "\n* * * * *")
-                        if WIFPrivKey:
-                            return privkey_wif, count
-                        else:
-                            return password, count
+                        return privkey_wif, password_count
+                    else:
+                        return password, password_count
 
         return False, count
 
@@ -5465,6 +5522,8 @@ class MakePeekable(object):
 #   raised by open (a "hard" fail) to pass up.
 # * For Unicode builds (when tstr == unicode), returns an io.TextIOBase which produces
 #   unicode strings if and only if mode is text (is not binary / does not contain "b").
+# * If decompress is True and the file is gzip, bz2 or xz compressed, it's decompressed
+#   as it's read (the returned file is still seekable, but seeking is slow).
 # * The results of opening stdin more than once are undefined.
 def open_or_use(filename, mode="r",
                 funccall_file=None,  # already-opened file used if filename == "__funccall"
@@ -5473,7 +5532,8 @@ def open_or_use(filename, mode="r",
                 require_data=None,  # open if file is non-empty, else return None
                 new_or_empty=None,  # open if file is new or empty, else return None
                 make_peekable=None,  # the returned file object is given a peek method
-                decoding_errors=None):  # the Unicode codec error mode (default: strict)
+                decoding_errors=None,  # the Unicode codec error mode (default: strict)
+                decompress=None):  # a compressed file is decompressed as it's read
     assert not (permit_stdin and require_data), "open_or_use: stdin cannot require_data"
     assert not (permit_stdin and new_or_empty), "open_or_use: stdin is never new_or_empty"
     assert not (require_data and new_or_empty), "open_or_use: can either require_data or be new_or_empty"
@@ -5533,7 +5593,13 @@ def open_or_use(filename, mode="r",
     if new_or_empty and os.path.exists(filename) and (os.path.getsize(filename) > 0 or not os.path.isfile(filename)):
         return None
     #
-    if tstr == str and "b" not in mode:
+    compression = decompress and "r" in mode and compression_module(filename)
+    if compression:
+        if tstr == str and "b" not in mode:
+            file = compression.open(filename, mode + "t", encoding="utf_8_sig", errors=decoding_errors)
+        else:
+            file = compression.open(filename, mode)
+    elif tstr == str and "b" not in mode:
         file = io.open(filename, mode, encoding="utf_8_sig", errors=decoding_errors)
     else:
         file = open(filename, mode)
@@ -5608,6 +5674,9 @@ def init_parser_common():
         for typo_name in itertools.chain(("swap",), simple_typo_args.keys(), ("insert",)):
             typo_types_group.add_argument("--max-typos-" + typo_name, type=int, default=sys.maxsize, metavar="#",
                                           help="limit the number of --typos-" + typo_name + " typos")
+        for typo_name in simple_typo_args.keys():
+            typo_types_group.add_argument("--min-typos-" + typo_name, type=int, default=0, metavar="#",
+                                          help="require at least this many --typos-" + typo_name + " typos")
         typo_types_group.add_argument("--max-adjacent-inserts", type=int, default=1, metavar="#",
                                       help="max # of --typos-insert strings that can be inserted "
                                            "between a single pair of characters (default: %(default)s)")
@@ -5648,6 +5717,10 @@ def init_parser_common():
         parser_common.add_argument("--no-dupchecks", "-d", action="count", default=0,
                                    help="disable duplicate guess checking to save memory; specify up to four times "
                                         "for additional effect")
+        parser_common.add_argument("--dupchecks-memory", type=int, metavar="MB",
+                                   help="store compact hashes of guesses for duplicate checking in at most about MB "
+                                        "megabytes of RAM (per duplicate checker), continuing in temporary files "
+                                        "when that runs out")
         parser_common.add_argument("--no-progress", action="store_true", default=not sys.stdout.isatty(),
                                    help="disable the progress bar")
         parser_common.add_argument("--android-pin", action="store_true",
@@ -5805,6 +5878,8 @@ def register_simple_typo(name, help=None):
     typo_types_group.add_argument("--typos-" + name, **arg_params)
     typo_types_group.add_argument("--max-typos-" + name, type=int, default=sys.maxsize, metavar="#",
                                   help="limit the number of --typos-" + name + " typos")
+    typo_types_group.add_argument("--min-typos-" + name, type=int, default=0, metavar="#",
+                                  help="require at least this many --typos-" + name + " typos")
 
     def decorator(simple_typo_generator):
         simple_typos[name] = simple_typo_generator
@@ -5813,6 +5888,18 @@ def register_simple_typo(name, help=None):
     return decorator
 
 
+# Decorator which registers a completion function (see simple_typo_completions above)
+# for a simple typo which was previously registered with register_simple_typo()
+def register_simple_typo_completion(name):
+    assert name in simple_typos, "simple typo must already exist"
+
+    def decorator(simple_typo_completion):
+        simple_typo_completions[simple_typos[name]] = simple_typo_completion
+        return simple_typo_completion
+
+    return decorator
+
+
 # A basic function which takes a list of arguments and strips the ones that will change the
 # passwords that will be checked in some way
 # This is called twice when trynig to restore an autosave file.
@@ -5827,6 +5914,7 @@ def clean_autosave_args(argList, listName):
                           ("--opencl-devices", True),
                           ("--no-eta", False),
                           ("--no-dupchecks", False),
+                          ("--dupchecks-memory", True),
                           ("--no-progress", False),
                           ("--enable-gpu", False),
                           ("--global-ws", True),
@@ -5881,10 +5969,12 @@ def clean_autosave_args(argList, listName):
 # check_only     - (similar in concept to --regex-only) a boolean function accepting an
 #                  item just before it is passed to return_verified_password_or_false()
 #                  which should return False if the the item should not be checked.
+# session        - a SearchSession shared by consecutive searches of the same wallet,
+#                  e.g. seedrecover's search phases (see SearchSession below)
 #
 # TODO: document kwds usage (as used by unit tests)
 def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterator=None, inserted_items=None,
-                    check_only=None, disable_security_warning_param=False, **kwds):
+                    check_only=None, disable_security_warning_param=False, session=None, **kwds):
     # effective_argv is what we are effectively given, either via the command line, via embedded
     # options in the tokenlist file, or as a result of restoring a session, before any argument
     # processing or defaulting is done (unless it's is done by argparse). Each time effective_argv
@@ -5926,6 +6016,9 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
     parser.add_argument("--has-wildcards", action="store_true",
                         help="parse and expand wildcards inside passwordlists "
                              "(default: wildcards are only parsed inside tokenlists)")
+    parser.add_argument("--passwordlist-index", action="store_true",
+                        help="build (or update) and use an index of the passwordlist file, saved alongside it, so "
+                             "that its passwords can be counted and skipped without reading them")
 
     #
     # Optional bash tab completion support
@@ -5964,6 +6057,9 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
         parser.add_argument("--has-wildcards", action="store_true",
                             help="parse and expand wildcards inside passwordlists "
                                  "(default: disabled for passwordlists)")
+        parser.add_argument("--passwordlist-index", action="store_true",
+                            help="build (or update) and use an index of the passwordlist file, saved alongside it, "
+                                 "so that its passwords can be counted and skipped without reading them")
         parser.add_argument("--tokenlist", metavar="FILE", help="the list of tokens/partial passwords (required)")
         parser.add_argument("--max-tokens", type=int, default=sys.maxsize, metavar="COUNT",
                             help="enforce a max # of tokens included per guess")
@@ -6178,6 +6274,19 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
                 print("Warning: --max-typos-" + typo_name + " (" + str(
                     typo_max) + ") is limited by the number of --typos (" + str(args.typos) + ")", file=sys.stderr)
 
+    # Sanity check the --min-typos-* options (which are only supported by the simple typos)
+    for typo_name in simple_typos.keys():
+        typo_min = args.__dict__["min_typos_" + typo_name]
+        if typo_min > 0:
+            if not args.__dict__["typos_" + typo_name]:
+                error_exit("--min-typos-" + typo_name + " requires --typos-" + typo_name)
+            if typo_min > args.__dict__["max_typos_" + typo_name]:
+                error_exit("--min-typos-" + typo_name + " must be <= --max-typos-" + typo_name)
+            if args.typos is not None and typo_min > args.typos:
+                error_exit("--min-typos-" + typo_name + " must be <= --typos")
+        elif typo_min < 0:
+            error_exit("--min-typos-" + typo_name + " must be >= 0")
+
     # Sanity check --typos--closecase
     if args.typos_closecase and args.typos_case:
         print("Warning: specifying --typos-case disables --typos-closecase", file=sys.stderr)
@@ -6231,6 +6340,20 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
             sum_max_simple_typos = sys.maxsize
         else:  # else all were specified
             sum_max_simple_typos = sum(max_simple_typos)
+    #
+    # Likewise for min_simple_typos and sum_min_simple_typos
+    global min_simple_typos, sum_min_simple_typos
+    min_simple_typos = None
+    sum_min_simple_typos = 0
+    if enabled_simple_typos:
+        min_simple_typos = [args.__dict__["min_typos_" + name]
+                            for name in simple_typos.keys()
+                            if args.__dict__["typos_" + name]]
+        sum_min_simple_typos = sum(min_simple_typos)
+        if sum_min_simple_typos > args.typos:
+            error_exit("the sum of the --min-typos-* options must be <= --typos")
+        if not sum_min_simple_typos:  # if none were specified
+            min_simple_typos = None
 
     # Sanity check --max-adjacent-inserts (inserts are not a "simple" typo)
     if args.max_adjacent_inserts != 1:
@@ -6420,6 +6543,9 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
     if wallet:
         loaded_wallet = wallet
 
+    global search_session
+    search_session = session
+
     # Load the wallet file (this sets the loaded_wallet global)
     if args.wallet:
         if args.android_pin:
@@ -6885,9 +7011,37 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
     # If we're using a passwordlist file, open it here. If we're opening stdin, read in at least an
     # initial portion. If we manage to read up until EOF, then we won't need to disable ETA features.
     # TODO: support --autosave with --passwordlist files and short stdin inputs
-    global passwordlist_file, initial_passwordlist, passwordlist_allcached
-    passwordlist_file = open_or_use(args.passwordlist, "r", kwds.get("passwordlist"),
-                                    permit_stdin=True, decoding_errors="replace")
+    global passwordlist_file, initial_passwordlist, passwordlist_allcached, packed_seedlist, indexed_passwordlist
+    packed_seedlist = indexed_passwordlist = None
+    if args.seedgenerator and args.passwordlist and not kwds.get("passwordlist") and \
+            is_packed_seedlist(args.passwordlist):
+        # A packed seed list (see packedseeds.py) is memory-mapped and read by packed_seedlist_base_password_generator()
+        try:
+            packed_seedlist = PackedSeedList.fromfiles(seedlist_filenames())
+        except ValueError as e:
+            error_exit(e)
+        print("Notice: Loaded packed seed list with {:,} seeds".format(len(packed_seedlist)))
+        passwordlist_file = None
+        has_any_wildcards = False
+        base_password_generator = packed_seedlist_base_password_generator
+    elif args.passwordlist and args.passwordlist_index:
+        # A passwordlist index (see listindex.py) is built or brought up to date here, and then used by
+        # indexed_passwordlist_base_password_generator() to read the passwordlist from any line onwards
+        if args.passwordlist == "-" or kwds.get("passwordlist"):
+            error_exit("--passwordlist-index requires a --passwordlist file")
+        if args.has_wildcards:
+            error_exit("--passwordlist-index can't be used with --has-wildcards")
+        try:
+            indexed_passwordlist = IndexedPasswordList.fromfiles(seedlist_filenames(), passwordlist_index_progress)
+        except (IOError, OSError, ValueError) as e:
+            error_exit(e)
+        print("Notice: Loaded passwordlist index with {:,} lines".format(len(indexed_passwordlist)))
+        passwordlist_file = None
+        has_any_wildcards = False
+        base_password_generator = indexed_passwordlist_base_password_generator
+    else:
+        passwordlist_file = open_or_use(args.passwordlist, "r", kwds.get("passwordlist"),
+                                        permit_stdin=True, decoding_errors="replace", decompress=True)
     try:
         loaded_wallet.passwordlist_file = args.passwordlist
         # There are some instance where the generator will be initialised without a loaded wallet, so ignore these
@@ -6945,7 +7099,7 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
 
     # Some final sanity checking, now that args.no_eta's value is known
     if args.no_eta:  # always true for --listpass and --performance
-        if not args.no_dupchecks:
+        if not args.no_dupchecks and not args.dupchecks_memory:
             if args.performance:
                 print("Warning: --performance without --no-dupchecks will eventually cause an out-of-memory error",
                       file=sys.stderr)
@@ -6983,7 +7137,7 @@ def parse_arguments(effective_argv, wallet=None, base_iterator=None, perf_iterat
             error_exit("can't use stdin for both --passwordlist and --exclude-passwordlist")
         #
         global password_dups
-        password_dups = DuplicateChecker()
+        password_dups = new_duplicate_checker()
         sha1 = hashlib.sha1() if savestate else None
         try:
             for excluded_pw in exclude_file:
@@ -7467,6 +7621,187 @@ class DuplicateChecker(object):
         self._run_number += 1
 
 
+# An open-addressing (linear probing) hash table of fixed-width records, each a 16-byte key (a hash
+# digest, never all zeros) followed by value_bytes bytes of an unsigned value. Tables draw on a shared
+# memory budget (a one-item list of bytes still available); a table which grows beyond what's left is
+# moved into a temporary file which the OS pages in and out as needed, so it gets slower instead of
+# running out of memory.
+class _HashedKeyTable(object):
+    KEY_BYTES = 16
+    NULL_KEY = bytes(KEY_BYTES)
+    MAX_LOAD = 0.5  # (linear probing slows down quickly past this)
+
+    def __init__(self, value_bytes, budget, table_len=1 << 16):
+        assert table_len & (table_len - 1) == 0, "_HashedKeyTable: table_len is a power of 2"
+        self._value_bytes = value_bytes
+        self._record_bytes = self.KEY_BYTES + value_bytes
+        self._budget = budget
+        self._ram_bytes = 0  # how much of the budget this table is holding
+        self._len = 0
+        self._data = self._file = None
+        self._resize(table_len)
+
+    def __len__(self):
+        return self._len
+
+    # Replaces the table with an empty one of table_len records, and then reinserts the old records
+    def _resize(self, table_len):
+        old_data, old_file = self._data, self._file
+        table_bytes = table_len * self._record_bytes
+        available = self._budget[0] + self._ram_bytes
+        if table_bytes <= available:
+            self._data = bytearray(table_bytes)
+            self._file = None
+            self._ram_bytes = table_bytes
+        else:
+            if old_file is None:
+                print("\nNotice: the duplicate checker has exceeded its memory budget and will continue in a "
+                      "temporary file (which is slower)", file=sys.stderr)
+            self._file = tempfile.TemporaryFile(prefix="btcrecover-dups-")
+            self._file.truncate(table_bytes)
+            self._data = mmap.mmap(self._file.fileno(), table_bytes)
+            self._ram_bytes = 0
+        self._budget[0] = available - self._ram_bytes
+        self._table_len = table_len
+        self._mask = table_len - 1
+        self._max_len = int(table_len * self.MAX_LOAD)
+        if old_data is not None:
+            l_data = self._data
+            l_record_bytes = self._record_bytes
+            l_null_key = self.NULL_KEY
+            l_mask = self._mask
+            l_from_bytes = int.from_bytes
+            table_bytes = table_len * l_record_bytes
+            for old_pos in range(0, len(old_data), l_record_bytes):
+                record = old_data[old_pos : old_pos + l_record_bytes]
+                if record[:16] == l_null_key:
+                    continue
+                pos = (l_from_bytes(record[:8], "little") & l_mask) * l_record_bytes
+                while l_data[pos : pos + 16] != l_null_key:
+                    pos += l_record_bytes
+                    if pos == table_bytes:
+                        pos = 0
+                l_data[pos : pos + l_record_bytes] = record
+            if old_file is not None:
+                old_data.close()
+                old_file.close()
+
+    # Returns the byte offset of the key's record, or of the empty slot where it belongs, and whether it was found
+    def _find(self, key):
+        l_data = self._data
+        l_null_key = self.NULL_KEY
+        l_record_bytes = self._record_bytes
+        table_bytes = self._table_len * l_record_bytes
+        pos = (int.from_bytes(key[:8], "little") & self._mask) * l_record_bytes
+        while True:
+            cur_key = l_data[pos : pos + 16]
+            if cur_key == key:
+                return pos, True
+            if cur_key == l_null_key:
+                return pos, False
+            pos += l_record_bytes
+            if pos == table_bytes:
+                pos = 0
+
+    def __contains__(self, key):
+        return self._find(key)[1]
+
+    # Returns the value stored with key, or 0 if it isn't present
+    def get(self, key):
+        pos, found = self._find(key)
+        if not found:
+            return 0
+        return int.from_bytes(self._data[pos + 16 : pos + self._record_bytes], "little")
+
+    # Adds key with value if key isn't present; returns True if it was already present (its value is unchanged)
+    def add(self, key, value=0):
+        pos, found = self._find(key)
+        if found:
+            return True
+        self._data[pos : pos + self._record_bytes] = key + value.to_bytes(self._value_bytes, "little")
+        self._len += 1
+        if self._len > self._max_len:
+            # (grow faster while in RAM, where reinserting everything is most of the cost)
+            self._resize(self._table_len * (2 if self._file else 4))
+        return False
+
+    def set(self, key, value):
+        pos, found = self._find(key)
+        if found:
+            self._data[pos + 16 : pos + self._record_bytes] = value.to_bytes(self._value_bytes, "little")
+        else:
+            self.add(key, value)
+
+    def close(self):
+        if self._file is not None:
+            self._data.close()
+            self._file.close()
+        self._data = self._file = None
+        self._budget[0] += self._ram_bytes
+        self._ram_bytes = 0
+
+    def __del__(self):
+        if self._file is not None:
+            self.close()
+
+
+# A DuplicateChecker which remembers 128-bit hashes of the items it has seen instead of the items themselves,
+# in compact tables which together use at most about memory_budget bytes of RAM (see _HashedKeyTable above).
+# Its results are the same as those of DuplicateChecker (barring a hash collision, which is negligibly likely).
+class HashedDuplicateChecker(DuplicateChecker):
+    EXCLUDE = 2 ** 32 - 1  # (the values are stored as 4 bytes)
+
+    def __init__(self, memory_budget):
+        super(HashedDuplicateChecker, self).__init__()
+        budget = [memory_budget]
+        self._seen_once = _HashedKeyTable(0, budget)  # the hashes of potential duplicates in run 0 only
+        self._duplicates = _HashedKeyTable(4, budget)  # the hashes of known duplicates and their values
+        self._any_excluded = False
+
+    # Returns the key stored in the tables for a password (a str) or a token combination (a tuple)
+    @staticmethod
+    def _key(x):
+        key = hashlib.blake2b((x if type(x) is str else repr(x)).encode("utf_8", "surrogatepass"),
+                              digest_size=16).digest()
+        return key if key != _HashedKeyTable.NULL_KEY else b"\x01" + key[1:]
+
+    def is_duplicate(self, x):
+        x = self._key(x)
+
+        # Unlike DuplicateChecker, exclusions are added directly to _duplicates, and items aren't removed
+        # from _seen_once, so in run 0 any item in _duplicates which isn't excluded is also in _seen_once
+        if self._run_number == 0:
+            if self._seen_once.add(x) if self._tracking else x in self._seen_once:
+                self._duplicates.add(x, 1)  # (unless it's already a known duplicate or excluded)
+                return True
+            return self._any_excluded and x in self._duplicates
+
+        duplicate = self._duplicates.get(x)  # ==EXCLUDE if it's excluded
+        if duplicate:
+            if duplicate <= self._run_number:
+                self._duplicates.set(x, self._run_number + 1)
+                return False
+            else:
+                return True
+        return False
+
+    def exclude(self, x):
+        self._duplicates.set(self._key(x), self.EXCLUDE)
+        self._any_excluded = True
+
+    def run_finished(self):
+        if self._run_number == 0:
+            self._seen_once.close()  # returns its memory to the budget
+        super(HashedDuplicateChecker, self).run_finished()
+
+
+# Returns a new HashedDuplicateChecker if --dupchecks-memory was specified, else a DuplicateChecker
+def new_duplicate_checker():
+    if args.dupchecks_memory:
+        return HashedDuplicateChecker(args.dupchecks_memory * 1024 * 1024)
+    return DuplicateChecker()
+
+
 # The main generator function produces all possible requested password permutations with no
 # duplicates from the token_lists global as constructed above plus wildcard expansion or from
 # the passwordlist file, plus up to a certain number of requested typos. Results are produced
@@ -7486,7 +7821,10 @@ def init_password_generator():
 
 
 #
-def password_generator(chunksize=1, only_yield_count=False):
+# If start_index is specified, the generator begins at that (zero-based) password index without
+# generating the skipped passwords; this requires password_space_is_seekable() to be True. (With
+# --worker, start_index counts only the passwords assigned to this worker.)
+def password_generator(chunksize=1, only_yield_count=False, start_index=0):
     assert chunksize > 0, "password_generator: chunksize > 0"
     global cavcsC
     cavcsC = cavcsC + 1
@@ -7514,7 +7852,7 @@ def password_generator(chunksize=1, only_yield_count=False):
     # if they should be used; see its usage below for more details
     global password_dups
     if password_dups is None and args.no_dupchecks < 1 and args.seedgenerator == False:
-        password_dups = DuplicateChecker()
+        password_dups = new_duplicate_checker()
 
     # Copy a few globals into local for a small speed boost
     l_generator_product = generator_product
@@ -7532,35 +7870,36 @@ def password_generator(chunksize=1, only_yield_count=False):
         l_worker_id = worker_id
 
     # Build up the modification_generators list; see the inner loop below for more details
-    modification_generators = []
-    if l_seed_generator is False:
-        # If using generators to generate seed phrases from token/password list, then ignore modification generators
-        if has_any_wildcards:
-            modification_generators.append(expand_wildcards_generator)
-        if args.password_repeats_pretypos:
-            modification_generators.append(password_repeats_generator)
-        if args.typos_capslock:
-            modification_generators.append(capslock_typos_generator)
-        if args.typos_swap:
-            modification_generators.append(swap_typos_generator)
-        if enabled_simple_typos:
-            modification_generators.append(simple_typos_generator)
-        if args.typos_insert:
-            modification_generators.append(insert_typos_generator)
-        if args.password_repeats_posttypos:
-            modification_generators.append(password_repeats_generator)
+    modification_generators = build_modification_generators()
     modification_generators_len = len(modification_generators)
 
-    # Only the last typo generator needs to enforce a min-typos requirement
-    if args.min_typos and (l_seed_generator is False):
-        assert modification_generators[-1] != expand_wildcards_generator
-        # set the min_typos argument default value
-        modification_generators[-1].__defaults__ = (args.min_typos,)
+    # If nothing below can discard or alter a password (save for --length-max and --truncate-length, which
+    # are checked per chunk), then the passwords are taken from the modification_iterator a chunk at a time
+    l_bulk = not (l_regex_only or l_regex_never or l_length_min or custom_final_checker or l_password_dups or
+                  l_args_worker or generatingSeeds)
+    l_islice = itertools.islice
 
     # The base password generator is set in parse_arguments(); it's either an iterable
     # or a generator function (which returns an iterator) that produces base passwords
     # usually based on either a tokenlist file (as parsed above) or a passwordlist file.
-    for password_base in base_password_generator() if callable(base_password_generator) else base_password_generator:
+    # If seeking, the first base password produced might have some of its variations
+    # skipped, so its modification_iterator is prepared in advance by seek_password_space().
+    # With --worker, if possible only the passwords assigned to this worker are generated (and start_index
+    # counts only these), so they're produced by worker_password_generator() with no further modifications.
+    if l_args_worker and password_space_is_seekable():
+        password_base_iterator = worker_password_generator(worker_password_index(start_index), modification_generators)
+        first_modification_iterator = None
+        modification_generators_len = 0
+        l_args_worker = False
+    elif start_index:
+        assert password_space_is_seekable(), "password_generator: start_index requires a seekable password space"
+        password_base_iterator, first_modification_iterator, skipped = \
+            seek_password_space(start_index, modification_generators)
+    else:
+        password_base_iterator = base_password_generator() if callable(base_password_generator) \
+            else base_password_generator
+        first_modification_iterator = None
+    for password_base in password_base_iterator:
         # The for loop below takes the password_base and applies zero or more modifications
         # to it to produce a number of different possible variations of password_base (e.g.
         # different wildcard expansions, typos, etc.)
@@ -7576,7 +7915,10 @@ def password_generator(chunksize=1, only_yield_count=False):
                              'super', 'pave', 'cluster']:
             print("found at:" + str(cavcsC))
             # modification_iterator = modification_generators[0](password_base)
-        if modification_generators_len:
+        if first_modification_iterator:
+            modification_iterator = first_modification_iterator
+            first_modification_iterator = None
+        elif modification_generators_len:
             if modification_generators_len == 1:
                 modification_iterator = modification_generators[0](password_base)
             else:
@@ -7586,6 +7928,33 @@ def password_generator(chunksize=1, only_yield_count=False):
         else:
             modification_iterator = (password_base,)
 
+        if l_bulk:
+            modification_iterator = iter(modification_iterator)
+            while True:
+                passwords_chunk = list(l_islice(modification_iterator, max(chunksize - passwords_count, 1)))
+                if not passwords_chunk:
+                    break
+                longest = max(map(len, passwords_chunk))
+                if l_length_max and longest > l_length_max:
+                    passwords_chunk = [password for password in passwords_chunk if len(password) <= l_length_max]
+                if l_truncate_length is not None and longest > l_truncate_length:
+                    passwords_chunk = [password[0:l_truncate_length] for password in passwords_chunk]
+                passwords_count += len(passwords_chunk)
+                if not only_yield_count:
+                    passwords_gathered.extend(passwords_chunk)
+                if passwords_count >= chunksize:
+                    new_args = yield passwords_count if only_yield_count else passwords_gathered
+                    passwords_gathered = []
+                    passwords_count = 0
+
+                # Process new arguments received from .send(), yielding nothing back to send()
+                if new_args:
+                    chunksize, only_yield_count = new_args
+                    assert chunksize > 0, "password_generator.send: chunksize > 0"
+                    new_args = None
+                    yield
+            modification_iterator = ()  # (skip the loop below)
+
         for password in modification_iterator:
 
             # Check the password against the --regex-only and --regex-never options
@@ -7649,7 +8018,9 @@ def password_generator(chunksize=1, only_yield_count=False):
                 new_args = None
                 yield
 
-        assert typos_sofar == 0, "password_generator: typos_sofar == 0 after all typo generators have finished"
+        # (worker_password_generator() runs its own typo generators, which may be paused mid-password here)
+        assert typos_sofar == 0 or not modification_generators_len, \
+            "password_generator: typos_sofar == 0 after all typo generators have finished"
 
     if l_password_dups:
         l_password_dups.run_finished()
@@ -7659,6 +8030,37 @@ def password_generator(chunksize=1, only_yield_count=False):
         yield passwords_count if only_yield_count else passwords_gathered
 
 
+# Builds the list of modification generators which password_generator() applies (in order) to
+# each base password, based on the token_lists (are any wildcards present?) and the program
+# options (were any typos requested?). Also sets the min-typos requirement of the last one.
+def build_modification_generators():
+    modification_generators = []
+    if args.seedgenerator is False:
+        # If using generators to generate seed phrases from token/password list, then ignore modification generators
+        if has_any_wildcards:
+            modification_generators.append(expand_wildcards_generator)
+        if args.password_repeats_pretypos:
+            modification_generators.append(password_repeats_generator)
+        if args.typos_capslock:
+            modification_generators.append(capslock_typos_generator)
+        if args.typos_swap:
+            modification_generators.append(swap_typos_generator)
+        if enabled_simple_typos:
+            modification_generators.append(simple_typos_generator)
+        if args.typos_insert:
+            modification_generators.append(insert_typos_generator)
+        if args.password_repeats_posttypos:
+            modification_generators.append(password_repeats_generator)
+
+    # Only the last typo generator needs to enforce a min-typos requirement
+    if args.min_typos and (args.seedgenerator is False):
+        assert modification_generators[-1] != expand_wildcards_generator
+        # set the min_typos argument default value
+        modification_generators[-1].__defaults__ = (args.min_typos,)
+
+    return modification_generators
+
+
 # This generator utility is a bit like itertools.product. It takes a list of iterators
 # and invokes them in (the equivalent of) a nested for loop, except instead of a list
 # of simple iterators it takes a list of generators each of which expects to be called
@@ -7672,26 +8074,86 @@ def password_generator(chunksize=1, only_yield_count=False):
 # designed to produce a number of variations of an initial value, and you'd like to
 # string them together to get all possible (product-wise) variations.
 #
-# TODO: implement without recursion?
+# (It's implemented with a stack of the generators' iterators instead of recursion, which
+# calls the generators in the same order but without a generator frame for each level.)
 def generator_product(initial_value, generator, *other_generators):
     if other_generators == ():
         for final_value in generator(initial_value):
             yield final_value
-    else:
-        for intermediate_value in generator(initial_value):
-            for final_value in generator_product(intermediate_value, *other_generators):
-                yield final_value
+        return
+    generators = (generator,) + other_generators
+    last_generator = generators[-1]
+    last_depth = len(other_generators) - 1  # the depth of the iterator which produces the values for last_generator
+    iterators = [generator(initial_value)]
+    while iterators:
+        for intermediate_value in iterators[-1]:
+            depth = len(iterators) - 1
+            if depth == last_depth:
+                for final_value in last_generator(intermediate_value):
+                    yield final_value
+            else:
+                iterators.append(generators[depth + 1](intermediate_value))
+                break
+        else:
+            iterators.pop()
 
 
 # The tokenlist generator function produces all possible password permutations from the
 # token_lists global as constructed by parse_tokenlist(). These passwords are then used
 # by password_generator() as base passwords that can undergo further modifications.
-def tokenlist_base_password_generator():
+# If tokens_combinations is specified, it must be an iterator created by
+# tokenlist_combinations_generator(), and only the passwords from its remaining
+# combinations are produced (this is used when seeking, see seek_password_space()).
+def tokenlist_base_password_generator(tokens_combinations=None):
+    # Copy a few globals into local for a small speed boost
+    l_tokenlist_guesses_generator = tokenlist_guesses_generator
+    permutations_function = tokenlist_permutations_function()
+
+    if tokens_combinations is None:
+        tokens_combinations = tokenlist_combinations_generator()
+
+    for tokens_combination in tokens_combinations:
+        # tokens_combination[0] is tokens_combination_nopos (see tokenlist_combinations_generator() below)
+        for guess in l_tokenlist_guesses_generator(tokens_combination,
+                                                   tokenlist_orderings(tokens_combination, permutations_function)):
+            yield guess
+
+
+# Chooses between the custom duplicate-checking and the standard itertools permutation functions
+# for tokenlist_base_password_generator()'s outer loop, unless the custom one has been specifically
+# disabled with three (or more) --no-dupcheck options. Returns a function which takes a sequence
+# of tokens and returns an iterable of all their (ordered) permutations.
+def tokenlist_permutations_function():
+    # Temporary Fix for the "--keep-tokens-order" argument.
+    # Hasn't been fully tested in BTCRecover.py and breaks seedrecover...
+    try:
+        if args.keep_tokens_order:
+            pass
+    except:
+        if args.seedgenerator:
+            args.keep_tokens_order = False
+
+    if args.keep_tokens_order:
+        return lambda x: [tuple(reversed(x))]
+    if args.no_dupchecks < 3 and has_any_duplicate_tokens:
+        return permutations_nodups
+    return itertools.permutations
+
+
+# Produces all the (unordered) combinations of tokens which tokenlist_base_password_generator() will
+# permute into passwords. Each combination produced is a tuple of:
+#   tokens_combination_nopos -- all the tokens of the combination except for positional anchors
+#   positional_anchors       -- None, or a list of strings/None's with the text of positional anchors
+#   rel_anchors_count        -- the number of relative anchors in tokens_combination_nopos
+#   has_any_mid_anchors      -- True iff there are middle anchors in tokens_combination_nopos
+# If start_index is specified, the underlying product of token_lists begins at that index (this is
+# only valid if every token_lists line is required, see seek_tokenlist_password_space() ).
+def tokenlist_combinations_generator(start_index=0):
     # Initialize this global if not already initialized but only
     # if they should be used; see its usage below for more details
     global token_combination_dups
     if token_combination_dups is None and args.no_dupchecks < 2 and has_any_duplicate_tokens:
-        token_combination_dups = DuplicateChecker()
+        token_combination_dups = new_duplicate_checker()
 
     # Copy a few globals into local for a small speed boost
     l_len = len
@@ -7702,30 +8164,7 @@ def tokenlist_base_password_generator():
     l_token_combination_dups = token_combination_dups
     l_tuple = tuple
     l_sorted = sorted
-    l_list = list
     l_tstr = tstr
-    l_seed_generator = args.seedgenerator
-    l_mnemonic_length = args.mnemonic_length
-
-    # Temporary Fix for the "--keep-tokens-order" argument.
-    # Hasn't been fully tested in BTCRecover.py and breaks seedrecover...
-    try:
-        if args.keep_tokens_order:
-            pass
-    except:
-        if l_seed_generator:
-            args.keep_tokens_order = False
-
-    # Choose between the custom duplicate-checking and the standard itertools permutation
-    # functions for the outer loop unless the custom one has been specifically disabled
-    # with three (or more) --no-dupcheck options.
-    if args.keep_tokens_order:
-        permutations_function = lambda x: [tuple(reversed(x))]
-    else:
-        if args.no_dupchecks < 3 and has_any_duplicate_tokens:
-            permutations_function = permutations_nodups
-        else:
-            permutations_function = itertools.permutations
 
     # The outer loop iterates through all possible (unordered) combinations of tokens
     # taking into account the at-most-one-token-per-line rule. Note that lines which
@@ -7738,9 +8177,11 @@ def tokenlist_base_password_generator():
     # First choose which product generator to use: the custom product_limitedlen
     # might be faster (possibly a lot) if a large --min-tokens or any --max-tokens
     # is specified at the command line, otherwise use the standard itertools version.
-    using_product_limitedlen = l_args_min_tokens > 5 or l_args_max_tokens < sys.maxsize
+    using_product_limitedlen = (l_args_min_tokens > 5 or l_args_max_tokens < sys.maxsize) and not start_index
     if using_product_limitedlen:
         product_generator = product_limitedlen(*token_lists, minlen=l_args_min_tokens, maxlen=l_args_max_tokens)
+    elif start_index:
+        product_generator = product_from_index(token_lists, start_index)
     else:
         product_generator = itertools.product(*token_lists)
 
@@ -7833,76 +8274,92 @@ def tokenlist_base_password_generator():
                 l_token_combination_dups.is_duplicate(l_tuple(l_sorted(tokens_combination, key=l_tstr))):
             continue
 
-        # The inner loop iterates through all valid permutations (orderings) of one
-        # combination of tokens and combines the tokens to create a password string.
-        # Because positionally anchored tokens can only appear in one position, they
-        # are not passed to the permutations_function.
-        for ordered_token_guess in permutations_function(tokens_combination_nopos):
-            # If multiple relative anchors are in a guess, they must appear in the correct
-            # relative order. If any are out of place, we continue on to the next guess.
-            # Otherwise, we remove the anchor information leaving only the string behind.
-            if rel_anchors_count:
-                invalid_anchors = False
-                last_relative_pos = 0
-                for i, token in enumerate(ordered_token_guess):
-                    if l_type(token) == AnchoredToken and token.type == AnchoredToken.RELATIVE:
-                        if token.pos < last_relative_pos:
-                            invalid_anchors = True
-                            break
+        yield tokens_combination_nopos, positional_anchors, rel_anchors_count, has_any_mid_anchors
+
+    if l_token_combination_dups: l_token_combination_dups.run_finished()
+
+
+# Produces the guesses (base passwords) for a single combination of tokens as produced by
+# tokenlist_combinations_generator(), given an iterable of orderings of its tokens_combination_nopos
+# (usually as produced by the function returned from tokenlist_permutations_function() ).
+def tokenlist_guesses_generator(tokens_combination, ordered_token_guesses):
+    tokens_combination_nopos, positional_anchors, rel_anchors_count, has_any_mid_anchors = tokens_combination
+
+    # Copy a few globals into local for a small speed boost
+    l_type = type
+    l_list = list
+    l_tstr = tstr
+    l_seed_generator = args.seedgenerator
+    l_mnemonic_length = args.mnemonic_length
+
+    # The inner loop iterates through all valid permutations (orderings) of one
+    # combination of tokens and combines the tokens to create a password string.
+    # Because positionally anchored tokens can only appear in one position, they
+    # are not passed to the permutations_function.
+    for ordered_token_guess in ordered_token_guesses:
+        # If multiple relative anchors are in a guess, they must appear in the correct
+        # relative order. If any are out of place, we continue on to the next guess.
+        # Otherwise, we remove the anchor information leaving only the string behind.
+        if rel_anchors_count:
+            invalid_anchors = False
+            last_relative_pos = 0
+            for i, token in enumerate(ordered_token_guess):
+                if l_type(token) == AnchoredToken and token.type == AnchoredToken.RELATIVE:
+                    if token.pos < last_relative_pos:
+                        invalid_anchors = True
+                        break
+                    if l_type(ordered_token_guess) != l_list:
+                        ordered_token_guess = l_list(ordered_token_guess)
+                    ordered_token_guess[i] = token.text  # now it's just a string
+                    if rel_anchors_count == 1:  # with only one, it's always valid
+                        break
+                    last_relative_pos = token.pos
+            if invalid_anchors: continue
+
+        # Insert the positional anchors we removed above back into the guess
+        if positional_anchors:
+            ordered_token_guess = l_list(ordered_token_guess)
+            for i, token in enumerate(positional_anchors):
+                if token is not None:
+                    ordered_token_guess.insert(i, token)  # (token here is just a string)
+
+        # The last type of anchor has a range of possible positions for the anchored
+        # token. If any anchored token is outside of its permissible range, we continue
+        # on to the next guess. Otherwise, we remove the anchor information leaving
+        # only the string behind.
+        if has_any_mid_anchors:
+            if l_type(ordered_token_guess[0]) == AnchoredToken or \
+                    l_type(ordered_token_guess[-1]) == AnchoredToken:
+                continue  # middle anchors are never permitted at the beginning or end
+            invalid_anchors = False
+            for i, token in enumerate(ordered_token_guess[1:-1], 1):
+                if l_type(token) == AnchoredToken:
+                    assert token.type == AnchoredToken.MIDDLE, "only middle/range anchors left"
+                    if token.begin <= i <= token.end:
                         if l_type(ordered_token_guess) != l_list:
                             ordered_token_guess = l_list(ordered_token_guess)
                         ordered_token_guess[i] = token.text  # now it's just a string
-                        if rel_anchors_count == 1:  # with only one, it's always valid
-                            break
-                        last_relative_pos = token.pos
-                if invalid_anchors: continue
-
-            # Insert the positional anchors we removed above back into the guess
-            if positional_anchors:
-                ordered_token_guess = l_list(ordered_token_guess)
-                for i, token in enumerate(positional_anchors):
-                    if token is not None:
-                        ordered_token_guess.insert(i, token)  # (token here is just a string)
-
-            # The last type of anchor has a range of possible positions for the anchored
-            # token. If any anchored token is outside of its permissible range, we continue
-            # on to the next guess. Otherwise, we remove the anchor information leaving
-            # only the string behind.
-            if has_any_mid_anchors:
-                if l_type(ordered_token_guess[0]) == AnchoredToken or \
-                        l_type(ordered_token_guess[-1]) == AnchoredToken:
-                    continue  # middle anchors are never permitted at the beginning or end
-                invalid_anchors = False
-                for i, token in enumerate(ordered_token_guess[1:-1], 1):
-                    if l_type(token) == AnchoredToken:
-                        assert token.type == AnchoredToken.MIDDLE, "only middle/range anchors left"
-                        if token.begin <= i <= token.end:
-                            if l_type(ordered_token_guess) != l_list:
-                                ordered_token_guess = l_list(ordered_token_guess)
-                            ordered_token_guess[i] = token.text  # now it's just a string
-                        else:
-                            invalid_anchors = True
-                            break
-                if invalid_anchors:
-                    continue
-
-            if l_seed_generator:
-                expandedGuess = []
-                for rawToken in ordered_token_guess:
-                    expandedGuess.extend(rawToken.split(","))
-
-                if l_mnemonic_length is None:  # If mnemonic_length hasn't been specified then skip this check
-                    yield expandedGuess
-                else:
-                    if len(expandedGuess) == l_mnemonic_length:  # Only return mnemonic guesses of the expected length
-                        yield expandedGuess
                     else:
+                        invalid_anchors = True
                         break
+            if invalid_anchors:
+                continue
+
+        if l_seed_generator:
+            expandedGuess = []
+            for rawToken in ordered_token_guess:
+                expandedGuess.extend(rawToken.split(","))
 
+            if l_mnemonic_length is None:  # If mnemonic_length hasn't been specified then skip this check
+                yield expandedGuess
             else:
-                yield l_tstr().join(ordered_token_guess)
+                if len(expandedGuess) == l_mnemonic_length:  # Only return mnemonic guesses of the expected length
+                    yield expandedGuess
+                else:
+                    return
 
-    if l_token_combination_dups: l_token_combination_dups.run_finished()
+        else:
+            yield l_tstr().join(ordered_token_guess)
 
 
 # Like itertools.product, but only produces output tuples whose length is between
@@ -8048,6 +8505,566 @@ def permutations_nodups(sequence):
             yield (choice,) + rest
 
 
+# Returns an iterable of the orderings of a tokens_combination's tokens_combination_nopos (as produced by
+# tokenlist_combinations_generator() ) to pass to tokenlist_guesses_generator(). When relative or middle
+# anchors restrict the orderings, only those orderings which tokenlist_guesses_generator() won't reject
+# are produced (see anchored_permutations() below), otherwise this is just permutations_function's.
+def tokenlist_orderings(tokens_combination, permutations_function):
+    tokens_combination_nopos, positional_anchors, rel_anchors_count, has_any_mid_anchors = tokens_combination
+    if (rel_anchors_count > 1 or has_any_mid_anchors) and \
+            permutations_function in (itertools.permutations, permutations_nodups):
+        return anchored_permutations(tokens_combination_nopos, positional_anchors,
+                                     permutations_function == permutations_nodups)
+    return permutations_function(tokens_combination_nopos)
+
+
+# Like itertools.permutations(sequence) or (if nodups) like permutations_nodups(sequence), but only
+# produces the permutations whose relative anchors are in order and whose middle anchors are within
+# their ranges (taking into account the positional_anchors which will be inserted into them, as in
+# tokenlist_guesses_generator() ), in the same order. Rather than generating every permutation and
+# rejecting the invalid ones, tokens are only placed where they can be part of a valid permutation.
+def anchored_permutations(sequence, positional_anchors, nodups):
+    sequence = tuple(sequence)
+    sequence_len = len(sequence)
+
+    # The positions in the final guess of each position in a permutation, once positional anchors are inserted
+    if positional_anchors:
+        guess_positions = [i for i, token in enumerate(positional_anchors) if token is None]
+        guess_len = len(positional_anchors)
+    else:
+        guess_positions = list(range(sequence_len))
+        guess_len = sequence_len
+    assert len(guess_positions) == sequence_len, "anchored_permutations: one position per token"
+
+    # For each token, its relative anchor order (or None), and the range of permutation positions it may
+    # occupy (middle anchors are never permitted at the beginning or end of the guess)
+    rel_positions = [None] * sequence_len
+    first_allowed = [0] * sequence_len
+    last_allowed = [sequence_len - 1] * sequence_len
+    for i, token in enumerate(sequence):
+        if type(token) == AnchoredToken:
+            if token.type == AnchoredToken.RELATIVE:
+                rel_positions[i] = token.pos
+            else:
+                assert token.type == AnchoredToken.MIDDLE, "only relative and middle anchors left"
+                begin, end = token.begin, min(token.end, guess_len - 2)
+                allowed = [k for k, pos in enumerate(guess_positions) if begin <= pos <= end]
+                if not allowed:
+                    return
+                first_allowed[i], last_allowed[i] = allowed[0], allowed[-1]
+    mid_tokens = [i for i in range(sequence_len) if last_allowed[i] < sequence_len - 1 or first_allowed[i] > 0]
+    rel_tokens = [i for i in range(sequence_len) if rel_positions[i] is not None]
+
+    # A depth-first search which chooses the token at each position k of the permutation in turn,
+    # trying the unused tokens in the order of their index in sequence (as the permutation functions
+    # do), and backtracking once no unused token can be placed at k
+    used = [False] * sequence_len
+    chosen = [0] * sequence_len
+    seen = [None] * sequence_len  # if nodups, the tokens already tried at each position
+    k = i = 0
+    seen[0] = set()
+    while True:
+        while i < sequence_len:
+            if not used[i]:
+                if nodups:
+                    token = sequence[i]
+                    if token in seen[k]:
+                        i += 1
+                        continue
+                    seen[k].add(token)
+                # It must be within its range, a relative anchor mustn't precede one with a lower order,
+                # and each unused middle anchor must still have a position available after this one
+                if first_allowed[i] <= k <= last_allowed[i] and \
+                        (rel_positions[i] is None or
+                         all(used[j] or rel_positions[j] >= rel_positions[i] for j in rel_tokens)) and \
+                        all(used[j] or j == i or last_allowed[j] > k for j in mid_tokens):
+                    break
+            i += 1
+        if i == sequence_len:  # nothing more can be placed at k: backtrack
+            k -= 1
+            if k < 0:
+                return
+            i = chosen[k]
+            used[i] = False
+            i += 1
+            continue
+        if k == sequence_len - 1:
+            chosen[k] = i
+            yield tuple([sequence[j] for j in chosen])
+            i += 1
+            continue
+        chosen[k] = i
+        used[i] = True
+        k += 1
+        i = 0
+        if nodups:
+            seen[k] = set()
+
+
+# Returns the product of the numbers (like math.prod(), which requires Python 3.8+)
+def product_of(numbers):
+    return functools.reduce(operator.mul, numbers, 1)
+
+
+# Like itertools.product(*sequences), but begins at the (zero-based) index-th product without
+# generating any of the products before it (the products are numbered in mixed-radix order,
+# with the first sequence being the most significant)
+def product_from_index(sequences, index):
+    if not index:
+        for product in itertools.product(*sequences):
+            yield product
+        return
+    sequences = tuple(sequences)
+    rest_count = product_of(len(seq) for seq in sequences[1:])
+    first, rest_index = divmod(index, rest_count)
+    if first >= len(sequences[0]):
+        return  # index is past the end
+    # Finish the products which begin with the first chosen element, then continue normally
+    first_choice = (sequences[0][first],)
+    for rest in product_from_index(sequences[1:], rest_index):
+        yield first_choice + rest
+    for product in itertools.product(sequences[0][first + 1:], *sequences[1:]):
+        yield product
+
+
+# Returns the number of permutations produced by either itertools.permutations(sequence)
+# or (if nodups) by permutations_nodups(sequence)
+def permutations_count(sequence, nodups=False):
+    count = math.factorial(len(sequence))
+    if nodups:
+        for repeats in collections.Counter(sequence).values():
+            count //= math.factorial(repeats)
+    return count
+
+
+# Like itertools.permutations(sequence) or (if nodups) like permutations_nodups(sequence), but
+# begins at the (zero-based) index-th permutation without generating any of those before it
+def permutations_from_index(sequence, index, nodups=False):
+    permutations_function = permutations_nodups if nodups else itertools.permutations
+    if not index:
+        for permutation in permutations_function(sequence):
+            yield permutation
+        return
+    sequence = tuple(sequence)
+    # Both functions produce their permutations in the order of their first elements (choosing
+    # the first element by its position in sequence, but only once per unique value if nodups)
+    seen = set()
+    for i, choice in enumerate(sequence):
+        if nodups:
+            if choice in seen: continue
+            seen.add(choice)
+        rest = sequence[:i] + sequence[i + 1:]
+        if index:
+            rest_count = permutations_count(rest, nodups)
+            if index >= rest_count:
+                index -= rest_count
+                continue
+            for permutation in permutations_from_index(rest, index, nodups):
+                yield (choice,) + permutation
+            index = 0
+        else:
+            for permutation in permutations_function(rest):
+                yield (choice,) + permutation
+
+
+# Returns the number of passwords expand_wildcards_generator() produces from the string passed
+# to it, or None if this can't be calculated without expanding it (only expanding wildcards,
+# i.e. those with character sets, can be counted; contracting and backreference ones can't)
+def count_wildcard_expansions(password_with_wildcards):
+    if tstr("%") not in password_with_wildcards:
+        return 1
+    slots, rest = compiled_wildcard_plan(password_with_wildcards)
+    count = product_of(map(len, slots))
+    for match in compiled_wildcard_re().finditer(rest):
+        if match.group("bref"):
+            return None
+        wildcard_set = expanding_wildcard_set(match)
+        if wildcard_set is None:
+            return None
+        wildcard_minlen, wildcard_maxlen = wildcard_length_range(match)
+        wildcard_set_len = len(wildcard_set)
+        count *= sum(wildcard_set_len ** wildcard_len for wildcard_len in range(wildcard_minlen, wildcard_maxlen + 1))
+    return count
+
+
+# Produces the same passwords as expand_wildcards_generator(password_with_wildcards), but begins at the
+# (zero-based) start_index-th password without generating any of those before it. This can only be
+# used when count_wildcard_expansions(password_with_wildcards) is not None. The prior_prefix argument
+# is only used internally while recursing.
+def expand_wildcards_from_index(password_with_wildcards, start_index, prior_prefix=None):
+    if prior_prefix is None: prior_prefix = tstr()
+    if not start_index:
+        for password_expanded in expand_wildcards_generator(password_with_wildcards, prior_prefix):
+            yield password_expanded
+        return
+
+    # The first wildcard is the most significant "digit" of start_index
+    match = compiled_wildcard_re().search(password_with_wildcards)
+    assert match, "expand_wildcards_from_index: parsed valid wildcard spec"
+    full_password_prefix = prior_prefix + password_with_wildcards[0:match.start()]
+    password_postfix_with_wildcards = password_with_wildcards[match.end():]
+    wildcard_set = expanding_wildcard_set(match)
+    assert wildcard_set, "expand_wildcards_from_index: only expanding wildcards can be seeked"
+    wildcard_minlen, wildcard_maxlen = wildcard_length_range(match)
+    first_index, rest_index = divmod(start_index, count_wildcard_expansions(password_postfix_with_wildcards))
+
+    for wildcard_len in range(wildcard_minlen, wildcard_maxlen + 1):
+        wildcard_len_count = len(wildcard_set) ** wildcard_len
+        if first_index >= wildcard_len_count:
+            first_index -= wildcard_len_count
+            continue
+        for wildcard_expanded_list in product_from_index((wildcard_set,) * wildcard_len, first_index):
+            for password_expanded in expand_wildcards_from_index(
+                    password_postfix_with_wildcards, rest_index,
+                    full_password_prefix + tstr().join(wildcard_expanded_list)):
+                yield password_expanded
+            rest_index = 0
+        first_index = 0
+
+
+# Returns the number of passwords produced by applying the modification_generators (as returned by
+# build_modification_generators() ) to password_base, calculating it directly if possible
+def modifications_count(password_base, modification_generators):
+    if not modification_generators:
+        return 1
+
+    # Wildcards (if they're only expanding ones) are counted directly when they're the only modification
+    if modification_generators[0] == expand_wildcards_generator:
+        if len(modification_generators) == 1:
+            count = count_wildcard_expansions(password_base)
+            if count is not None:
+                return count
+
+    # Typos are counted directly per number of typos, and these counts combined, if it's possible
+    elif any(all(generator in countable for generator in modification_generators)
+             for countable in COUNTABLE_TYPOS_SEQUENCES):
+        counts = [1]
+        for generator in modification_generators:
+            generator_counts = TYPOS_COUNTS_FUNCTIONS[generator](password_base)
+            combined_counts = [0] * min(len(counts) + len(generator_counts) - 1, args.typos + 1)
+            for i, count in enumerate(counts):
+                for j, generator_count in enumerate(generator_counts[:len(combined_counts) - i]):
+                    combined_counts[i + j] += count * generator_count
+            counts = combined_counts
+        return sum(counts[args.min_typos:])
+
+    # Otherwise count them the slow way (the typo generators track the typos applied so far in typos_sofar,
+    # which only password_generator() otherwise initializes)
+    global typos_sofar
+    typos_sofar = 0
+    if len(modification_generators) == 1:
+        modification_iterator = modification_generators[0](password_base)
+    else:
+        modification_iterator = generator_product(password_base, *modification_generators)
+    return sum(1 for password in modification_iterator)
+
+
+# Returns an iterator which produces the passwords produced by applying the modification_generators
+# to password_base, beginning with the (zero-based) start_index-th one
+def modifications_iterator_from_index(password_base, modification_generators, start_index):
+    if not modification_generators:
+        assert start_index == 0
+        return iter((password_base,))
+    if modification_generators == [expand_wildcards_generator] and \
+            count_wildcard_expansions(password_base) is not None:
+        return expand_wildcards_from_index(password_base, start_index)
+    global typos_sofar
+    typos_sofar = 0  # (see modifications_count())
+    if len(modification_generators) == 1:
+        modification_iterator = modification_generators[0](password_base)
+    else:
+        modification_iterator = generator_product(password_base, *modification_generators)
+    # (the typo generators must run to completion to properly reset typos_sofar, so islice is used)
+    return itertools.islice(modification_iterator, start_index, None)
+
+
+# Returns True iff the passwords produced by password_generator() are a simple function of the base
+# passwords produced by tokenlist_base_password_generator(), such that password_generator() can begin
+# at any password index without generating those skipped, and such that they can be counted without
+# generating them. This requires that nothing discards any of the generated passwords before --worker
+# assignment: no duplicate checking, no --regex-only/--regex-never, --length-min/max, or in-generator
+# checksums. (With --worker, the password indexes are those of the passwords assigned to this worker.)
+# The lines of a packed seed list or of an indexed passwordlist are also seekable, as long as they
+# aren't modified any further.
+def password_space_is_seekable():
+    if indexed_base_passwords_count() is not None:
+        if build_modification_generators():
+            return False
+    elif base_password_generator is not tokenlist_base_password_generator:
+        return False
+    elif args.no_dupchecks < 2 and has_any_duplicate_tokens:
+        return False
+    if password_dups or args.no_dupchecks < 1 and not args.seedgenerator:
+        return False
+    if regex_only or regex_never or custom_final_checker:
+        return False
+    if args.length_min or args.length_max < 999999:  # (the default --length-max)
+        return False
+    try:
+        if loaded_wallet._checksum_in_generator:
+            return False
+    except AttributeError:
+        pass
+    return True
+
+
+# Returns the permutations_function from tokenlist_permutations_function() and the nodups argument which
+# corresponds to it for permutations_count() and permutations_from_index(), or None for nodups if each
+# tokens_combination is only ever produced in one order (with --keep-tokens-order)
+def tokenlist_permutations_functions():
+    permutations_function = tokenlist_permutations_function()
+    if args.keep_tokens_order:
+        return permutations_function, None
+    return permutations_function, permutations_function == permutations_nodups
+
+
+# Returns a tuple of an iterator of tokens combinations (as produced by tokenlist_combinations_generator() )
+# and the index of the first password produced from its first combination, which is at or before the
+# (zero-based) start_index-th password. When each combination produces the same number of passwords (if
+# every line has a required token, so every combination has the same length, and if those lengths and the
+# number of variations of each base password don't depend on the tokens), entire combinations are skipped
+# at once, otherwise the iterator begins with the first combination.
+def seek_tokens_combinations(start_index, permutations_function, nodups, modification_generators):
+    tokens_combinations = tokenlist_combinations_generator()
+    if start_index and token_lists and not modification_generators and not has_any_anchors and \
+            all(None not in token_list for token_list in token_lists) and \
+            not (args.seedgenerator and args.mnemonic_length is not None and
+                 any(tstr(",") in token for token_list in token_lists for token in token_list)):
+        first_tokens_combination = next(tokens_combinations, None)
+        tokens_combinations.close()
+        if first_tokens_combination is None:
+            return iter(()), 0
+        combination_count = tokenlist_combination_count(first_tokens_combination, permutations_function,
+                                                        nodups, modification_generators)[0]
+        if not combination_count:
+            return iter(()), 0
+        combinations_total = product_of(len(token_list) for token_list in token_lists)
+        combination_index = min(start_index // combination_count, combinations_total)
+        if combination_index == combinations_total:
+            return iter(()), combination_index * combination_count
+        return tokenlist_combinations_generator(combination_index), combination_index * combination_count
+    return tokens_combinations, 0
+
+
+# Locates the (zero-based) start_index-th password which password_generator() would produce (ignoring
+# --worker), and returns a tuple of: an iterator of the base passwords beginning with the one from which
+# it's produced, an iterator of the variations (modifications) of that first base password beginning with
+# the start_index-th password, and the count of passwords before it. If there are start_index or fewer
+# passwords, returns the total count of passwords (and an empty base password iterator) instead. The
+# seeking performed takes time proportional to the number of token combinations, not to the number of
+# passwords skipped.
+def seek_password_space(start_index, modification_generators):
+    assert password_space_is_seekable(), "seek_password_space: password_space_is_seekable()"
+
+    # Each seed of a packed seed list (or line of an indexed passwordlist) is a single password
+    base_passwords_count = indexed_base_passwords_count()
+    if base_passwords_count is not None:
+        if start_index >= base_passwords_count:
+            return iter(()), None, base_passwords_count
+        return base_password_generator(start_index), None, start_index
+
+    permutations_function, nodups = tokenlist_permutations_functions()
+    tokens_combinations, skipped = seek_tokens_combinations(start_index, permutations_function, nodups,
+                                                            modification_generators)
+
+    for tokens_combination in tokens_combinations:
+        combination_count, count_per_guess = tokenlist_combination_count(
+            tokens_combination, permutations_function, nodups, modification_generators)
+        if skipped + combination_count <= start_index:
+            skipped += combination_count
+            continue
+
+        # The start_index-th password is produced from one of the guesses of this tokens_combination
+        tokens_combination_nopos = tokens_combination[0]
+        if count_per_guess:
+            permutation_index, modification_index = divmod(start_index - skipped, count_per_guess)
+            if nodups is None:
+                ordered_token_guesses = permutations_function(tokens_combination_nopos)
+            else:
+                ordered_token_guesses = permutations_from_index(tokens_combination_nopos, permutation_index, nodups)
+            guesses = tokenlist_guesses_generator(tokens_combination, ordered_token_guesses)
+            first_guess = next(guesses)
+        else:
+            guesses = tokenlist_guesses_generator(tokens_combination,
+                                                  tokenlist_orderings(tokens_combination, permutations_function))
+            for first_guess in guesses:
+                guess_count = modifications_count(first_guess, modification_generators)
+                if skipped + guess_count > start_index:
+                    break
+                skipped += guess_count
+            modification_index = start_index - skipped
+
+        password_base_iterator = itertools.chain((first_guess,), guesses,
+                                                 tokenlist_base_password_generator(tokens_combinations))
+        return password_base_iterator, \
+            modifications_iterator_from_index(first_guess, modification_generators, modification_index), \
+            start_index
+
+    return iter(()), None, skipped
+
+
+# With --worker, returns the number of passwords assigned to this worker out of the first passwords_count
+# passwords (before --worker assignment); without --worker, simply returns passwords_count
+def worker_passwords_count(passwords_count):
+    if not args.worker:
+        return passwords_count
+    cycles, remainder = divmod(passwords_count, workers_total)
+    return cycles * len(worker_id) + sum(1 for i in worker_id if i < remainder)
+
+
+# With --worker, returns the index (before --worker assignment) of the (zero-based) worker_index-th password
+# assigned to this worker; without --worker, simply returns worker_index
+def worker_password_index(worker_index):
+    if not args.worker:
+        return worker_index
+    cycles, i = divmod(worker_index, len(worker_id))
+    return cycles * workers_total + sorted(worker_id)[i]
+
+
+# With --worker, produces the same passwords as password_generator() would after discarding those
+# not assigned to this worker, but without generating those not assigned wherever possible: token
+# combinations and permutations without any assigned passwords are skipped, and only the assigned
+# wildcard expansions are built. The passwords keep the same --worker assignments as before (every
+# workers_total-th password, by index), beginning with the (zero-based) start_index-th password
+# (before --worker assignment). Requires password_space_is_seekable().
+def worker_password_generator(start_index, modification_generators):
+    assert password_space_is_seekable(), "worker_password_generator: password_space_is_seekable()"
+    l_workers_total = workers_total
+    worker_ids = frozenset(worker_id)
+
+    # Each seed of a packed seed list (or line of an indexed passwordlist) is a single password,
+    # so the unassigned ones are skipped by index
+    if indexed_base_passwords_count() is not None:
+        seeds = base_password_generator(start_index)
+        if len(worker_ids) == 1:
+            seeds = itertools.islice(seeds, (worker_id[0] - start_index) % l_workers_total, None, l_workers_total)
+        else:
+            seeds = (seed for i, seed in enumerate(seeds, start_index) if i % l_workers_total in worker_ids)
+        for seed in seeds:
+            yield seed
+        return
+
+    permutations_function, nodups = tokenlist_permutations_functions()
+    tokens_combinations, offset = seek_tokens_combinations(start_index, permutations_function, nodups,
+                                                           modification_generators)
+    for tokens_combination in tokens_combinations:
+        combination_count, count_per_guess = tokenlist_combination_count(
+            tokens_combination, permutations_function, nodups, modification_generators)
+        combination_end = offset + combination_count
+        first_index = max(offset, start_index)
+        if combination_end <= first_index or \
+                combination_end - first_index < l_workers_total and \
+                not any(i % l_workers_total in worker_ids for i in range(first_index, combination_end)):
+            offset = combination_end
+            continue
+
+        tokens_combination_nopos = tokens_combination[0]
+        if count_per_guess:
+            # Skip the permutations before the first one with an unskipped password
+            permutation_index = (first_index - offset) // count_per_guess
+            if nodups is None or not permutation_index:
+                ordered_token_guesses = permutations_function(tokens_combination_nopos)
+            else:
+                ordered_token_guesses = permutations_from_index(tokens_combination_nopos, permutation_index, nodups)
+            guess_offset = offset + permutation_index * count_per_guess
+            # If each permutation produces a single password, the unassigned permutations are skipped without
+            # building their guesses (every workers_total-th permutation if there's only one worker_id)
+            if count_per_guess == 1:
+                if len(worker_ids) == 1:
+                    skip_count = (worker_id[0] - guess_offset) % l_workers_total
+                    ordered_token_guesses = itertools.islice(ordered_token_guesses, skip_count, None, l_workers_total)
+                else:
+                    ordered_token_guesses = (ordered_token_guess for i, ordered_token_guess
+                                             in enumerate(ordered_token_guesses, guess_offset)
+                                             if i % l_workers_total in worker_ids)
+                for guess in tokenlist_guesses_generator(tokens_combination, ordered_token_guesses):
+                    for password in modifications_iterator_from_index(guess, modification_generators, 0):
+                        yield password
+            else:
+                for guess in tokenlist_guesses_generator(tokens_combination, ordered_token_guesses):
+                    for password in worker_modifications_generator(guess, modification_generators, guess_offset,
+                                                                   count_per_guess, start_index):
+                        yield password
+                    guess_offset += count_per_guess
+        else:
+            guess_offset = offset
+            for guess in tokenlist_guesses_generator(tokens_combination,
+                                                     tokenlist_orderings(tokens_combination, permutations_function)):
+                guess_count = modifications_count(guess, modification_generators)
+                if guess_offset + guess_count > start_index:
+                    for password in worker_modifications_generator(guess, modification_generators, guess_offset,
+                                                                   guess_count, start_index):
+                        yield password
+                guess_offset += guess_count
+
+        offset = combination_end
+
+
+# Produces the variations (modifications) of password_base which are assigned to this worker (see
+# worker_password_generator() above), given the index of its first variation and their count
+WORKER_MIN_UNRANKING_STRIDE = 32  # building a wildcard expansion from its index costs ~ generating this many
+
+
+def worker_modifications_generator(password_base, modification_generators, offset, count, start_index):
+    l_workers_total = workers_total
+    worker_ids = frozenset(worker_id)
+    first_index = max(offset, start_index)
+
+    # When few of the passwords are assigned to this worker, expanding wildcards are
+    # built directly from the index of each assigned password, skipping the rest
+    if l_workers_total >= WORKER_MIN_UNRANKING_STRIDE and modification_generators == [expand_wildcards_generator] \
+            and count_wildcard_expansions(password_base) is not None:
+        for i in range(first_index, offset + count):
+            if i % l_workers_total in worker_ids:
+                yield next(expand_wildcards_from_index(password_base, i - offset))
+        return
+
+    # Otherwise they're generated and those not assigned are discarded (any typo
+    # generators must also run to completion to properly reset typos_sofar)
+    if len(worker_ids) == 1:
+        first_index += (worker_id[0] - first_index) % l_workers_total
+        if first_index >= offset + count:
+            return
+        modification_iterator = itertools.islice(
+            modifications_iterator_from_index(password_base, modification_generators, first_index - offset),
+            0, None, l_workers_total)
+    else:
+        modification_iterator = (password for i, password in enumerate(modifications_iterator_from_index(
+            password_base, modification_generators, first_index - offset), first_index)
+            if i % l_workers_total in worker_ids)
+    for password in modification_iterator:
+        yield password
+
+
+# Returns a tuple of the number of passwords password_generator() produces from a tokens_combination (as
+# produced by tokenlist_combinations_generator() ), and the number per base password if every one of
+# its base passwords produces the same number of passwords (or None if not).
+def tokenlist_combination_count(tokens_combination, permutations_function, nodups, modification_generators):
+    tokens_combination_nopos, positional_anchors, rel_anchors_count, has_any_mid_anchors = tokens_combination
+
+    # Unless relative or middle anchors restrict the orderings, and as long as the number of variations
+    # (modifications) of a base password doesn't depend on the ordering of its tokens (which is the case
+    # for expanding wildcards, capslock typos, and insert typos, but not for e.g. swap typos), then the
+    # number of passwords is the same for every ordering, so only the first ordering need be considered
+    if not rel_anchors_count and not has_any_mid_anchors and \
+            all(generator in (expand_wildcards_generator, capslock_typos_generator, insert_typos_generator)
+                for generator in modification_generators):
+        guesses = tokenlist_guesses_generator(tokens_combination, permutations_function(tokens_combination_nopos))
+        first_guess = next(guesses, None)
+        guesses.close()
+        if first_guess is None:
+            return 0, None  # (e.g. an unexpected --mnemonic-length)
+        count_per_guess = modifications_count(first_guess, modification_generators)
+        if nodups is None:
+            return count_per_guess, count_per_guess
+        return permutations_count(tokens_combination_nopos, nodups) * count_per_guess, count_per_guess
+
+    # Otherwise every base password must be generated (but not their variations, if they can be counted)
+    guesses = tokenlist_guesses_generator(tokens_combination,
+                                          tokenlist_orderings(tokens_combination, permutations_function))
+    return sum(modifications_count(guess, modification_generators) for guess in guesses), None
+
+
 MAX_PASSWORDLIST_WARNINGS = 100
 
 
@@ -8066,7 +9083,7 @@ def passwordlist_warn(line_num, *args):
 # (which is created by parse_arguments if the file is stdin). These passwords are then
 # used by password_generator() as base passwords that can undergo further modifications.
 def passwordlist_base_password_generator():
-    global initial_passwordlist, passwordlist_warnings
+    global initial_passwordlist
     global passwordlist_file
     global loaded_wallet
 
@@ -8083,25 +9100,25 @@ def passwordlist_base_password_generator():
             multiFile = loaded_wallet.load_multi_file_seedlist  # There are some instances where this will run without a loaded wallet, in these instances, just set multi file to false
         except AttributeError:
             multiFile = False
-        file_suffix = ""
-        filename = args.passwordlist + file_suffix
+        filename = args.passwordlist
         assert not passwordlist_file.closed
 
         for i in range(9999):
             if multiFile:
-                file_suffix = "_" + '{:04d}'.format(i) + ".txt"
-                filename = args.passwordlist[:-9] + file_suffix
+                filename = multi_file_seedlist_filename(i)
             if firstRun:
                 firstRun = False
                 print("Notice: Loading File: ", filename)
             else:
                 try:
-                    passwordlist_file = open_or_use(filename, "r", decoding_errors="replace")
+                    passwordlist_file = open_or_use(filename, "r", decoding_errors="replace", decompress=True)
                     print("Notice: Loading File: ", filename)
                 except FileNotFoundError:
                     continue
 
-            for line_num, password_base in enumerate(passwordlist_file, line_num):  # not yet syntax-checked
+            # Compressed files are decompressed (and decoded) in a separate thread while these lines are processed
+            lines = read_ahead_lines(passwordlist_file) if is_compressed_file(passwordlist_file) else passwordlist_file
+            for line_num, password_base in enumerate(lines, line_num):  # not yet syntax-checked
                 password_base = password_base.strip("\r\n")
                 try:
                     check_chars_range(password_base, "line", no_replacement_chars=True)
@@ -8120,8 +9137,7 @@ def passwordlist_base_password_generator():
                         continue
 
                 if args.seedgenerator:
-                    yield password_base.replace("'", "").replace(",", "").strip('()[]').split(
-                        ' ')  # Gracefully handle seed lists files formatted as tuples, lists or just raw spaced words
+                    yield seedlist_line_words(password_base)
                 else:
                     yield password_base
 
@@ -8130,11 +9146,7 @@ def passwordlist_base_password_generator():
                 break
             passwordlist_file.close()
 
-    if passwordlist_warnings:
-        if passwordlist_warnings > MAX_PASSWORDLIST_WARNINGS:
-            print("\n" + "Warning:", passwordlist_warnings - MAX_PASSWORDLIST_WARNINGS,
-                  "additional warnings were suppressed", file=sys.stderr)
-        passwordlist_warnings = None  # ignore warnings during future runs of the same passwordlist
+    passwordlist_warnings_finished()
 
     try:
         # Prepare for a potential future run of the same passwordlist
@@ -8149,6 +9161,126 @@ def passwordlist_base_password_generator():
         pass
 
 
+# Splits a line of a seed list into its words, gracefully handling seed list
+# files formatted as Python tuples or lists, or just as raw spaced words
+def seedlist_line_words(line):
+    return line.replace("'", "").replace(",", "").strip('()[]').split(' ')
+
+
+# Called after a passwordlist has been read to its end
+def passwordlist_warnings_finished():
+    global passwordlist_warnings
+    if passwordlist_warnings:
+        if passwordlist_warnings > MAX_PASSWORDLIST_WARNINGS:
+            print("\n" + "Warning:", passwordlist_warnings - MAX_PASSWORDLIST_WARNINGS,
+                  "additional warnings were suppressed", file=sys.stderr)
+        passwordlist_warnings = None  # ignore warnings during future runs of the same passwordlist
+
+
+# Produces the lines of a file, as iterating over the file does, except that they're read (and decompressed and
+# decoded) in a separate thread, up to READ_AHEAD_BLOCKS blocks of about READ_AHEAD_BLOCK_SIZE characters ahead
+READ_AHEAD_BLOCK_SIZE = 1024 * 1024
+READ_AHEAD_BLOCKS = 8
+
+
+def read_ahead_lines(file):
+    blocks = queue.Queue(READ_AHEAD_BLOCKS)
+    stopping = threading.Event()  # set if the lines are no longer needed
+
+    def put_block(block):
+        while not stopping.is_set():
+            try:
+                blocks.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read_blocks():
+        try:
+            while not stopping.is_set():
+                block = file.readlines(READ_AHEAD_BLOCK_SIZE)
+                put_block(block)
+                if not block:  # EOF
+                    break
+        except BaseException as e:
+            put_block(e)
+
+    reader_thread = threading.Thread(target=read_blocks, daemon=True)
+    reader_thread.start()
+    try:
+        while True:
+            block = blocks.get()
+            if isinstance(block, BaseException):
+                raise block
+            if not block:
+                break
+            for line in block:
+                yield line
+    finally:
+        stopping.set()
+        reader_thread.join()
+
+
+# Returns the filename of the file_num-th file of a multi-file seed list, which are named like the first (the
+# --passwordlist or seedrecover's --seedlist) but with a different _NNNN suffix (before any file extensions)
+def multi_file_seedlist_filename(file_num):
+    match = re.match(r"(.*)_\d{4}((?:\.\w+)*)$", args.passwordlist)
+    if match:
+        return match.group(1) + "_" + '{:04d}'.format(file_num) + match.group(2)
+    return args.passwordlist[:-9] + "_" + '{:04d}'.format(file_num) + args.passwordlist[-4:]
+
+
+# Returns the files which make up the --passwordlist (or seedrecover's --seedlist): just the one file unless
+# it's a multi-file seed list, which is every existing file named like the first but with a _NNNN suffix
+def seedlist_filenames():
+    try:
+        multiFile = loaded_wallet.load_multi_file_seedlist
+    except AttributeError:
+        multiFile = False
+    if not multiFile:
+        return [args.passwordlist]
+    return [filename for filename in (multi_file_seedlist_filename(i) for i in range(9999))
+            if os.path.isfile(filename)]
+
+
+# Produces the seeds of a packed seed list, beginning with the (zero-based) start_index-th one. They're
+# lists of words, the same as those produced by passwordlist_base_password_generator() with --seedgenerator.
+def packed_seedlist_base_password_generator(start_index=0):
+    return packed_seedlist.seeds(start_index)
+
+
+# Produces the lines of an indexed passwordlist (see listindex.py), beginning with the (zero-based) start_index-th
+# valid one. They're the same as those produced by passwordlist_base_password_generator() from the same files.
+def indexed_passwordlist_base_password_generator(start_index=0):
+    l_seedgenerator = args.seedgenerator
+    for line_num, password_base in indexed_passwordlist.lines(start_index):
+        if password_base is None:
+            passwordlist_warn(line_num, "contains an invalid UTF-8 byte sequence")
+        elif l_seedgenerator:
+            yield seedlist_line_words(password_base)
+        else:
+            yield password_base
+    passwordlist_warnings_finished()
+
+
+# Displays the progress of building or updating a passwordlist index (see listindex.py)
+def passwordlist_index_progress(filename, fraction):
+    if fraction is None:
+        print("Notice: Indexing passwordlist file:", filename)
+    elif sys.stderr.isatty():
+        print("\r  {:.0%} indexed".format(fraction), end="\n" if fraction >= 1.0 else "", file=sys.stderr)
+
+
+# Returns the number of base passwords in a packed seed list or an indexed passwordlist, which can be produced
+# by base_password_generator() beginning with any of them, or None if the base passwords are from elsewhere
+def indexed_base_passwords_count():
+    if base_password_generator is packed_seedlist_base_password_generator:
+        return len(packed_seedlist)
+    if base_password_generator is indexed_passwordlist_base_password_generator:
+        return len(indexed_passwordlist)
+    return None
+
+
 # Produces an infinite number of base passwords for performance measurements. These passwords
 # are then used by password_generator() as base passwords that can undergo further modifications.
 def default_performance_base_password_generator():
@@ -8156,38 +9288,141 @@ def default_performance_base_password_generator():
         yield tstr("Measure Performance ") + tstr(i)
 
 
-# This generator function expands (or contracts) all wildcards in the string passed
-# to it, or if there are no wildcards it simply produces the string unchanged. The
-# prior_prefix argument is only used internally while recursing, and is needed to
-# support backreference wildcards. The returned value is:
+# Returns the compiled regex which finds wildcard parameters in the format %[[min,]max][caseflag]type
+# where caseflag == "i" if present and type is one of: wildcard_keys, "<", ">", or "-" (e.g. "%d",
+# "%-", "%2n", "%1,3ia", etc.), or type is of the form "[custom-wildcard-set]", or for backreferences
+# type is of the form: [ ";file;" ["#"] | ";#" ] "b"  <--brackets denote options
+def compiled_wildcard_re():
+    global wildcard_re
+    if not wildcard_re:
+        wildcard_re = re.compile(
+            r"%(?:(?:(?P<min>\d+),)?(?P<max>\d+))?(?P<nocase>i)?(?:(?P<type>[{}<>-])|\[(?P<custom>.+?)\]|(?:;(?:(?P<bfile>.+?);)?(?P<bpos>\d+)?)?(?P<bref>b))" \
+                .format(wildcard_keys))
+    return wildcard_re
+
+
+# Given a wildcard_re match of a non-backreference wildcard, returns the set of possible
+# characters based on the wildcard type and caseflag, or None if it's a contracting wildcard
+def expanding_wildcard_set(match):
+    m_custom, m_nocase = match.group("custom", "nocase")
+    if m_custom:  # a custom set wildcard, e.g. %[abcdef0-9]
+        wildcard_set = custom_wildcard_cache.get((m_custom, m_nocase))
+        if wildcard_set is None:
+            wildcard_set = build_wildcard_set(m_custom)
+            if m_nocase:
+                # Build a case-insensitive version
+                wildcard_set_caseswapped = wildcard_set.swapcase()
+                if wildcard_set_caseswapped != wildcard_set:
+                    wildcard_set = duplicates_removed(wildcard_set + wildcard_set_caseswapped)
+            custom_wildcard_cache[(m_custom, m_nocase)] = wildcard_set
+    else:  # either a "normal" or a contracting wildcard
+        m_type = match.group("type")
+        if m_type in "<>-":
+            return None
+        if m_nocase and m_type in wildcard_nocase_sets:
+            wildcard_set = wildcard_nocase_sets[m_type]
+        else:
+            wildcard_set = wildcard_sets[m_type]
+    assert wildcard_set, "expanding_wildcard_set: found expanding wildcard set"
+    return wildcard_set
+
+
+# Given a wildcard_re match, extracts or defaults the wildcard min and max length
+def wildcard_length_range(match):
+    wildcard_maxlen = match.group("max")
+    wildcard_maxlen = int(wildcard_maxlen) if wildcard_maxlen else 1
+    wildcard_minlen = match.group("min")
+    wildcard_minlen = int(wildcard_minlen) if wildcard_minlen else wildcard_maxlen
+    return wildcard_minlen, wildcard_maxlen
+
+
+# Compiles a password with wildcards into a plan for expanding it, a tuple of:
+#   slots -- a tuple of tuples of strings, one for each literal span (with a single string) and
+#            each character of a fixed-length expanding wildcard (its wildcard set), or for each
+#            variable-length expanding wildcard, all its expansions (one per length and product)
+#   rest  -- "", or the remainder of the password beginning with the literal span before the first
+#            wildcard which isn't expanded this way: a contracting or backreference wildcard, or a
+#            variable-length expanding one with more than WILDCARD_PLAN_MAX_SLOT_LEN expansions
+# The password's expansions (up to rest) are the joined itertools.product of the slots, in the same
+# order as expand_first_wildcard_generator() produces them. Plans are cached in wildcard_plan_cache.
+WILDCARD_PLAN_MAX_SLOT_LEN = 4096
+WILDCARD_PLAN_CACHE_MAX_LEN = 10000
+
+
+def compiled_wildcard_plan(password_with_wildcards):
+    plan = wildcard_plan_cache.get(password_with_wildcards)
+    if plan is not None:
+        return plan
+
+    slots = []
+    rest = tstr()
+    prior_end = 0  # the end of the previous wildcard
+    for match in compiled_wildcard_re().finditer(password_with_wildcards):
+        wildcard_set = None if match.group("bref") else expanding_wildcard_set(match)
+        if wildcard_set is not None:
+            wildcard_minlen, wildcard_maxlen = wildcard_length_range(match)
+            wildcard_lens = range(wildcard_minlen, wildcard_maxlen + 1)
+            if wildcard_minlen != wildcard_maxlen and \
+                    sum(len(wildcard_set) ** wildcard_len for wildcard_len in wildcard_lens) > WILDCARD_PLAN_MAX_SLOT_LEN:
+                wildcard_set = None
+        if wildcard_set is None:
+            rest = password_with_wildcards[prior_end:]
+            break
+        if match.start() > prior_end:
+            slots.append((password_with_wildcards[prior_end:match.start()],))
+        if wildcard_minlen == wildcard_maxlen:
+            slots.extend((tuple(wildcard_set),) * wildcard_minlen)
+        else:
+            slots.append(tuple(tstr().join(wildcard_expanded_list) for wildcard_len in wildcard_lens
+                               for wildcard_expanded_list in itertools.product(wildcard_set, repeat=wildcard_len)))
+        prior_end = match.end()
+    else:
+        if prior_end < len(password_with_wildcards):
+            slots.append((password_with_wildcards[prior_end:],))
+
+    if len(wildcard_plan_cache) >= WILDCARD_PLAN_CACHE_MAX_LEN:
+        wildcard_plan_cache.clear()
+    plan = wildcard_plan_cache[password_with_wildcards] = tuple(slots), rest
+    return plan
+
+
+# Returns an iterator which expands (or contracts) all wildcards in the string passed to it,
+# or if there are no wildcards it simply produces the string unchanged. The prior_prefix
+# argument is needed to support backreference wildcards. The returned values are:
 #   prior_prefix + password_with_all_wildcards_expanded
-# TODO: implement without recursion?
+# The expanding wildcards are expanded from a compiled_wildcard_plan() by itertools.product
+# (an odometer over the slots), so they're produced without any Python code per password.
 def expand_wildcards_generator(password_with_wildcards, prior_prefix=None):
     if prior_prefix is None: prior_prefix = tstr()
 
     # Quick check to see if any wildcards are present
     if tstr("%") not in password_with_wildcards:
-        # If none, just produce the string and end
-        yield prior_prefix + password_with_wildcards
-        return
+        # If none, just produce the string
+        return iter((prior_prefix + password_with_wildcards,))
 
+    slots, rest = compiled_wildcard_plan(password_with_wildcards)
+    if prior_prefix:
+        slots = ((prior_prefix,),) + slots
+    passwords_prefixes = map(tstr().join, itertools.product(*slots))
+    if not rest:
+        return passwords_prefixes
+    return itertools.chain.from_iterable(expand_first_wildcard_generator(rest, password_prefix)
+                                         for password_prefix in passwords_prefixes)
+
+
+# This generator function expands (or contracts) the first wildcard in the string passed to it,
+# and then expands the rest with expand_wildcards_generator(). The returned values are:
+#   prior_prefix + password_with_all_wildcards_expanded
+def expand_first_wildcard_generator(password_with_wildcards, prior_prefix):
     # Copy a few globals into local for a small speed boost
     l_range = range
     l_len = len
     l_min = min
     l_max = max
 
-    # Find the first wildcard parameter in the format %[[min,]max][caseflag]type where
-    # caseflag == "i" if present and type is one of: wildcard_keys, "<", ">", or "-"
-    # (e.g. "%d", "%-", "%2n", "%1,3ia", etc.), or type is of the form "[custom-wildcard-set]", or
-    # for backreferences type is of the form: [ ";file;" ["#"] | ";#" ] "b"  <--brackets denote options
-    global wildcard_re
-    if not wildcard_re:
-        wildcard_re = re.compile(
-            r"%(?:(?:(?P<min>\d+),)?(?P<max>\d+))?(?P<nocase>i)?(?:(?P<type>[{}<>-])|\[(?P<custom>.+?)\]|(?:;(?:(?P<bfile>.+?);)?(?P<bpos>\d+)?)?(?P<bref>b))" \
-                .format(wildcard_keys))
-    match = wildcard_re.search(password_with_wildcards)
-    assert match, "expand_wildcards_generator: parsed valid wildcard spec"
+    # Find the first wildcard parameter (see compiled_wildcard_re() below)
+    match = compiled_wildcard_re().search(password_with_wildcards)
+    assert match, "expand_first_wildcard_generator: parsed valid wildcard spec"
 
     password_prefix = password_with_wildcards[0:match.start()]  # no wildcards present here,
     full_password_prefix = prior_prefix + password_prefix  # nor here;
@@ -8200,33 +9435,12 @@ def expand_wildcards_generator(password_with_wildcards, prior_prefix=None):
         bmap = backreference_maps[m_bfile] if m_bfile else None
     else:
         # For positive (expanding) wildcards, build the set of possible characters based on the wildcard type and caseflag
-        m_custom, m_nocase = match.group("custom", "nocase")
-        if m_custom:  # a custom set wildcard, e.g. %[abcdef0-9]
-            is_expanding = True
-            wildcard_set = custom_wildcard_cache.get((m_custom, m_nocase))
-            if wildcard_set is None:
-                wildcard_set = build_wildcard_set(m_custom)
-                if m_nocase:
-                    # Build a case-insensitive version
-                    wildcard_set_caseswapped = wildcard_set.swapcase()
-                    if wildcard_set_caseswapped != wildcard_set:
-                        wildcard_set = duplicates_removed(wildcard_set + wildcard_set_caseswapped)
-                custom_wildcard_cache[(m_custom, m_nocase)] = wildcard_set
-        else:  # either a "normal" or a contracting wildcard
-            m_type = match.group("type")
-            is_expanding = m_type not in "<>-"
-            if is_expanding:
-                if m_nocase and m_type in wildcard_nocase_sets:
-                    wildcard_set = wildcard_nocase_sets[m_type]
-                else:
-                    wildcard_set = wildcard_sets[m_type]
-        assert not is_expanding or wildcard_set, "expand_wildcards_generator: found expanding wildcard set"
+        m_type = match.group("type")  # (None for custom set wildcards)
+        wildcard_set = expanding_wildcard_set(match)
+        is_expanding = wildcard_set is not None  # else it's a contracting wildcard
 
     # Extract or default the wildcard min and max length
-    wildcard_maxlen = match.group("max")
-    wildcard_maxlen = int(wildcard_maxlen) if wildcard_maxlen else 1
-    wildcard_minlen = match.group("min")
-    wildcard_minlen = int(wildcard_minlen) if wildcard_minlen else wildcard_maxlen
+    wildcard_minlen, wildcard_maxlen = wildcard_length_range(match)
 
     # If it's a backreference wildcard
     if m_bref:
@@ -8465,10 +9679,17 @@ def simple_typos_generator(password_base, min_typos=0):
     l_product_max_elements = product_max_elements
     l_enabled_simple_typos = enabled_simple_typos
     l_max_simple_typos = max_simple_typos
+    l_min_simple_typos = min_simple_typos
     assert len(enabled_simple_typos) > 0, "simple_typos_generator: at least one simple typo enabled"
 
-    # Start with the unmodified password itself
-    min_typos -= typos_sofar
+    # Completion functions can only be used if no later modification generator changes the final element
+    # (and if the password is only checked after its final element is constrained, e.g. seed checksums)
+    l_simple_typo_completions = None
+    if simple_typo_completions and not args.typos_insert and not args.password_repeats_posttypos:
+        l_simple_typo_completions = simple_typo_completions
+
+    # Start with the unmodified password itself (unless --min-typos-* require some simple typos)
+    min_typos = max(min_typos - typos_sofar, sum_min_simple_typos)
     if min_typos <= 0: yield password_base
 
     # First change all single characters, then all combinations of 2 characters, then of 3, etc.
@@ -8484,6 +9705,12 @@ def simple_typos_generator(password_base, min_typos=0):
                 l_product_max_elements(l_enabled_simple_typos, typos_count, l_max_simple_typos))
         else:  # use the faster itertools version if possible
             simple_typo_permutations = tuple(l_itertools_product(l_enabled_simple_typos, repeat=typos_count))
+        #
+        # Exclude those which don't include the individual minimums specified by min_simple_typos
+        if l_min_simple_typos:
+            simple_typo_permutations = tuple(permutation for permutation in simple_typo_permutations
+                                             if all(permutation.count(generator) >= typo_min for generator, typo_min
+                                                    in zip(l_enabled_simple_typos, l_min_simple_typos)))
 
         # Select the indexes of exactly typos_count characters from the password_base
         # that will be the target of the typos (out of all possible combinations thereof)
@@ -8495,6 +9722,18 @@ def simple_typos_generator(password_base, min_typos=0):
             # Apply each possible permutation of simple typo generators to
             # the typo targets selected above (using the pre-calculated list)
             for typo_generators_per_target in simple_typo_permutations:
+                # If the last typo target is the final element of password_base, and that typo has a
+                # completion function, the final element's replacements are chosen after the rest of the
+                # password has been constructed, and are limited to those which could be valid
+                final_completion = None
+                if l_simple_typo_completions and typo_indexes[-1] == password_base_len - 1:
+                    final_completion = l_simple_typo_completions.get(typo_generators_per_target[-1])
+                if final_completion:
+                    for password in simple_typos_completion_generator(password_base, typo_indexes_,
+                                                                      typo_generators_per_target, final_completion):
+                        yield password
+                    continue
+
                 # For each of the selected typo target(s), call the generator(s) selected above
                 # to get the replacement(s) of said to-be-replaced typo target(s). Each item in
                 # typo_replacements is an iterable (tuple, list, generator, etc.) producing
@@ -8523,6 +9762,27 @@ def simple_typos_generator(password_base, min_typos=0):
         typos_sofar -= typos_count
 
 
+# Used by simple_typos_generator() above when the last typo target is the final element of password_base
+# and it has a completion function: produces the same passwords as simple_typos_generator() would for the
+# selected typo targets and generators, except those whose final element was ruled out by final_completion
+def simple_typos_completion_generator(password_base, typo_indexes_, typo_generators_per_target, final_completion):
+    final_index = typo_indexes_[-2]
+    final_generator = typo_generators_per_target[-1]
+    typo_replacements = [generator(password_base, index) for index, generator in
+                         zip(typo_indexes_[:-2], typo_generators_per_target[:-1])]
+    for one_replacement_set in itertools.product(*typo_replacements):
+        # Construct the new password up to (but excluding) its final element
+        password_prefix = password_base[0:typo_indexes_[0]]
+        for i, replacement in enumerate(one_replacement_set):
+            password_prefix += replacement + password_base[typo_indexes_[i] + 1:typo_indexes_[i + 1]]
+
+        final_replacements = final_completion(password_prefix, password_base, final_index)
+        if final_replacements is None:
+            final_replacements = final_generator(password_base, final_index)
+        for final_replacement in final_replacements:
+            yield password_prefix + final_replacement
+
+
 # product_max_elements() is a generator function similar to itertools.product() except that
 # it takes an extra argument:
 #     max_elements  -  a list of length == len(sequence) of positive (non-zero) integers
@@ -8643,9 +9903,102 @@ def password_repeats_generator(password_base, min_typos=0):
         yield password_base * (i)
 
 
+# The typo counting functions below each return a list, indexed by a number of typos k, of the count
+# of the variations a single typo generator produces from password_base with exactly k typos (without
+# taking into account the min_typos and typos_sofar arguments, which are accounted for by the caller)
+def capslock_typos_counts(password_base):
+    return [1, 1 if password_base.swapcase() != password_base else 0]
+
+
+#
+def swap_typos_counts(password_base):
+    # Count the combinations of non-adjacent swappable indexes (see swap_typos_generator() ),
+    # tracking separately those which do and don't end with a swap at the previous index
+    max_swaps = min(args.max_typos_swap, args.typos)
+    counts_ending_unswapped = [1] + [0] * max_swaps
+    counts_ending_swapped = [0] * (max_swaps + 1)
+    for i in range(len(password_base) - 1):
+        new_counts_ending_swapped = [0] * (max_swaps + 1)
+        if password_base[i] != password_base[i + 1] or args.no_dupchecks >= 4:
+            for k in range(1, max_swaps + 1):
+                new_counts_ending_swapped[k] = counts_ending_unswapped[k - 1]
+        counts_ending_unswapped = [u + s for u, s in zip(counts_ending_unswapped, counts_ending_swapped)]
+        counts_ending_swapped = new_counts_ending_swapped
+    return [u + s for u, s in zip(counts_ending_unswapped, counts_ending_swapped)]
+
+
+#
+def simple_typos_counts(password_base):
+    max_typos = min(sum_max_simple_typos, args.typos)
+    # Each state is a tuple of how many times each enabled simple typo has been used so far (if there
+    # are no individual maximums or minimums, only the total matters); it maps to a count of variations
+    per_typo_limits = max_simple_typos or min_simple_typos
+    enabled_count = len(enabled_simple_typos) if per_typo_limits else 1
+    counts_by_state = {(0,) * enabled_count: 1}
+    for i in range(len(password_base)):
+        replacements_counts = [len(tuple(generator(password_base, i))) for generator in enabled_simple_typos]
+        if not per_typo_limits:
+            replacements_counts = [sum(replacements_counts)]
+        new_counts_by_state = counts_by_state.copy()  # (the variations without a typo at i)
+        for state, count in counts_by_state.items():
+            if sum(state) >= max_typos: continue
+            for j, replacements_count in enumerate(replacements_counts):
+                if not replacements_count or max_simple_typos and state[j] >= max_simple_typos[j]: continue
+                new_state = state[:j] + (state[j] + 1,) + state[j + 1:]
+                new_counts_by_state[new_state] = new_counts_by_state.get(new_state, 0) + count * replacements_count
+        counts_by_state = new_counts_by_state
+    counts = [0] * (max_typos + 1)
+    for state, count in counts_by_state.items():
+        if min_simple_typos and any(typos < typo_min for typos, typo_min in zip(state, min_simple_typos)):
+            continue
+        counts[sum(state)] += count
+    return counts
+
+
+#
+def insert_typos_counts(password_base):
+    max_inserts = min(args.max_typos_insert, args.typos)
+    max_adjacent_inserts = args.max_adjacent_inserts
+    # Count the ways to choose k insertion indexes (the same index up to max_adjacent_inserts
+    # times) from the len + 1 possible indexes, and then one typos_insert_expanded item for each
+    indexes_counts = [1] + [0] * max_inserts
+    for index in range(len(password_base) + 1):
+        indexes_counts = [sum(indexes_counts[k - j] for j in range(min(k, max_adjacent_inserts) + 1))
+                          for k in range(max_inserts + 1)]
+    insertions_len = len(typos_insert_expanded)
+    return [indexes_count * insertions_len ** k for k, indexes_count in enumerate(indexes_counts)]
+
+
+# The typo generators whose counts are combined by modifications_count(). Each must produce the same
+# number of variations from every variation produced by those listed before it, so that the counts
+# can be combined without generating them (e.g. a capslock typo doesn't affect where swaps can be made,
+# but it can affect what case typos can be made, and a simple typo can change a password's length).
+COUNTABLE_TYPOS_SEQUENCES = (
+    (capslock_typos_generator, swap_typos_generator, insert_typos_generator),
+    (simple_typos_generator,)
+)
+TYPOS_COUNTS_FUNCTIONS = {
+    capslock_typos_generator: capslock_typos_counts,
+    swap_typos_generator:     swap_typos_counts,
+    simple_typos_generator:   simple_typos_counts,
+    insert_typos_generator:   insert_typos_counts
+}
+
+
 ################################### Main ###################################
 
 
+# A SearchSession carries state across consecutive calls to main() which search the same wallet object,
+# e.g. seedrecover's search phases: the first search's measurement of the time it takes to verify a
+# password is reused by those which follow, and the passwords tried by all of them are totalled.
+class SearchSession(object):
+
+    def __init__(self):
+        self.wallet = None                 # the wallet whose performance was measured
+        self.est_secs_per_password = None  # (for a single verifying thread)
+        self.passwords_tried = 0           # by all searches so far
+
+
 # Simply forwards calls on to the return_verified_password_or_false()
 # member function of the currently loaded global wallet
 def return_verified_password_or_false(passwords):
@@ -8653,6 +10006,223 @@ def return_verified_password_or_false(passwords):
     return loaded_wallet.return_verified_password_or_false(passwords)
 
 
+# Chunks of (str) passwords are sent to the worker processes packed into a single NUL-separated UTF-8 bytes
+# object, which is (un)pickled as one buffer instead of one object per password. Anything else (e.g. seedrecover's
+# tuples of words, whose pickles are already compact thanks to the pickle memo), or a chunk with a password that
+# contains a NUL, is sent unchanged.
+def pack_passwords(passwords):
+    if passwords:
+        try:
+            joined = "\0".join(passwords)
+        except TypeError:
+            return passwords
+        if joined.count("\0") == len(passwords) - 1:
+            return joined.encode("utf_8", "surrogatepass")
+    return passwords
+
+
+def unpack_passwords(packed):
+    if isinstance(packed, bytes):
+        return packed.decode("utf_8", "surrogatepass").split("\0")
+    return packed
+
+
+# Also returns the seconds the worker spent verifying the chunk (see verify_passwords_unordered()),
+# which may have been packed by pack_passwords()
+def timed_return_verified_password_or_false(passwords):
+    start = time.perf_counter()
+    password_found, passwords_tried = return_verified_password_or_false(unpack_passwords(passwords))
+    return password_found, passwords_tried, time.perf_counter() - start
+
+
+CHUNKSIZE_SMOOTHING = 0.25  # the weight of each chunk's timing in verify_passwords_unordered()'s estimate
+
+
+# Verifies the chunks of passwords produced by password_iterator (a password_generator()) in the pool's worker
+# processes, handling them in whichever order they finish with at most max_in_flight of them outstanding. If
+# target_seconds is set, chunks are continually resized (via password_iterator.send()) so that each takes
+# about that long according to the workers' own timings, but never more than max_chunksize passwords.
+#
+# Like pool.imap(), it produces (password_found, passwords_tried) tuples, but passwords_tried only counts
+# chunks whose predecessors have all finished too, so the running total is always an exact count of all
+# the passwords from the beginning up to some point, safe to autosave. When a password is found,
+# passwords_tried - 1 is the number of passwords which can be added to the total just before it
+# (including those in any preceding chunks which are still outstanding or which finished early).
+def verify_passwords_unordered(pool, password_iterator, chunksize, max_in_flight, target_seconds=None,
+                               max_chunksize=None):
+    assert max_in_flight > 0, "verify_passwords_unordered: max_in_flight > 0"
+    results = queue.Queue()
+    in_flight = 0
+    next_chunk_num = 0
+    next_commit_num = 0   # the first chunk that hasn't been counted in a passwords_tried yet
+    finished_counts = {}  # chunk numbers which have finished out of order mapped to their lengths
+    chunk_lens = {}       # chunk numbers which haven't been counted yet mapped to their lengths
+    secs_per_password = None
+    new_chunksize = chunksize
+    exhausted = False
+    while True:
+
+        # Keep the workers busy
+        while not exhausted and in_flight < max_in_flight:
+            if new_chunksize != chunksize:
+                chunksize = new_chunksize
+                try:
+                    password_iterator.send((chunksize, False))
+                except StopIteration:  # (it had already produced its final, partial, chunk)
+                    exhausted = True
+                    break
+            try:
+                passwords = password_iterator.__next__()
+            except StopIteration:
+                exhausted = True
+                break
+            pool.apply_async(timed_return_verified_password_or_false, (pack_passwords(passwords),),
+                             callback=lambda result, chunk_num=next_chunk_num: results.put((chunk_num, result)),
+                             error_callback=lambda e: results.put((None, e)))
+            chunk_lens[next_chunk_num] = len(passwords)
+            in_flight += 1
+            next_chunk_num += 1
+        if in_flight == 0:
+            return
+
+        chunk_num, result = results.get()
+        in_flight -= 1
+        if chunk_num is None:
+            raise result  # an exception from a worker
+        password_found, passwords_tried, seconds = result
+
+        if password_found:
+            # Every chunk before it is full, so whether or not they've finished, it's preceded by all of them
+            yield password_found, passwords_tried + sum(chunk_lens[n] for n in range(next_commit_num, chunk_num))
+            return
+
+        # Count this chunk, plus any which had finished early and were waiting on this one
+        finished_counts[chunk_num] = passwords_tried
+        passwords_committed = 0
+        while next_commit_num in finished_counts:
+            passwords_committed += finished_counts.pop(next_commit_num)
+            del chunk_lens[next_commit_num]
+            next_commit_num += 1
+        if passwords_committed:
+            yield False, passwords_committed
+
+        # Aim the next chunks at target_seconds based on a running estimate of how long passwords take,
+        # changing the size by no more than a factor of two at a time
+        if target_seconds and passwords_tried:
+            if secs_per_password is None:
+                secs_per_password = seconds / passwords_tried
+            else:
+                secs_per_password += CHUNKSIZE_SMOOTHING * (seconds / passwords_tried - secs_per_password)
+            if secs_per_password > 0.0:
+                new_chunksize = int(round(target_seconds / secs_per_password)) or 1
+                new_chunksize = max(min(new_chunksize, 2 * chunksize), chunksize // 2, 1)
+                if max_chunksize:
+                    new_chunksize = min(new_chunksize, max_chunksize)
+                # Small changes aren't worth the disruption
+                if abs(new_chunksize - chunksize) * 8 < chunksize:
+                    new_chunksize = chunksize
+
+
+# Generates and verifies, inside a worker process, up to count passwords beginning with the (zero-based)
+# start_index-th one, in chunks of chunksize. This requires password_space_is_seekable(), and that the worker
+# process was forked after parse_arguments() (so that it has the same password space). Returns the same as
+# return_verified_password_or_false() (where a count less than count means there were no more passwords),
+# plus the seconds it took and the seconds its first chunk took (which includes seeking to start_index).
+def generate_and_verify_passwords(start_index, count, chunksize):
+    start = time.perf_counter()
+    first_chunk_seconds = None
+    passwords_tried = 0
+    password_iterator = password_generator(min(chunksize, count), start_index=start_index)
+    try:
+        for passwords in password_iterator:
+            if len(passwords) > count - passwords_tried:
+                passwords = passwords[:count - passwords_tried]
+            password_found, passwords_tried_last = return_verified_password_or_false(passwords)
+            if first_chunk_seconds is None:
+                first_chunk_seconds = time.perf_counter() - start
+            if password_found:
+                return password_found, passwords_tried + passwords_tried_last, \
+                    time.perf_counter() - start, first_chunk_seconds
+            passwords_tried += passwords_tried_last
+            if passwords_tried >= count:
+                break
+    finally:
+        password_iterator.close()
+    return False, passwords_tried, time.perf_counter() - start, first_chunk_seconds or 0.0
+
+
+RANGE_SEEK_FACTOR = 10  # ranges should take at least this many times as long as seeking to their start
+GENERATOR_RANGE_SECONDS = 0.5  # how long each range should take otherwise
+
+
+# Like verify_passwords_unordered() (see above), except that the workers generate the passwords themselves
+# with generate_and_verify_passwords(), each taking the next range of them beginning at start_index. Ranges
+# are resized so that each takes about target_seconds (see RANGE_SEEK_FACTOR), but no more than max_range_size.
+def generate_and_verify_unordered(pool, start_index, range_size, chunksize, max_in_flight, target_seconds,
+                                  max_range_size=None):
+    assert max_in_flight > 0, "generate_and_verify_unordered: max_in_flight > 0"
+    results = queue.Queue()
+    in_flight = 0
+    next_range_num = 0
+    next_commit_num = 0   # the first range that hasn't been counted in a passwords_tried yet
+    next_commit_index = start_index  # the index of the first password in that range
+    finished_counts = {}  # range numbers which have finished out of order mapped to their counts
+    secs_per_password = None
+    exhausted = False
+    while True:
+
+        # Keep the workers busy
+        while not exhausted and in_flight < max_in_flight:
+            pool.apply_async(generate_and_verify_passwords, (start_index, range_size, chunksize),
+                             callback=lambda result, range_num=next_range_num, range_start=start_index,
+                                             range_count=range_size:
+                                 results.put((range_num, range_start, range_count, result)),
+                             error_callback=lambda e: results.put((None, None, None, e)))
+            start_index += range_size
+            in_flight += 1
+            next_range_num += 1
+        if in_flight == 0:
+            return
+
+        range_num, range_start, range_count, result = results.get()
+        in_flight -= 1
+        if range_num is None:
+            raise result  # an exception from a worker
+        password_found, passwords_tried, seconds, first_chunk_seconds = result
+
+        if password_found:
+            # Every range before it is full, so whether or not they've finished, it's preceded by all of them
+            yield password_found, range_start - next_commit_index + passwords_tried
+            return
+        if passwords_tried < range_count:
+            exhausted = True  # there are no passwords after this range
+
+        # Count this range, plus any which had finished early and were waiting on this one
+        finished_counts[range_num] = passwords_tried
+        passwords_committed = 0
+        while next_commit_num in finished_counts:
+            passwords_committed += finished_counts.pop(next_commit_num)
+            next_commit_num += 1
+        next_commit_index += passwords_committed
+        if passwords_committed:
+            yield False, passwords_committed
+
+        # Aim the next ranges at their target duration (as in verify_passwords_unordered())
+        if passwords_tried and not exhausted:
+            if secs_per_password is None:
+                secs_per_password = seconds / passwords_tried
+            else:
+                secs_per_password += CHUNKSIZE_SMOOTHING * (seconds / passwords_tried - secs_per_password)
+            if secs_per_password > 0.0:
+                new_range_size = int(round(max(target_seconds, RANGE_SEEK_FACTOR * first_chunk_seconds)
+                                           / secs_per_password)) or 1
+                new_range_size = max(min(new_range_size, 2 * range_size), range_size // 2, chunksize, 1)
+                if max_range_size:
+                    new_range_size = min(new_range_size, max_range_size)
+                if abs(new_range_size - range_size) * 8 >= range_size:
+                    range_size = new_range_size
+
+
 # Init function for the password verifying worker processes:
 #   (re-)loads the wallet & mode (should only be necessary on Windows),
 #   tries to set the process priority to minimum, and
@@ -8728,8 +10298,8 @@ def handle_oom():
         gc.collect()
         print()  # move to the next line
         print("Error: out of memory", file=sys.stderr)
-        print("Notice: the --no-dupchecks option will reduce memory usage at the possible expense of speed",
-              file=sys.stderr)
+        print("Notice: the --no-dupchecks option will reduce memory usage at the possible expense of speed,",
+              "or the --dupchecks-memory option can limit it", file=sys.stderr)
         return True
     elif token_combination_dups and token_combination_dups._run_number == 0:
         del token_combination_dups
@@ -8823,6 +10393,13 @@ def count_and_check_eta_dynamic(est_secs_per_password):
 # the way (and exiting if it's violated). Displays messages to the user if the process is taking a while.
 def count_and_check_eta(est):
     assert est > 0.0, "count_and_check_eta: est_secs_per_password > 0.0"
+    # If possible, count the passwords without generating them
+    if password_space_is_seekable():
+        passwords_count = worker_passwords_count(seek_password_space(sys.maxsize, build_modification_generators())[2])
+        if (passwords_count - args.skip) * est > args.max_eta * 3600:  # max_eta is in hours
+            error_exit("{:,} passwords to try, ETA > --max-eta option ({} hours), exiting"
+                       .format(passwords_count - args.skip, args.max_eta))
+        return passwords_count
     return password_generator_factory(est_secs_per_password=est)[1]
 
 
@@ -8842,6 +10419,11 @@ def password_generator_factory(chunksize=1, est_secs_per_password=0):
         # The simple case where there's nothing to skip, just return an unmodified password_generator()
         if args.skip <= 0:
             return password_generator(chunksize), 0
+        # If possible, seek directly to the first unskipped password without generating those skipped
+        elif password_space_is_seekable():
+            passwords_skipped = worker_passwords_count(seek_password_space(
+                worker_password_index(args.skip), build_modification_generators())[2])
+            return password_generator(chunksize, start_index=passwords_skipped), passwords_skipped
         # The still fairly simple case where there's not much to skip, just skip it all at once
         elif args.skip <= PASSWORDS_BETWEEN_UPDATES:
             passwords_count_iterator = password_generator(args.skip, only_yield_count=True)
@@ -8949,27 +10531,61 @@ def password_generator_factory(chunksize=1, est_secs_per_password=0):
 
 
 # Writes the checksummed seed phrases out to the file specified in the listvalid argument
-# This function runs in its own process and consumes the seeds which are placed in the queue by the worker threads
+# This function runs in its own process and consumes the seeds which are placed in the queue by the worker threads,
+# one (seed count, lines of text or packed records, seed length) item per chunk (see WalletBase._put_valid_seeds()
+# in btcrseed). Packed records are written to packed seed list files (see packedseeds.py) instead of text files.
 def write_checked_seeds(worker_out_queue, loaded_wallet):
     current_file_valid_seed_count = 0
     seedfile_suffix = 0
-    while worker_out_queue.qsize() < 10:  # If the workers haven't started filling the queue yet, just sleep
+    seeds_per_file = loaded_wallet._seedfilecount + 1
+    packed_seeds = None  # if the seeds are packed, the PackedSeedList whose header begins each file
+
+    def open_listfile():
+        filename = loaded_wallet._savevalidseeds + "_" + '{:04d}'.format(seedfile_suffix)
+        if packed_seeds is not None:
+            return packed_seeds.append_to(filename + ".bin")
+        return open(filename + ".txt", mode='a', buffering=10240)
+
+    while worker_out_queue.empty():  # If the workers haven't started filling the queue yet, just sleep
         time.sleep(10)
+    listfile = None
     try:
-        with open(loaded_wallet._savevalidseeds + "_" + '{:04d}'.format(seedfile_suffix) + ".txt", mode='a',
-                  buffering=10240) as listfile:
-            while True:
-                listfile.write(" ".join(worker_out_queue.get(timeout=5)).strip('()[]') + "\n")
-                current_file_valid_seed_count += 1
-                if current_file_valid_seed_count > loaded_wallet._seedfilecount:
+        while True:
+            seeds_count, seeds_data, words_per_seed = worker_out_queue.get(timeout=5)
+            if listfile is None:
+                if isinstance(seeds_data, bytes):
+                    packed_seeds = PackedSeedList(loaded_wallet._words, words_per_seed,
+                                                  getattr(loaded_wallet, "_lang", None))
+                listfile = open_listfile()
+            elif packed_seeds is not None and words_per_seed != packed_seeds.words_per_seed:
+                raise ValueError("every seed in a packed seed list must have {} words"
+                                 .format(packed_seeds.words_per_seed))
+            if current_file_valid_seed_count + seeds_count < seeds_per_file:
+                listfile.write(seeds_data)
+                current_file_valid_seed_count += seeds_count
+                continue
+            # This chunk's seeds are split across files
+            if packed_seeds is not None:
+                record_len = packed_seeds.record_len
+                seed_records = [seeds_data[i:i + record_len] for i in range(0, len(seeds_data), record_len)]
+            else:
+                seed_records = seeds_data.splitlines(True)
+            while seed_records:
+                file_seed_records = seed_records[:seeds_per_file - current_file_valid_seed_count]
+                del seed_records[:len(file_seed_records)]
+                listfile.write(seeds_data[:0].join(file_seed_records))
+                current_file_valid_seed_count += len(file_seed_records)
+                if current_file_valid_seed_count == seeds_per_file:
                     listfile.close()
                     seedfile_suffix += 1
                     current_file_valid_seed_count = 0
-                    listfile = open(loaded_wallet._savevalidseeds + "_" + '{:04d}'.format(seedfile_suffix) + ".txt",
-                                    mode='a', buffering=10240)
+                    listfile = open_listfile()
 
     except multiprocessing.queues.Empty:
         print("Save List Writer Finished")
+    finally:
+        if listfile:
+            listfile.close()
 
 
 # Should be called after calling parse_arguments()
@@ -9026,18 +10642,21 @@ def main():
     except AttributeError:
         pass
 
+    # Passwords are verified in "chunks" to reduce call overhead. One chunk includes enough passwords to
+    # last for about 1/100th of a second (determined experimentally to be about the best I could do, YMMV)
+    CHUNKSIZE_SECONDS = 1.0 / 100.0
+
     # Measure the performance of the verification function
     # (for CPU, run for about 0.5s; for GPU, run for one global-worksize chunk)
     if args.performance and args.enable_gpu:  # skip this time-consuming & unnecessary measurement in this case
         est_secs_per_password = 0.01  # set this to something relatively big, it doesn't matter exactly what
+    elif search_session and search_session.wallet is loaded_wallet:
+        est_secs_per_password = search_session.est_secs_per_password  # measured by an earlier search
     else:
         if args.enable_gpu:
             inner_iterations = sum(args.global_ws)
             outer_iterations = 1
         else:
-            # Passwords are verified in "chunks" to reduce call overhead. One chunk includes enough passwords to
-            # last for about 1/100th of a second (determined experimentally to be about the best I could do, YMMV)
-            CHUNKSIZE_SECONDS = 1.0 / 100.0
             measure_performance_iterations = loaded_wallet.passwords_per_seconds(0.5)
             inner_iterations = int(round(
                 2 * measure_performance_iterations * CHUNKSIZE_SECONDS)) or 1  # the "2*" is due to the 0.5 seconds above
@@ -9056,6 +10675,9 @@ def main():
         del performance_generator
         loaded_wallet.pre_start_benchmark = False
         assert isinstance(est_secs_per_password, float) and est_secs_per_password > 0.0
+        if search_session:
+            search_session.wallet = loaded_wallet
+            search_session.est_secs_per_password = est_secs_per_password
 
     if args.enable_gpu:
         chunksize = sum(args.global_ws)
@@ -9066,8 +10688,11 @@ def main():
         chunksize = int(round(CHUNKSIZE_SECONDS / est_secs_per_password)) or 1
 
     # If the time to verify a password is short enough, the time to generate the passwords in this thread
-    # becomes comparable to verifying passwords, therefore this should count towards being a "worker" thread
-    if est_secs_per_password < 1.0 / 75000.0:
+    # becomes comparable to verifying passwords. If possible, the worker processes then generate their own
+    # passwords (see generate_and_verify_unordered()), otherwise this should count towards being a "worker" thread
+    shard_generation = est_secs_per_password < 1.0 / 75000.0 and args.threads > 1 and not args.enable_gpu \
+                       and password_space_is_seekable() and multiprocessing.get_start_method() == "fork"
+    if est_secs_per_password < 1.0 / 75000.0 and not shard_generation:
         main_thread_is_worker = True
         spawned_threads = args.threads - 1  # spawn 1 fewer than requested (might be 0)
         verifying_threads = spawned_threads or 1
@@ -9211,6 +10836,8 @@ def main():
         pool = None
         if loaded_wallet.opencl_algo == 0:
             btcrecover.opencl_helpers.init_opencl_contexts(loaded_wallet)
+        if getattr(loaded_wallet, "_savevalidseeds", False):
+            loaded_wallet.worker_out_queue = worker_out_queue  # (as init_worker() does for worker processes)
         password_found_iterator = map(return_verified_password_or_false, password_iterator)
         set_process_priority_idle()  # this, the only thread, should be nice
     else:
@@ -9219,7 +10846,23 @@ def main():
             current_passwords_count = multiprocessing.Manager().Value('current_passwords_count',
                                                                       progress.maxval if progress else 0)
             passwords_counting_result = pool.apply_async(count_passwords_async, args=(current_passwords_count,))
-        password_found_iterator = pool.imap(return_verified_password_or_false, password_iterator)
+        # (if the count is known, don't grow any chunk or range beyond a fair share of it)
+        max_chunksize = (passwords_count - 1) // spawned_threads + 1 \
+            if not args.dynamic_passwords_count and not args.no_eta else None
+        if shard_generation:
+            password_iterator.close()  # the workers generate their own passwords
+            range_size = chunksize * int(round(GENERATOR_RANGE_SECONDS / CHUNKSIZE_SECONDS))
+            password_found_iterator = generate_and_verify_unordered(
+                pool, args.skip, min(range_size, max_chunksize or range_size), chunksize,
+                max_in_flight=2 * spawned_threads, target_seconds=GENERATOR_RANGE_SECONDS,
+                max_range_size=max_chunksize)
+        else:
+            # GPU chunks must each be a full global worksize, and OpenCL ones are sized for the device
+            adaptive = not (args.enable_gpu or args.enable_opencl)
+            password_found_iterator = verify_passwords_unordered(
+                pool, password_iterator, chunksize,
+                max_in_flight=2 * spawned_threads,  # (enough for each worker to have its next chunk waiting)
+                target_seconds=CHUNKSIZE_SECONDS if adaptive else None, max_chunksize=max_chunksize)
         if main_thread_is_worker: set_process_priority_idle()  # if this thread is cpu-intensive, be nice
 
     # If we are writing out the checksummed seed files, spawn a process that will handle taking the seeds produced by
@@ -9252,12 +10895,10 @@ def main():
     except Exception:
         pass
 
-    # Make est_passwords_per_5min evenly divisible by chunksize
-    # (so that passwords_tried % est_passwords_per_5min will eventually == 0)
+    # Autosave after each est_passwords_per_5min (chunks can vary in size, so it's not an exact multiple)
     if l_savestate:
         assert isinstance(est_passwords_per_5min, numbers.Integral)
-        assert isinstance(chunksize, numbers.Integral)
-        est_passwords_per_5min = (est_passwords_per_5min // chunksize or 1) * chunksize
+        next_autosave_tried = est_passwords_per_5min
 
     # Iterate through password_found_iterator looking for a successful guess
     password_found = False
@@ -9287,8 +10928,9 @@ def main():
                     if passwords_counting_result.ready() and not passwords_counting_result.successful():
                         passwords_counting_result.get()
                 progress.update(passwords_tried)
-            if l_savestate and passwords_tried % est_passwords_per_5min == 0:
+            if l_savestate and passwords_tried >= next_autosave_tried:
                 do_autosave(args.skip + passwords_tried)
+                next_autosave_tried = passwords_tried + est_passwords_per_5min
         else:  # if the for loop exits normally (without breaking)
             if pool: pool.close()
             if progress:
@@ -9325,6 +10967,9 @@ def main():
         do_autosave(args.skip + passwords_tried)
         autosave_file.close()
 
+    if search_session:
+        search_session.passwords_tried += passwords_tried
+
     worker_out_queue.close()
 
     global searchfailedtext
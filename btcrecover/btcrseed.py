@@ -44,7 +44,9 @@ from typing import AnyStr, List, Optional, Sequence, TypeVar, Union
 
 # Import modules bundled with BTCRecover
 from . import btcrpass
-from .addressset import AddressSet
+from .addressset import AddressSet, share_hash160s
+from .hash160batch import hash160_many
+from .packedseeds import PackedSeedList
 from lib.bitcoinlib import encoding as encoding
 from lib.cashaddress import convert, base58
 from lib.base58_tools import base58_tools
@@ -358,6 +360,7 @@ class WalletBase(object):
     pre_start_benchmark = False
     _skip_worker_checksum = True
     _savevalidseeds = True
+    _savevalidseeds_packed = False
 
     def __init__(self, loading=False):
         if not hashlib_ripemd160_available:
@@ -413,6 +416,37 @@ class WalletBase(object):
         """
         return ripemd160(hashlib.sha256(compress_pubkey(uncompressed_pubkey)).digest())
 
+    @classmethod
+    def pubkeys_to_hash160s(cls, uncompressed_pubkeys):
+        """convert a list of uncompressed public keys to their hash160 forms as per pubkey_to_hash160()
+
+        :param uncompressed_pubkeys: SEC 1 EllipticCurvePoint OctetStrings
+        :type uncompressed_pubkeys: list[bytes]
+        :return: the hash160s, in the same order
+        :rtype: list[bytes]
+        """
+        # Wallets with their own kind of hash160 (e.g. Ethereum) compute them one at a time
+        if cls.pubkey_to_hash160 is not WalletBase.pubkey_to_hash160:
+            return list(map(cls.pubkey_to_hash160, uncompressed_pubkeys))
+        return hash160_many([compress_pubkey(pubkey) for pubkey in uncompressed_pubkeys])
+
+    # Sends a chunk's checksummed seeds to btcrpass.write_checked_seeds() as a single queue item, already formatted
+    # as lines of text (or packed as per packedseeds.py), instead of putting (and so pickling and piping) each seed
+    # separately
+    def _put_valid_seeds(self, valid_mnemonic_ids_list):
+        if not valid_mnemonic_ids_list:
+            return
+        words_per_seed = len(valid_mnemonic_ids_list[0])
+        if self._savevalidseeds_packed:
+            packed_seeds = self._packed_seeds
+            if packed_seeds is None or packed_seeds.words_per_seed != words_per_seed:
+                packed_seeds = self._packed_seeds = PackedSeedList(self._words, words_per_seed,
+                                                                   getattr(self, "_lang", None))
+            seeds_data = packed_seeds.pack(valid_mnemonic_ids_list)
+        else:
+            seeds_data = "".join(" ".join(mnemonic_ids).strip('()[]') + "\n" for mnemonic_ids in valid_mnemonic_ids_list)
+        self.worker_out_queue.put((len(valid_mnemonic_ids_list), seeds_data, words_per_seed))
+
     # Simple accessor to be able to identify the BIP44 coin number of the wallet
     def get_path_coin(self):
         coin = 0  # Just assume bitcoin by default
@@ -519,7 +553,7 @@ class WalletElectrum1(WalletBase):
                 print("warning: addresses are ignored when an mpk or addressdb is provided", file=sys.stderr)
                 addresses = None
             else:
-                self._known_hash160s = self._addresses_to_hash160s(addresses)
+                self._known_hash160s = share_hash160s(self._addresses_to_hash160s(addresses))
 
         # Process the address_limit argument
         if address_limit:
@@ -694,6 +728,7 @@ class WalletElectrum1(WalletBase):
                 except ValueError:
                     continue
 
+                d_pubkeys = []
                 for seq_num in range(self._address_start_index, self._address_start_index + self._addrs_to_generate):
                     # Compute the next deterministic private/public key pair the Electrum1 way.
                     # FYI we derive a privkey first, and then a pubkey from that because it's
@@ -705,11 +740,11 @@ class WalletElectrum1(WalletBase):
                     # derivation 0 means: not a change address
                     d_privkey = int_to_bytes((master_privkey + d_offset) % GENERATOR_ORDER, 32)
 
-                    d_pubkey = coincurve.PublicKey.from_valid_secret(d_privkey).format(compressed=False)
-
-                    # Compute the hash160 of the *uncompressed* public key, and check for a match
+                    d_pubkeys.append(coincurve.PublicKey.from_valid_secret(d_privkey).format(compressed=False))
 
-                    if ripemd160(l_sha256(d_pubkey).digest()) in self._known_hash160s:
+                # Compute the hash160s of the *uncompressed* public keys, and check for a match
+                for d_hash160 in hash160_many(d_pubkeys):
+                    if d_hash160 in self._known_hash160s:
                         return mnemonic_ids, count  # found it
 
         return False, count
@@ -785,6 +820,7 @@ class WalletBIP32(WalletBase):
         self._address_start_index = None
         self.force_p2sh = None
         self.worker_out_queue = None
+        self._packed_seeds = None  # the PackedSeedList used by _put_valid_seeds() with --savevalidseeds-packed
         self._known_hash160s = None
         self._checksum_in_generator = None
         self._derivation_salts = None
@@ -793,6 +829,7 @@ class WalletBIP32(WalletBase):
         self._addrs_to_generate = None
         self._chaincode = None
         self._passwords_per_second = None
+        self._path_derivation_plan = None  # built from _path_indexes by _compile_path_derivation_plan()
 
         derivation_paths = []
         self._append_last_index = False
@@ -867,7 +904,7 @@ class WalletBIP32(WalletBase):
                 print("warning: addresses are ignored when an mpk or addressdb is provided", file=sys.stderr)
                 addresses = None
             else:
-                self._known_hash160s = self._addresses_to_hash160s(addresses)
+                self._known_hash160s = share_hash160s(self._addresses_to_hash160s(addresses))
 
         # Process the address_limit argument
         if address_limit:
@@ -1058,6 +1095,7 @@ class WalletBIP32(WalletBase):
     # is correct return it, else return False for item 0; return a count of mnemonics checked for item 1
     def _return_verified_password_or_false_cpu(self, mnemonic_ids_list):
         global _derive_seed_list
+        valid_mnemonic_ids_list = []
         for count, mnemonic_ids in enumerate(mnemonic_ids_list, 1):
 
             if self.pre_start_benchmark or (not self._checksum_in_generator and not self._skip_worker_checksum):
@@ -1066,9 +1104,9 @@ class WalletBIP32(WalletBase):
                 if not self._verify_checksum(mnemonic_ids):
                     continue
 
-            # If we are writing out the checksummed seeds, add them to the queue
+            # If we are writing out the checksummed seeds, add them to the queue (below)
             if self._savevalidseeds and not self.pre_start_benchmark:
-                self.worker_out_queue.put(mnemonic_ids)
+                valid_mnemonic_ids_list.append(mnemonic_ids)
                 continue
 
             # Convert the mnemonic sentence to seed bytes (according to BIP39 or Electrum2)
@@ -1080,6 +1118,7 @@ class WalletBIP32(WalletBase):
                 if self._verify_seed(seed_bytes, salt):
                     return mnemonic_ids, count  # found it
 
+        self._put_valid_seeds(valid_mnemonic_ids_list)
         return False, count
 
     def _return_verified_password_or_false_opencl(self, mnemonic_ids_list):
@@ -1139,12 +1178,27 @@ class WalletBIP32(WalletBase):
                 print("Match found on Non-Standard Single Address, Privkey (Generic Hex): ", privkey_bytes.hex())
                 return True
 
-        for current_path_index in self._path_indexes:
-            seed_bytes = arg_seed_bytes
-            privkey_bytes = seed_bytes[:32]
-            chaincode_bytes = seed_bytes[32:]
+        if self._path_derivation_plan is None:
+            self._path_derivation_plan = self._compile_path_derivation_plan()
+
+        # The keys at the shared nodes of the derivation paths' prefix tree, keyed by path prefix
+        derived_nodes = {(): (arg_seed_bytes[:32], arg_seed_bytes[32:])}
 
-            for i in current_path_index:
+        # The public keys of every derived address, with the (path, address index) each came from and whether
+        # it's a P2SH-wrapped Segwit address, collected so that their hash160s can be computed (see
+        # pubkeys_to_hash160s()) and tested against known_hash160s all at once at the end
+        test_pubkeys = []
+        test_pubkeys_p2sh = []
+        test_hash160_paths = []
+
+        for current_path_index, derived_prefix, nodes_to_save in self._path_derivation_plan:
+            try:
+                privkey_bytes, chaincode_bytes = derived_nodes[derived_prefix]
+            except KeyError:
+                continue  # a shared parent key was invalid (see below)
+
+            for depth in range(len(derived_prefix), len(current_path_index)):
+                i = current_path_index[depth]
                 if i < 2147483648:  # if it's a normal child key, derive the compressed public key
                     try:
                         data_to_hmac = coincurve.PublicKey.from_valid_secret(privkey_bytes).format()
@@ -1161,6 +1215,10 @@ class WalletBIP32(WalletBase):
                                              % GENERATOR_ORDER, 32)
                 chaincode_bytes = seed_bytes[32:]
 
+                # Save the keys at this node if later paths share it
+                if depth + 1 in nodes_to_save:
+                    derived_nodes[nodes_to_save[depth + 1]] = privkey_bytes, chaincode_bytes
+
             # If an extended public key was provided, check the derived chain code against it
             if self._chaincode:
                 if chaincode_bytes == self._chaincode:
@@ -1169,66 +1227,121 @@ class WalletBIP32(WalletBase):
             else:
                 # (note: the rest assumes the address index isn't hardened)
 
-                # Derive the final public keys, searching for a match with known_hash160s
-                # (these first steps below are loop invariants)
+                # Derive the final public keys
+                address_indexes = range(self._address_start_index, self._address_start_index + self._addrs_to_generate)
                 try:
-                    data_to_hmac = coincurve.PublicKey.from_valid_secret(privkey_bytes).format()
+                    d_pubkeys = self._derive_child_pubkeys(privkey_bytes, chaincode_bytes, address_indexes)
                 except ValueError:
                     break
-                privkey_int = bytes_to_int(privkey_bytes)
-
-                for i in range(self._address_start_index, self._address_start_index + self._addrs_to_generate):
-                    seed_bytes = hmac.new(chaincode_bytes,
-                                          data_to_hmac + struct.pack(">I", i), hashlib.sha512).digest()
-
-                    # The final derived private key is the parent one + the first half of the seed_bytes
-                    d_privkey_bytes = int_to_bytes((bytes_to_int(seed_bytes[:32]) +
-                                                    privkey_int) % GENERATOR_ORDER, 32)
-
-                    d_pubkey = coincurve.PublicKey.from_valid_secret(d_privkey_bytes).format(compressed=False)
-                    # print("Pubkey: ", binascii.hexlify(coincurve.PublicKey.from_valid_secret(d_privkey_bytes).
-                    # format(compressed=True)), file=open("HashCheck.txt", "a"))
 
-                    test_hash160 = self.pubkey_to_hash160(d_pubkey)
-                    # Start off assuming that we have a standard BIP44 derivation path & address
-
-                    if ((current_path_index[0] - 2 ** 31) == 49 or self.force_p2sh):  # BIP49 Derivation Path & address
-                        pubkey_hash160 = self.pubkey_to_hash160(d_pubkey)
-                        WITNESS_VERSION = "\x00\x14"
-                        witness_program = WITNESS_VERSION.encode() + pubkey_hash160
-                        test_hash160 = ripemd160(hashlib.sha256(witness_program).digest())
-
-                    # Basic comparison content for Debugging
-                    # for hash160 in self._known_hash160s:
-                    #    print("Path: m/", current_path_index[0] - 2**31, "'/", current_path_index[1] - 2**31,
-                    #    "' Testing: ", binascii.hexlify(test_hash160), "against: ", binascii.hexlify(hash160),
-                    #    file=open("HashCheck.txt", "a"))
-
-                    if test_hash160 in self._known_hash160s:  # Check if this hash160 is in our list of known hash160s
-                        global seedfoundpath
-                        seedfoundpath = "m/"
-                        for index in current_path_index:
-                            if index > 100:
-                                index -= 2 ** 31
-                                seedfoundpath += str(index) + "'"
-                            else:
-                                seedfoundpath += str(index)
+                # Start off assuming that we have a standard BIP44 derivation path & address
+                is_p2sh = (current_path_index[0] - 2 ** 31) == 49 or self.force_p2sh  # BIP49 Derivation Path & address
+                for i, d_pubkey in zip(address_indexes, d_pubkeys):
+                    test_pubkeys.append(d_pubkey)
+                    test_pubkeys_p2sh.append(is_p2sh)
+                    test_hash160_paths.append((current_path_index, i))
+
+        test_hash160s = self.pubkeys_to_hash160s(test_pubkeys)
+
+        # For BIP49 addresses, hash the witness program containing the P2PKH hash160 calculated just above
+        p2sh_indexes = [n for n, is_p2sh in enumerate(test_pubkeys_p2sh) if is_p2sh]
+        if p2sh_indexes:
+            WITNESS_VERSION = b"\x00\x14"
+            witness_hash160s = hash160_many([WITNESS_VERSION + test_hash160s[n] for n in p2sh_indexes])
+            for n, witness_hash160 in zip(p2sh_indexes, witness_hash160s):
+                test_hash160s[n] = witness_hash160
+
+        # Basic comparison content for Debugging
+        # for (current_path_index, i), test_hash160 in zip(test_hash160_paths, test_hash160s):
+        #    print("Path: m/", current_path_index[0] - 2**31, "'/", current_path_index[1] - 2**31,
+        #    "' Index: ", i, " Testing: ", binascii.hexlify(test_hash160), file=open("HashCheck.txt", "a"))
+
+        # Search for a match with known_hash160s, reporting the first in path and address order
+        if isinstance(self._known_hash160s, AddressSet):
+            hash160s_found = self._known_hash160s.contains_many(test_hash160s)
+        else:
+            hash160s_found = [test_hash160 in self._known_hash160s for test_hash160 in test_hash160s]
+        for (current_path_index, i), hash160_found in zip(test_hash160_paths, hash160s_found):
+            if hash160_found:
+                global seedfoundpath
+                seedfoundpath = "m/"
+                for index in current_path_index:
+                    if index > 100:
+                        index -= 2 ** 31
+                        seedfoundpath += str(index) + "'"
+                    else:
+                        seedfoundpath += str(index)
 
-                            seedfoundpath += "/"
+                    seedfoundpath += "/"
 
-                        seedfoundpath += str(i)
+                seedfoundpath += str(i)
 
-                        print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                              ": ***MATCHING SEED FOUND***, Matched on Address at derivation path:", seedfoundpath)
-                        # print("Found match with Hash160: ", binascii.hexlify(test_hash160))
+                print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                      ": ***MATCHING SEED FOUND***, Matched on Address at derivation path:", seedfoundpath)
+                # print("Found match with Hash160: ", binascii.hexlify(test_hash160))
 
-                        if len(self._derivation_salts) > 1:
-                            print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                  ": ***MATCHING SEED FOUND***, Matched with BIP39 Passphrase:", salt.decode())
+                if len(self._derivation_salts) > 1:
+                    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                          ": ***MATCHING SEED FOUND***, Matched with BIP39 Passphrase:", salt.decode())
 
-                        return True
+                return True
         return False
 
+    # Derives the (uncompressed) public keys of a batch of the non-hardened children, one per index in
+    # indexes, of a parent private key, returning them in a list. The work shared by the batch is done just
+    # once (the parent public key and the HMAC's keying with the chain code), leaving one HMAC-SHA512 and one
+    # EC multiplication by the generator per child. (Deriving the child public keys from the parent public
+    # key instead requires an EC point addition in addition to the same multiplication, which is slower.)
+    # Raises ValueError if the parent private key is invalid.
+    @staticmethod
+    def _derive_child_pubkeys(privkey_bytes, chaincode_bytes, indexes):
+        parent_hmac = hmac.new(chaincode_bytes, coincurve.PublicKey.from_valid_secret(privkey_bytes).format(),
+                               hashlib.sha512)
+        privkey_int = int.from_bytes(privkey_bytes, "big")
+        pack_index = struct.Struct(">I").pack  # the index is appended (big-endian) as per BIP32
+        pubkey_from_secret = coincurve.PublicKey.from_valid_secret
+        child_pubkeys = []
+        for i in indexes:
+            child_hmac = parent_hmac.copy()
+            child_hmac.update(pack_index(i))
+            seed_bytes = child_hmac.digest()
+
+            # The child private key is the parent one + the first half of the seed_bytes (mod n)
+            d_privkey_bytes = ((int.from_bytes(seed_bytes[:32], "big") + privkey_int) % GENERATOR_ORDER) \
+                .to_bytes(32, "big")
+            child_pubkeys.append(pubkey_from_secret(d_privkey_bytes).format(compressed=False))
+        return child_pubkeys
+
+    # Compiles the derivation paths in _path_indexes into a prefix tree, flattened into a list (in the
+    # original path order) of tuples: (path, derived_prefix, nodes_to_save). derived_prefix is the longest
+    # prefix this path shares with an earlier one, whose keys _verify_seed() will have already derived,
+    # and nodes_to_save maps the depths of this path's nodes which later paths share to their prefixes.
+    # This way each node of the tree (including those shared by e.g. m/44'/0'/0'/0 and m/44'/0'/0'/1)
+    # is only derived once per seed.
+    def _compile_path_derivation_plan(self):
+        paths = [tuple(path) for path in self._path_indexes]
+        derived_prefix_lens = []
+        for path_num, path in enumerate(paths):
+            shared_len = 0
+            for earlier_path in paths[:path_num]:
+                common_len = 0
+                for i, j in zip(path, earlier_path):
+                    if i != j: break
+                    common_len += 1
+                shared_len = max(shared_len, common_len)
+            derived_prefix_lens.append(shared_len)
+        path_derivation_plan = []
+        for path_num, path in enumerate(paths):
+            # The nodes of this path which later paths begin deriving from (and which this path derives)
+            nodes_to_save = {}
+            for later_path_num in range(path_num + 1, len(paths)):
+                later_prefix_len = derived_prefix_lens[later_path_num]
+                if derived_prefix_lens[path_num] < later_prefix_len <= len(path) and \
+                        paths[later_path_num][:later_prefix_len] == path[:later_prefix_len]:
+                    nodes_to_save[later_prefix_len] = path[:later_prefix_len]
+            path_derivation_plan.append((path, path[:derived_prefix_lens[path_num]], nodes_to_save))
+        return path_derivation_plan
+
     # Returns a dummy xpub for performance testing purposes
     @staticmethod
     def _performance_xpub():
@@ -1562,6 +1675,37 @@ class WalletBIP39(WalletBIP32):
         #    print("found valid(" + str(cavcsC) + ") checksum of:" + str(mnemonic_words))
         return cavcs
 
+    # Called by the final word typo completions below to list the only final words which complete the
+    # mnemonic_prefix (all but its final word) with a valid BIP39 checksum, in word id order (or None if
+    # this wallet doesn't use BIP39 checksums). Of the final word's 11 bits, only the first 11-CS bits
+    # are entropy, so just those 2^(11-CS) candidates are hashed, e.g. 128 instead of 2048 for 12 words.
+    def _checksum_final_word_ids(self, mnemonic_prefix):
+        if type(self)._verify_checksum is not WalletBIP39._verify_checksum:
+            return None
+        mnemonic_len = len(mnemonic_prefix) + 1
+        if mnemonic_len % 3 != 0:  # then the entropy isn't a whole number of bytes
+            return None
+        try:
+            prefix_int = int("".join(self._word_to_binary[w] for w in mnemonic_prefix), 2)
+        except (KeyError, TypeError):
+            return None
+        cksum_len_in_bits = mnemonic_len // 3
+        final_entropy_bits = 11 - cksum_len_in_bits
+        entropy_len_in_bytes = (mnemonic_len * 11 - cksum_len_in_bits) // 8
+        #
+        # The final word's entropy bits always lie within the final entropy byte, so the
+        # hash of the other entropy bytes is calculated just once and then copied
+        prefix_int <<= final_entropy_bits
+        prefix_sha256 = hashlib.sha256(int_to_bytes(prefix_int >> 8, entropy_len_in_bytes - 1))
+        final_byte_base = prefix_int & 0xFF
+        final_word_ids = []
+        for final_entropy in range(1 << final_entropy_bits):
+            sha256 = prefix_sha256.copy()
+            sha256.update(bytes((final_byte_base | final_entropy,)))
+            cksum_int = sha256.digest()[0] >> 8 - cksum_len_in_bits
+            final_word_ids.append(self._words[final_entropy << cksum_len_in_bits | cksum_int])
+        return final_word_ids
+
     # Called by WalletBIP32.return_verified_password_or_false() to create a binary seed
     def _derive_seed(self, mnemonic_words):
         # Note: the words are already in BIP39's normalized form
@@ -2177,6 +2321,7 @@ class WalletCardano(WalletBIP39):
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a mnemonic
     # is correct return it, else return False for item 0; return a count of mnemonics checked for item 1
     def _return_verified_password_or_false_cpu(self, mnemonic_ids_list):
+        valid_mnemonic_ids_list = []
         for count, mnemonic_ids in enumerate(mnemonic_ids_list, 1):
 
             if self.pre_start_benchmark or (not self._checksum_in_generator and not self._skip_worker_checksum):
@@ -2185,9 +2330,9 @@ class WalletCardano(WalletBIP39):
                 if not self._verify_checksum(mnemonic_ids):
                     continue
 
-            # If we are writing out the checksummed seeds, add them to the queue
+            # If we are writing out the checksummed seeds, add them to the queue (below)
             if self._savevalidseeds and not self.pre_start_benchmark:
-                self.worker_out_queue.put(mnemonic_ids)
+                valid_mnemonic_ids_list.append(mnemonic_ids)
                 continue
 
             # Convert the mnemonic sentence to seed bytes
@@ -2197,6 +2342,7 @@ class WalletCardano(WalletBIP39):
                 if self._verify_seed(derivation_type, derived_seed, salt):
                     return mnemonic_ids, count  # found it
 
+        self._put_valid_seeds(valid_mnemonic_ids_list)
         return False, count
 
     def _return_verified_password_or_false_opencl(self, mnemonic_ids_list):
@@ -2328,7 +2474,7 @@ class WalletPyCryptoHDWallet(WalletBIP39):
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a mnemonic
     # is correct return it, else return False for item 0; return a count of mnemonics checked for item 1
     def return_verified_password_or_false(self, mnemonic_ids_list):
-
+        valid_mnemonic_ids_list = []
         for count, mnemonic_ids in enumerate(mnemonic_ids_list, 1):
 
             if self.pre_start_benchmark or (not self._checksum_in_generator and not self._skip_worker_checksum):
@@ -2337,14 +2483,15 @@ class WalletPyCryptoHDWallet(WalletBIP39):
                 if not self._verify_checksum(mnemonic_ids):
                     continue
 
-            # If we are writing out the checksummed seeds, add them to the queue
+            # If we are writing out the checksummed seeds, add them to the queue (below)
             if self._savevalidseeds and not self.pre_start_benchmark:
-                self.worker_out_queue.put(mnemonic_ids)
+                valid_mnemonic_ids_list.append(mnemonic_ids)
                 continue
 
             if self._verify_seed(mnemonic_ids):
                 return mnemonic_ids, mnemonic_ids_list.index(mnemonic_ids) + 1  # found it
 
+        self._put_valid_seeds(valid_mnemonic_ids_list)
         return False, len(mnemonic_ids_list)
 
 
@@ -2987,6 +3134,18 @@ def init_gui():
             print("Warning: Unable to load TK, no gui available, you will need to set some recovery arguments manually")
 
 
+# When an earlier search phase has already tried replacing each word with its close words (see
+# run_btcrecover() ), the replaceword typo skips them so that its guesses don't repeat that phase's
+replaceword_skips_close_words = False
+
+
+# Returns the mnemonic_ids which the replaceword typo doesn't replace mnemonic_id with
+def skipped_replacement_ids(mnemonic_id):
+    if replaceword_skips_close_words:
+        return {mnemonic_id}.union(new_ids[0] for new_ids in close_mnemonic_ids.get(mnemonic_id, ()))
+    return {mnemonic_id}
+
+
 # seed.py uses routines from password.py to generate guesses, however instead
 # of dealing with passwords (immutable sequences of characters), it deals with
 # seeds (represented as immutable sequences of mnemonic_ids). More specifically,
@@ -3006,7 +3165,8 @@ def delete_word(mnemonic_ids, i):
 @btcrpass.register_simple_typo("replaceword")
 def replace_word(mnemonic_ids, i):
     if mnemonic_ids[i] is None: return (),  # don't touch invalid words
-    return ((new_id,) for new_id in loaded_wallet.word_ids if new_id != mnemonic_ids[i])
+    skipped_ids = skipped_replacement_ids(mnemonic_ids[i])
+    return ((new_id,) for new_id in loaded_wallet.word_ids if new_id not in skipped_ids)
 
 
 #
@@ -3023,17 +3183,52 @@ def replace_wrong_word(mnemonic_ids, i):
     return ((new_id,) for new_id in loaded_wallet.word_ids)
 
 
+# When seeds are checksummed in the generator, these limit the replacements of the final word
+# produced by the typo generators above to those with a valid checksum (see btcrpass.py's
+# simple_typos_completion_generator() ). They're produced in the same order as above, so
+# the generated seeds are identical to those which would otherwise pass the checksum.
+#
+@btcrpass.register_simple_typo_completion("replaceword")
+def replace_final_word(mnemonic_ids_prefix, mnemonic_ids, i):
+    if mnemonic_ids[i] is None: return None
+    final_word_ids = checksum_final_word_ids(mnemonic_ids_prefix)
+    if final_word_ids is None: return None
+    skipped_ids = skipped_replacement_ids(mnemonic_ids[i])
+    return ((new_id,) for new_id in final_word_ids if new_id not in skipped_ids)
+
+
+#
+@btcrpass.register_simple_typo_completion("replacewrongword")
+def replace_final_wrong_word(mnemonic_ids_prefix, mnemonic_ids, i):
+    if mnemonic_ids[i] is not None: return None
+    final_word_ids = checksum_final_word_ids(mnemonic_ids_prefix)
+    if final_word_ids is None: return None
+    return ((new_id,) for new_id in final_word_ids)
+
+
+def checksum_final_word_ids(mnemonic_ids_prefix):
+    if not getattr(loaded_wallet, "_checksum_in_generator", False) or \
+            not hasattr(loaded_wallet, "_checksum_final_word_ids"):
+        return None
+    return loaded_wallet._checksum_final_word_ids(mnemonic_ids_prefix)
+
+
 # Builds a command line and then runs btcrecover with it.
 #   typos     - max number of mistakes to apply to each guess
 #   big_typos - max number of "big" mistakes to apply to each guess;
 #               a big mistake involves replacing or inserting a word using the
 #               full word list, and significantly increases the search time
 #   min_typos - min number of mistakes to apply to each guess
+#   exact_big_typos - if True, require exactly big_typos "big" mistakes instead of up to that
+#               many, and don't replace words with their close words; this is for a search
+#               phase which follows others that tried all guesses with fewer big mistakes
+#   session   - a btcrpass.SearchSession shared by all the search phases
 num_inserts = num_deletes = 0
 
 
 def run_btcrecover(typos, big_typos=0, min_typos=0, is_performance=False, extra_args=None, tokenlist=None,
-                   passwordlist=None, listpass=None, min_tokens=None, max_tokens=None, mnemonic_length=None):
+                   passwordlist=None, listpass=None, min_tokens=None, max_tokens=None, mnemonic_length=None,
+                   exact_big_typos=False, session=None):
     if extra_args is None:
         extra_args = []
     if typos < 0:  # typos == 0 is silly, but causes no harm
@@ -3094,6 +3289,7 @@ def run_btcrecover(typos, big_typos=0, min_typos=0, is_performance=False, extra_
         btcr_args += " --typos-deleteword"
         if l_num_deletes < typos:
             btcr_args += " --max-typos-deleteword " + str(l_num_deletes)
+        btcr_args += " --min-typos-deleteword " + str(l_num_deletes)
 
     if num_wrong:  # if any of the words were invalid (and need to be replaced)
         any_typos -= num_wrong
@@ -3101,6 +3297,7 @@ def run_btcrecover(typos, big_typos=0, min_typos=0, is_performance=False, extra_
         btcr_args += " --typos-replacewrongword"
         if num_wrong < typos:
             btcr_args += " --max-typos-replacewrongword " + str(num_wrong)
+        btcr_args += " --min-typos-replacewrongword " + str(num_wrong)
 
     # For (only) Electrum2, num_inserts are not required, so we try several sub-phases with a
     # different number of inserts each time; for all others the total num_inserts are required
@@ -3142,13 +3339,17 @@ def run_btcrecover(typos, big_typos=0, min_typos=0, is_performance=False, extra_
         if l_big_typos < 0:  # if too many big typos are required to generate valid mnemonics
             print("Not enough entirely different seed words permitted; skipping", maybe_skipping)
             return False
+        if exact_big_typos and l_big_typos > l_any_typos:  # if the required typos leave no room for these
+            print("Not enough mistakes permitted for", l_big_typos, "entirely different seed words; skipping",
+                  maybe_skipping)
+            return False
         assert typos >= cur_num_inserts + l_num_deletes + num_wrong
 
         if subphase_num == 1 and len(num_inserts_to_try) > 1:
             print(subphase_msg)
 
-        # Because btcrecover doesn't support --min-typos-* on a per-typo basis, it ends
-        # up generating some invalid guesses. We can use --min-typos to filter out some
+        # The required deleteword and replacewrongword typos are enforced by --min-typos-*, but
+        # inserts aren't a simple typo, so --min-typos filters out some guesses without enough
         # of them (the remainder is later filtered out by verify_mnemonic_syntax()).
         min_typos = max(min_typos, cur_num_inserts + l_num_deletes + num_wrong)
         if min_typos:
@@ -3166,6 +3367,8 @@ def run_btcrecover(typos, big_typos=0, min_typos=0, is_performance=False, extra_
                 l_btcr_args += " --typos-replaceword"
                 if l_big_typos < typos:
                     l_btcr_args += " --max-typos-replaceword " + str(l_big_typos)
+                if exact_big_typos:
+                    l_btcr_args += " --min-typos-replaceword " + str(l_big_typos)
 
             # only add replacecloseword typos if they're not already covered by the
             # replaceword typos added above and there exists at least one close word
@@ -3175,6 +3378,9 @@ def run_btcrecover(typos, big_typos=0, min_typos=0, is_performance=False, extra_
                 if num_replacecloseword < typos:
                     l_btcr_args += " --max-typos-replacecloseword " + str(num_replacecloseword)
 
+        global replaceword_skips_close_words
+        replaceword_skips_close_words = exact_big_typos
+
         btcrpass.parse_arguments(
             l_btcr_args.split() + extra_args,
             inserted_items=ids_to_try_inserting,
@@ -3182,7 +3388,8 @@ def run_btcrecover(typos, big_typos=0, min_typos=0, is_performance=False, extra_
             base_iterator=(mnemonic_ids_guess,) if not is_performance else None,  # the one guess to modify
             perf_iterator=lambda: loaded_wallet.performance_iterator(),
             check_only=loaded_wallet.verify_mnemonic_syntax,
-            disable_security_warning_param=True
+            disable_security_warning_param=True,
+            session=session
         )
         (mnemonic_found, not_found_msg) = btcrpass.main()
 
@@ -3307,6 +3514,9 @@ def main(argv):
         parser.add_argument("--multi-file-seedlist", action="store_true",
                             help="Enables the loading of a seedlist file split over mulitple files "
                                  "with the suffix _XXXX.txt")
+        parser.add_argument("--seedlist-index", action="store_true",
+                            help="Build (or update) and use an index of the (text) seedlist file(s), saved alongside "
+                                 "each, so that the seeds can be counted and skipped without reading them")
 
         parser.add_argument("--listseeds", action="store_true",
                             help="Just list all seed phrase combinations to test and exit")
@@ -3316,10 +3526,18 @@ def main(argv):
         parser.add_argument("--savevalidseeds-filesize", type=int, metavar="COUNT",
                             help="The number of valid seeds to include in each file, multiple output files are "
                                  "automatically incremented when this number is reached")
+        parser.add_argument("--savevalidseeds-packed", action="store_true",
+                            help="Save the valid seeds in a compact binary format (_XXXX.bin files of 11-bit word "
+                                 "indexes) instead of as text; these can be loaded with --seedlist as usual")
 
         parser.add_argument("--skip-worker-checksum", action="store_true",
                             help="Skip the checksum test for BIP39/Electrum seeds (This will force test all seeds, "
                                  "as opposed to 1/10, and will slow things down a lot)")
+        parser.add_argument("--force-checksum-in-generator", action="store_true",
+                            help="Perform the BIP39/Electrum seed checksums in the main thread instead of in the "
+                                 "workers, so only seeds with a valid checksum are passed to the workers; when a "
+                                 "BIP39 seed's final word is being replaced, only the words which complete a valid "
+                                 "checksum are generated")
         opencl_group = parser.add_argument_group("OpenCL acceleration")
         opencl_group.add_argument("--enable-opencl", action="store_true",
                                   help="enable experimental OpenCL-based (GPU) acceleration (only supports BIP39 "
@@ -3334,10 +3552,6 @@ def main(argv):
                                        "seperated list eg: 1 2 4 (default: all)")
         opencl_group.add_argument("--opencl-info", action="store_true",
                                   help="list available GPU names and IDs, then exit")
-        opencl_group.add_argument("--force-checksum-in-generator", action="store_true",
-                                  help="GPU processing currently performs seed checksums in the main thread, "
-                                       "which works well for 12 word BIP39 seeds, "
-                                       "but hurts performance in 12 and 24 word seeds")
 
         # Optional bash tab completion support
         try:
@@ -3530,6 +3744,8 @@ def main(argv):
 
             if args.seedlist:
                 phase["passwordlist"] = args.seedlist
+                if args.seedlist_index:
+                    extra_args.append("--passwordlist-index")
 
             if args.wallet_type == "electrum1":
                 args.mnemonic_length = None
@@ -3710,6 +3926,7 @@ def main(argv):
         loaded_wallet._savevalidseeds = False
         if args.savevalidseeds:
             loaded_wallet._savevalidseeds = args.savevalidseeds
+            loaded_wallet._savevalidseeds_packed = args.savevalidseeds_packed
             if args.savevalidseeds_filesize:
                 if args.savevalidseeds_filesize <= 0:
                     print("ERROR: --savevalidseed-filesize needs to be a positive whole number")
@@ -3738,6 +3955,16 @@ def main(argv):
         loaded_wallet.opencl = False
         loaded_wallet.opencl_algo = -1
         loaded_wallet.opencl_context_pbkdf2_sha512 = -1
+
+        # With the checksum in the generator, the final seed word is also solved for directly when possible
+        if args.force_checksum_in_generator:
+            print()
+            print(
+                "Note: Performing Seed Checksum in the Generator Step will result in inaccurate speed and password"
+                " count numbers (Only seeds with valid checksum are included in the count)")
+            print()
+            loaded_wallet._checksum_in_generator = True
+
         # Parse and syntax check all of the GPU related options
         if args.enable_opencl:
             if not module_opencl_available:
@@ -3753,14 +3980,6 @@ def main(argv):
             # Append GPU related arguments to be sent to BTCrpass
             extra_args.append("--enable-opencl")
 
-            if args.force_checksum_in_generator:
-                print()
-                print(
-                    "Note: Performing Seed Checksum in the Generator Step will result in inaccurate speed and password"
-                    " count numbers (Only seeds with valid checksum are included in the count)")
-                print()
-                loaded_wallet._checksum_in_generator = True
-
             #
             if args.opencl_platform:
                 loaded_wallet.opencl_platform = args.opencl_platform[0]
@@ -3865,6 +4084,15 @@ def main(argv):
         #
         # Add a final more thorough phase (This one will take a few hours)
         phases.append(dict(typos=2, big_typos=2, min_typos=2, extra_args=["--no-dupchecks"]))
+        #
+        # Each phase only tries guesses with exactly its number of big typos; those with fewer were tried
+        # by the phases before it, so no guess is tried twice and all the phases together take about as
+        # long as the last one would by itself
+        for phase_params in phases:
+            phase_params["exact_big_typos"] = True
+
+    # The wallet's performance is measured once, by the first phase, instead of by every phase
+    session = btcrpass.SearchSession()
 
     for phase_num, phase_params in enumerate(phases, 1):
         # Print Timestamp that this step occured
@@ -3887,7 +4115,7 @@ def main(argv):
         # Perform this phase's search
         phase_params.setdefault("extra_args", []).extend(extra_args)
 
-        mnemonic_found = run_btcrecover(**phase_params)
+        mnemonic_found = run_btcrecover(session=session, **phase_params)
 
         if not listseeds:
             # Print Timestamp that this step occured
@@ -3903,6 +4131,8 @@ def main(argv):
                 pass
             else:
                 print(" Seed not found" + (", sorry..." if phase_num == len(phases) else ""))
+                if len(phases) > 1:
+                    print(" {:,} seeds tried so far in phases 1-{}".format(session.passwords_tried, phase_num))
 
     return False, None  # No error occurred; the mnemonic wasn't found
 
@@ -0,0 +1,128 @@
+# hash160batch.py -- btcrecover batched hash160 computation
+# Copyright (C) 2024 Stephen Rothery
+#
+# This file is part of btcrecover.
+#
+# btcrecover is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version
+# 2 of the License, or (at your option) any later version.
+#
+# btcrecover is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/
+
+# Computes many hash160s (RIPEMD-160 of SHA-256) at once. When hashlib has a native RIPEMD-160 this is just
+# a loop over hashlib, but when it doesn't (e.g. OpenSSL 3), the pure-Python fallback in lib.embit costs over
+# 100us per call, which makes it the most expensive step of checking an address. Every SHA-256 digest is
+# exactly 32 bytes, so the RIPEMD-160 of a batch of them is always a single padded block per message, and
+# is instead computed for all the messages together in NumPy uint32 lanes.
+
+import hashlib
+
+try:
+    # this will raise an exception if ripemd is not supported (python3.10, openssl 3)
+    hashlib.new("ripemd160")
+    hashlib_ripemd160_available = True
+except ValueError:
+    hashlib_ripemd160_available = False
+
+from lib.embit.py_ripemd160 import ripemd160 as py_ripemd160, ML, MR, RL, RR, KL, KR
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # the RIPEMD-160 of each message is computed one at a time by py_ripemd160
+
+
+def ripemd160(msg):
+    """Compute the RIPEMD-160 hash of msg, natively if possible"""
+    if hashlib_ripemd160_available:
+        return hashlib.new("ripemd160", msg).digest()
+    return py_ripemd160(msg)
+
+
+# Below this many 32-byte messages, NumPy's per-operation overhead costs more than
+# running py_ripemd160 once per message
+RIPEMD160_MANY_MIN_BATCH = 12
+
+_RIPEMD160_INIT = (0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476, 0xc3d2e1f0)
+
+
+def ripemd160_many(msgs):
+    """Computes the RIPEMD-160 hashes of a sequence of messages
+
+    :param msgs: the messages to hash
+    :type msgs: collections.abc.Sequence[bytes]
+    :return: the 20-byte hashes, in the same order as msgs
+    :rtype: list[bytes]
+    """
+    if hashlib_ripemd160_available:
+        l_new = hashlib.new
+        return [l_new("ripemd160", msg).digest() for msg in msgs]
+    if numpy is None or len(msgs) < RIPEMD160_MANY_MIN_BATCH or any(len(msg) != 32 for msg in msgs):
+        return [py_ripemd160(msg) for msg in msgs]
+    return _ripemd160_32_many(msgs)
+
+
+def hash160_many(msgs):
+    """Computes the hash160s (RIPEMD-160 of SHA-256) of a sequence of messages, e.g. public keys
+
+    :param msgs: the messages to hash
+    :type msgs: collections.abc.Sequence[bytes]
+    :return: the 20-byte hash160s, in the same order as msgs
+    :rtype: list[bytes]
+    """
+    l_sha256 = hashlib.sha256
+    if hashlib_ripemd160_available:
+        l_new = hashlib.new
+        return [l_new("ripemd160", l_sha256(msg).digest()).digest() for msg in msgs]
+    return ripemd160_many([l_sha256(msg).digest() for msg in msgs])
+
+
+# Computes the RIPEMD-160 hashes of a list of 32-byte messages; each is exactly one block once padded,
+# so the compression function runs once with each 32-bit word of state being a NumPy array (one lane per message)
+def _ripemd160_32_many(msgs):
+    count = len(msgs)
+    # The 16 message words (little-endian) of each padded block: 8 words of message, the 0x80 terminator,
+    # zeros, and the message length in bits (256)
+    words = numpy.zeros((16, count), numpy.uint32)
+    words[:8] = numpy.frombuffer(b"".join(msgs), "<u4").reshape(count, 8).T
+    words[8] = 0x80
+    words[14] = 256
+    x = list(words)
+
+    def rol(v, i):
+        return (v << numpy.uint32(i)) | (v >> numpy.uint32(32 - i))
+
+    def fi(b, c, d, rnd):
+        if rnd == 0:
+            return b ^ c ^ d
+        elif rnd == 1:
+            return (b & c) | (~b & d)
+        elif rnd == 2:
+            return (b | ~c) ^ d
+        elif rnd == 3:
+            return (b & d) | (c & ~d)
+        else:
+            return b ^ (c | ~d)
+
+    h0, h1, h2, h3, h4 = (numpy.full(count, h, numpy.uint32) for h in _RIPEMD160_INIT)
+    al, bl, cl, dl, el = h0, h1, h2, h3, h4
+    ar, br, cr, dr, er = h0, h1, h2, h3, h4
+    kl = [numpy.uint32(k) for k in KL]
+    kr = [numpy.uint32(k) for k in KR]
+    for j in range(80):
+        rnd = j >> 4
+        al = rol(al + fi(bl, cl, dl, rnd) + x[ML[j]] + kl[rnd], RL[j]) + el
+        al, bl, cl, dl, el = el, al, bl, rol(cl, 10), dl
+        ar = rol(ar + fi(br, cr, dr, 4 - rnd) + x[MR[j]] + kr[rnd], RR[j]) + er
+        ar, br, cr, dr, er = er, ar, br, rol(cr, 10), dr
+
+    state = numpy.stack((h1 + cl + dr, h2 + dl + er, h3 + el + ar, h4 + al + br, h0 + bl + cr))
+    digests = state.T.astype("<u4").tobytes()
+    return [digests[i:i + 20] for i in range(0, 20 * count, 20)]
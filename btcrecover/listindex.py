@@ -0,0 +1,378 @@
+# listindex.py -- btcrecover passwordlist index files
+# Copyright (C) 2024 Stephen Rothery
+#
+# This file is part of btcrecover.
+#
+# btcrecover is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version
+# 2 of the License, or (at your option) any later version.
+#
+# btcrecover is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/
+
+# A passwordlist index is a small file saved alongside a (text) passwordlist or seed list, named the same but with
+# an added ".index" extension. It holds the number of valid lines in the list, and the file offset of every
+# LINES_PER_OFFSET-th one, so the lines can be counted without reading them, and the n-th one can be located after
+# reading at most LINES_PER_OFFSET lines. A line is valid if it's UTF-8 without any REPLACEMENT CHARACTERs (others
+# are skipped with a warning when the list is read). Only newline-terminated lines are indexed, and the index is
+# saved periodically as it's built, so an interrupted build, or a list which has been appended to since it was
+# indexed, is resumed from where the index ends instead of being read again from the beginning. (Unlike when a
+# list is read as text, a lone "\r" without a "\n" doesn't end a line.)
+#
+# Lists may also be gzip, bz2 or xz compressed, in which case the offsets are positions in the decompressed list.
+# Locating a line still requires decompressing the list up to that line, but not reading the lines before it,
+# and counting them requires neither. A compressed list is indexed again from the beginning if it's changed.
+
+import array
+import ast
+import bz2
+import codecs
+import gzip
+import hashlib
+import itertools
+import lzma
+import os
+import sys
+
+
+# The modules which can decompress the supported compressed formats, by their file magic
+COMPRESSION_MODULES = ((b"\x1f\x8b", gzip), (b"BZh", bz2), (b"\xfd7zXZ\x00", lzma))
+
+
+def compression_module(filename):
+    """Checks if a file is compressed in a supported format
+
+    :param filename: the file to check
+    :type filename: str
+    :return: the module (gzip, bz2 or lzma) whose open() function can decompress it, or None
+    """
+    try:
+        with open(filename, "rb") as listfile:
+            magic = listfile.read(6)
+    except (IOError, OSError):
+        return None
+    for compressed_magic, module in COMPRESSION_MODULES:
+        if magic.startswith(compressed_magic):
+            return module
+    return None
+
+
+def is_compressed_file(file):
+    """Checks if an opened file is one being decompressed as it's read (e.g. by open_or_use())
+
+    :param file: the opened file, either binary or text
+    :rtype: bool
+    """
+    return isinstance(getattr(file, "buffer", file), (gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile))
+
+
+def is_valid_line(line):
+    """Checks if a line from a passwordlist (without its line ending) is valid
+
+    :param line: the line to check
+    :type line: bytes
+    :rtype: bool
+    """
+    return "\uFFFD" not in line.decode("utf_8", "replace")
+
+
+def _all_lines_valid(lines):
+    # The usual case, checked without splitting lines into individual lines
+    if lines.isascii():
+        return True
+    try:
+        return "\uFFFD" not in lines.decode("utf_8")
+    except UnicodeDecodeError:
+        return False
+
+
+class PasswordListIndex(object):
+    VERSION = 1
+    MAGIC = b"btcrecover passwordlist index\r\n"  # file magic
+    LINES_PER_OFFSET = 4096
+    READ_SIZE = 4 * 1024 * 1024
+    SAVE_EVERY = 1024 * 1024 * 1024  # while indexing, the index is saved after indexing about this many bytes
+    CHECK_LEN = 4096  # how many bytes at each end of the indexed lines are hashed to detect a changed list
+
+    def __init__(self, filename):
+        """Create a (so far empty) index of a passwordlist
+
+        :param filename: the passwordlist's filename
+        :type filename: str
+        """
+        self.filename = filename
+        self.index_filename = filename + ".index"
+        self.line_count = 0  # the number of valid lines indexed so far
+        self.lines_total = 0  # the number of lines indexed so far, including invalid ones
+        self.indexed_len = 0  # the file offset just past the last indexed line
+        self.offsets = array.array("Q")  # the file offset and line number of every LINES_PER_OFFSET-th valid line
+        self.check_hashes = None  # hashes of the beginning and end of the indexed lines
+        self.file_len = 0  # the length of the list when it was last updated
+        self.final_line = None  # if the list ends without a newline, whether its final line is valid
+        self.compressed_len = None  # if the list is compressed, its (compressed) length
+        self.complete = False  # if the list is compressed, whether all of it has been indexed
+
+    def __len__(self):
+        return self.line_count + (1 if self.final_line else 0)
+
+    @classmethod
+    def load(cls, filename):
+        """Loads the index of a passwordlist if one has been saved, otherwise creates an empty one
+
+        Call update() before using the index to ensure it's current.
+
+        :param filename: the passwordlist's filename (not the index's)
+        :type filename: str
+        :rtype: PasswordListIndex
+        """
+        self = cls(filename)
+        try:
+            with open(self.index_filename, "rb") as index_file:
+                index_data = index_file.read()
+        except FileNotFoundError:
+            return self
+        #
+        # Read in the header safely (ast.literal_eval() is safe for untrusted data)
+        config_end = index_data.find(b"\r\n", len(cls.MAGIC))
+        if not index_data.startswith(cls.MAGIC) or config_end < 0:
+            raise ValueError("unrecognized file format (invalid magic) in '{}'".format(self.index_filename))
+        config = ast.literal_eval(index_data[len(cls.MAGIC):config_end].decode())
+        if config["version"] != cls.VERSION or config["lines_per_offset"] != cls.LINES_PER_OFFSET:
+            return self  # (it's rebuilt)
+        self.offsets.frombytes(index_data[config_end + 2:])
+        if config["byteorder"] != sys.byteorder:
+            self.offsets.byteswap()
+        if len(self.offsets) != 2 * (-(-config["line_count"] // cls.LINES_PER_OFFSET)):
+            raise ValueError("truncated passwordlist index '{}'".format(self.index_filename))
+        self.line_count = config["line_count"]
+        self.lines_total = config["lines_total"]
+        self.indexed_len = config["indexed_len"]
+        self.check_hashes = config["check_hashes"]
+        self.file_len = config.get("file_len", 0)
+        self.final_line = config.get("final_line")
+        self.compressed_len = config.get("compressed_len")
+        self.complete = config.get("complete", False)
+        return self
+
+    def save(self):
+        """Saves the index (as the passwordlist's filename plus ".index"), replacing any saved earlier"""
+        config = dict(version=self.VERSION, lines_per_offset=self.LINES_PER_OFFSET, line_count=self.line_count,
+                      lines_total=self.lines_total, indexed_len=self.indexed_len, check_hashes=self.check_hashes,
+                      file_len=self.file_len, final_line=self.final_line, compressed_len=self.compressed_len,
+                      complete=self.complete, byteorder=sys.byteorder)
+        temp_filename = self.index_filename + ".partial"
+        with open(temp_filename, "wb") as index_file:
+            index_file.write(self.MAGIC + repr(config).encode() + b"\r\n")
+            index_file.write(self.offsets.tobytes())
+        os.replace(temp_filename, self.index_filename)
+
+    def _check_hashes(self, listfile, check_len):
+        # Hashes the beginning and the end of the first check_len bytes of the file
+        listfile.seek(0)
+        head = listfile.read(min(self.CHECK_LEN, check_len))
+        listfile.seek(max(check_len - self.CHECK_LEN, 0))
+        tail = listfile.read(min(self.CHECK_LEN, check_len))
+        return [hashlib.sha256(head).hexdigest(), hashlib.sha256(tail).hexdigest()]
+
+    def _open(self):
+        # Opens the list for reading (as binary), decompressing it if it's compressed
+        compression = compression_module(self.filename)
+        return compression.open(self.filename, "rb") if compression else open(self.filename, "rb")
+
+    def _index_lines(self, lines):
+        # Indexes the complete (newline-terminated) lines which immediately follow those already indexed
+        split_lines = lines.split(b"\n")
+        del split_lines[-1]  # (the empty string following the final newline)
+        if _all_lines_valid(lines):
+            # The offsets are found without examining each line individually
+            first = -self.line_count % self.LINES_PER_OFFSET
+            if first < len(split_lines):
+                lens_before = itertools.accumulate(itertools.chain((0,), map(len, split_lines)))
+                for i, len_before in zip(range(first, len(split_lines), self.LINES_PER_OFFSET),
+                                         itertools.islice(lens_before, first, None, self.LINES_PER_OFFSET)):
+                    self.offsets.extend((self.indexed_len + len_before + i, self.lines_total + i))
+            self.line_count += len(split_lines)
+            self.lines_total += len(split_lines)
+        else:
+            offset = self.indexed_len
+            for line in split_lines:
+                if is_valid_line(line):
+                    if self.line_count % self.LINES_PER_OFFSET == 0:
+                        self.offsets.extend((offset, self.lines_total))
+                    self.line_count += 1
+                self.lines_total += 1
+                offset += len(line) + 1
+        self.indexed_len += len(lines)
+
+    def update(self, progress=None):
+        """Indexes any lines of the passwordlist which haven't been indexed, and saves the index if it's changed
+
+        If the list has been changed (other than by appending to it if it's uncompressed) since it was indexed,
+        it's indexed again.
+
+        :param progress: if indexing a large number of lines, called with the passwordlist's filename and None
+            before starting, and then with the fraction completed, finally 1.0, while indexing
+        :type progress: (str, float | None) -> None | None
+        """
+        saved_len = self.indexed_len
+        compression = compression_module(self.filename)
+        with open(self.filename, "rb") as rawfile:
+            raw_len = os.fstat(rawfile.fileno()).st_size
+            if compression:
+                # The compressed file itself is checked for changes
+                check_hashes = self._check_hashes(rawfile, raw_len)
+                if self.indexed_len and (raw_len != self.compressed_len or check_hashes != self.check_hashes):
+                    self.__init__(self.filename)  # the list has changed, so start over
+                    saved_len = -1
+                if self.complete:
+                    return
+                self.compressed_len, self.check_hashes = raw_len, check_hashes
+                rawfile.seek(0)
+                listfile = compression.open(rawfile, "rb")
+                remaining_len = None  # (unknown until it's decompressed)
+            else:
+                listfile = rawfile
+                if self.indexed_len and (self.indexed_len > raw_len or
+                                         self._check_hashes(listfile, self.indexed_len) != list(self.check_hashes)):
+                    self.__init__(self.filename)  # the list has changed, so start over
+                    saved_len = -1
+            try:
+                if not self.indexed_len:  # skip any UTF-8 BOM, as is done when a passwordlist is opened as text
+                    listfile.seek(0)
+                    if listfile.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+                        self.indexed_len = len(codecs.BOM_UTF8)
+                #
+                listfile.seek(self.indexed_len)
+                if not compression:
+                    remaining_len = raw_len - self.indexed_len
+                if progress and (compression or remaining_len > self.READ_SIZE):
+                    progress(self.filename, None)
+                else:
+                    progress = None
+                last_saved_len = self.indexed_len
+                unterminated = b""  # the beginning of a line which continues past the end of the last block read
+                while remaining_len is None or remaining_len > 0:
+                    block = listfile.read(self.READ_SIZE if remaining_len is None else
+                                          min(self.READ_SIZE, remaining_len))
+                    if not block:  # (the end of a compressed file, or the file has been truncated since it was opened)
+                        break
+                    if remaining_len is not None:
+                        remaining_len -= len(block)
+                    block = unterminated + block
+                    lines_end = block.rfind(b"\n") + 1
+                    unterminated = block[lines_end:]
+                    if lines_end:
+                        self._index_lines(block[:lines_end])
+                        if self.indexed_len - last_saved_len >= self.SAVE_EVERY:
+                            if not compression:
+                                self.check_hashes = self._check_hashes(listfile, self.indexed_len)
+                                listfile.seek(self.indexed_len + len(unterminated))
+                            self.save()
+                            last_saved_len = self.indexed_len
+                        if progress:
+                            progress(self.filename, rawfile.tell() / raw_len)
+                self.file_len = self.indexed_len + len(unterminated)
+                self.final_line = is_valid_line(unterminated) if unterminated else None
+                #
+                if compression:
+                    self.complete = True
+                    self.save()
+                elif self.indexed_len != saved_len:
+                    self.check_hashes = self._check_hashes(listfile, self.indexed_len)
+                    self.save()
+            finally:
+                if compression:
+                    listfile.close()
+        if progress:
+            progress(self.filename, 1.0)
+
+    def lines(self, start_index=0):
+        """Produces the lines (without their line endings) beginning with the (zero-based) start_index-th valid line
+
+        :param start_index: the index of the first valid line to produce
+        :type start_index: int
+        :return: (line number, line) tuples, where line is None if it's an invalid line (which follows the first line)
+        :rtype: collections.abc.Iterator[(int, str | None)]
+        """
+        if start_index >= len(self):
+            return
+        offset_num = start_index // self.LINES_PER_OFFSET
+        skip_count = start_index - offset_num * self.LINES_PER_OFFSET
+        with self._open() as listfile:
+            if offset_num:
+                offset, lines_before = self.offsets[2 * offset_num : 2 * offset_num + 2]
+            else:  # begin with any invalid lines preceding the first valid one
+                offset = len(codecs.BOM_UTF8) if listfile.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8 else 0
+                lines_before = 0
+            listfile.seek(offset)
+            remaining_len = self.file_len - offset
+            for line_num, line in enumerate(listfile, lines_before + 1):
+                if remaining_len <= 0:
+                    break
+                remaining_len -= len(line)
+                if remaining_len < 0:  # (the file has been appended to since it was indexed)
+                    line = line[:remaining_len]
+                line = line.strip(b"\r\n").decode("utf_8", "replace")
+                is_valid = "\uFFFD" not in line
+                if skip_count:
+                    if is_valid:
+                        skip_count -= 1
+                    continue
+                yield line_num, line if is_valid else None
+
+
+class IndexedPasswordList(object):
+
+    def __init__(self, indexes):
+        """Create a list from the indexes of one or more passwordlist files which together form a single list
+
+        :param indexes: the (updated) indexes of the files, in order
+        :type indexes: collections.abc.Iterable[PasswordListIndex]
+        """
+        self._indexes = list(indexes)
+        self._len = sum(map(len, self._indexes))
+
+    def __len__(self):
+        return self._len
+
+    @classmethod
+    def fromfiles(cls, filenames, progress=None):
+        """Loads (building or updating as necessary) the indexes of one or more passwordlist files
+
+        :param filenames: the files, in order, which together form a single list
+        :type filenames: collections.abc.Iterable[str]
+        :param progress: see PasswordListIndex.update()
+        :type progress: (str, float | None) -> None | None
+        :rtype: IndexedPasswordList
+        """
+        indexes = []
+        for filename in filenames:
+            index = PasswordListIndex.load(filename)
+            index.update(progress)
+            indexes.append(index)
+        if not indexes:
+            raise ValueError("no passwordlist files were specified")
+        return cls(indexes)
+
+    def lines(self, start_index=0):
+        """Produces the lines of all the files, as PasswordListIndex.lines() does for each
+
+        The line numbers are counted continuously from the first file to the last.
+
+        :param start_index: the index of the first valid line to produce
+        :type start_index: int
+        :rtype: collections.abc.Iterator[(int, str | None)]
+        """
+        lines_before = 0
+        for index in self._indexes:
+            if start_index < len(index):
+                for line_num, line in index.lines(max(start_index, 0)):
+                    yield lines_before + line_num, line
+            start_index -= len(index)
+            lines_before += index.lines_total + (0 if index.final_line is None else 1)
@@ -0,0 +1,191 @@
+# packedseeds.py -- btcrecover packed seed list files
+# Copyright (C) 2024 Stephen Rothery
+#
+# This file is part of btcrecover.
+#
+# btcrecover is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version
+# 2 of the License, or (at your option) any later version.
+#
+# btcrecover is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/
+
+# A packed seed list holds seed phrases (e.g. those saved by seedrecover's --savevalidseeds) as fixed-size
+# records of their word indexes, bits_per_word bits each (11 for a BIP39 wordlist), instead of as lines of
+# text. Like an AddressSet, the file begins with a 64K header of the file magic and a Python literal dict,
+# which includes the wordlist itself, so a file can be read back without knowing which language it's in.
+# Since every record is the same size, the n-th seed is located without reading any of those before it.
+
+import ast
+import mmap
+import os
+
+
+def is_packed_seedlist(filename):
+    """Checks if a file is a packed seed list (as opposed to a text seed list)
+
+    :param filename: the file to check
+    :type filename: str
+    :rtype: bool
+    """
+    try:
+        with open(filename, "rb") as seedfile:
+            return seedfile.read(len(PackedSeedList.MAGIC)) == PackedSeedList.MAGIC
+    except (IOError, OSError):
+        return False
+
+
+class PackedSeedList(object):
+    VERSION = 1
+    MAGIC = b"seedrecover packed seed list\r\n"  # file magic
+    HEADER_LEN = 65536
+    assert HEADER_LEN % mmap.ALLOCATIONGRANULARITY == 0
+    SEEDS_PER_READ = 4096  # how many records are copied out of the memory map at a time
+
+    def __init__(self, words, words_per_seed, language=None):
+        """Create a (so far empty) packed seed list
+
+        :param words: the wordlist, in word index order
+        :type words: collections.abc.Sequence[str]
+        :param words_per_seed: the length of every seed in the list
+        :type words_per_seed: int
+        :param language: the wordlist's language (for information only)
+        :type language: str | None
+        """
+        self.words = tuple(words)
+        self.words_per_seed = words_per_seed
+        self.language = language
+        self.bits_per_word = (len(self.words) - 1).bit_length()
+        self.record_len = (words_per_seed * self.bits_per_word + 7) // 8
+        self._word_to_id = None
+        self._files = []  # a (memory map, index of its first seed, seed count, filename) tuple for each file
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _header(self):
+        # Construct a 64K header with the file magic, the wordlist and seed length, plus the version
+        header_dict = dict(version=self.VERSION, words=self.words, words_per_seed=self.words_per_seed,
+                           language=self.language)
+        header = self.MAGIC + repr(header_dict).encode() + b"\r\n"
+        assert len(header) < self.HEADER_LEN
+        return header + b"\0" * (self.HEADER_LEN - len(header))  # appends at least one nul
+
+    def pack(self, seeds):
+        """Packs seeds into records which can be appended to a file opened by append_to()
+
+        :param seeds: the seeds, each a sequence of words_per_seed words from the wordlist
+        :type seeds: collections.abc.Iterable[collections.abc.Sequence[str]]
+        :return: the concatenated records
+        :rtype: bytes
+        """
+        if self._word_to_id is None:
+            self._word_to_id = {word: id for id, word in enumerate(self.words)}
+        l_word_to_id = self._word_to_id
+        l_bits_per_word = self.bits_per_word
+        l_record_len = self.record_len
+        l_words_per_seed = self.words_per_seed
+        records = bytearray()
+        for seed in seeds:
+            if len(seed) != l_words_per_seed:
+                raise ValueError("every seed in a packed seed list must have {} words".format(l_words_per_seed))
+            record = 0
+            for word in seed:
+                record = record << l_bits_per_word | l_word_to_id[word]
+            records += record.to_bytes(l_record_len, "big")
+        return bytes(records)
+
+    def append_to(self, filename):
+        """Opens a file for appending records from pack(), writing this list's header if the file is new
+
+        :param filename: the file to open
+        :type filename: str
+        :return: the opened file
+        :rtype: io.BufferedWriter
+        """
+        seedfile = open(filename, "ab", buffering=65536)
+        if seedfile.tell() == 0:
+            seedfile.write(self._header())
+        else:
+            with open(filename, "rb") as existing_file:
+                if existing_file.read(self.HEADER_LEN) != self._header():
+                    seedfile.close()
+                    raise ValueError("can't append to packed seed list '{}' which has a different wordlist or seed "
+                                     "length".format(filename))
+        return seedfile
+
+    @classmethod
+    def fromfiles(cls, filenames):
+        """Loads one or more packed seed list files, which together form a single list
+
+        :param filenames: the files, in order, which must all share the same wordlist and seed length
+        :type filenames: collections.abc.Iterable[str]
+        :rtype: PackedSeedList
+        """
+        self = None
+        for filename in filenames:
+            with open(filename, "rb") as seedfile:
+                #
+                # Read in the header safely (ast.literal_eval() is safe for untrusted data)
+                header = seedfile.read(cls.HEADER_LEN)
+                if not header.startswith(cls.MAGIC):
+                    raise ValueError("unrecognized file format (invalid magic) in '{}'".format(filename))
+                config_end = header.find(b"\0", len(cls.MAGIC))
+                if config_end < 0 or len(header) < cls.HEADER_LEN:
+                    raise ValueError("truncated packed seed list header in '{}'".format(filename))
+                config = ast.literal_eval(header[len(cls.MAGIC):config_end].decode())
+                if config["version"] != cls.VERSION:
+                    raise ValueError("can't load packed seed list version {} (only supports {})"
+                                     .format(config["version"], cls.VERSION))
+                if self is None:
+                    self = cls(config["words"], config["words_per_seed"], config["language"])
+                elif tuple(config["words"]) != self.words or config["words_per_seed"] != self.words_per_seed:
+                    raise ValueError("packed seed list '{}' has a different wordlist or seed length than '{}'"
+                                     .format(filename, self._files[0][3]))
+                #
+                # The records are memory-mapped directly from the file instead of being loaded;
+                # any incomplete record at the end (e.g. if it's still being written) is ignored
+                seed_count = (os.fstat(seedfile.fileno()).st_size - cls.HEADER_LEN) // self.record_len
+                data = mmap.mmap(seedfile.fileno(), 0, access=mmap.ACCESS_READ) if seed_count else b""
+            self._files.append((data, self._len, seed_count, filename))
+            self._len += seed_count
+        if self is None:
+            raise ValueError("no packed seed list files were specified")
+        return self
+
+    def seeds(self, start_index=0):
+        """Produces the seeds, as lists of words, beginning with the (zero-based) start_index-th one
+
+        :param start_index: the index of the first seed to produce
+        :type start_index: int
+        :rtype: collections.abc.Iterator[list[str]]
+        """
+        l_words = self.words
+        l_record_len = self.record_len
+        l_from_bytes = int.from_bytes
+        shifts = tuple(range(self.bits_per_word * (self.words_per_seed - 1), -1, -self.bits_per_word))
+        mask = (1 << self.bits_per_word) - 1
+        for data, first_index, seed_count, filename in self._files:
+            seed_index = max(start_index - first_index, 0)
+            while seed_index < seed_count:
+                read_count = min(self.SEEDS_PER_READ, seed_count - seed_index)
+                offset = self.HEADER_LEN + seed_index * l_record_len
+                records = data[offset : offset + read_count * l_record_len]
+                for record_offset in range(0, len(records), l_record_len):
+                    record = l_from_bytes(records[record_offset : record_offset + l_record_len], "big")
+                    yield [l_words[record >> shift & mask] for shift in shifts]
+                seed_index += read_count
+
+    def close(self):
+        for data, first_index, seed_count, filename in self._files:
+            if seed_count:
+                data.close()
+        self._files = []
+        self._len = 0
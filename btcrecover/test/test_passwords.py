@@ -21,11 +21,13 @@
 # along with this program.  If not, see https://www.gnu.org/licenses/
 
 
-import warnings, os, unittest, pickle, tempfile, shutil, multiprocessing, time, gc, filecmp, sys, hashlib
+import warnings, os, unittest, pickle, tempfile, shutil, multiprocessing, time, gc, filecmp, sys, hashlib, itertools
+import gzip, bz2, lzma
 if __name__ == '__main__':
     sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
-from btcrecover import btcrpass
+from btcrecover import btcrpass, benchmarks
+from btcrecover.listindex import PasswordListIndex
 
 import btcrecover.opencl_helpers
 
@@ -231,6 +233,36 @@ class Test01Basics(GeneratorTester):
                                  tokenlist = StringIO(tstr("%5d 100000")), disable_security_warning_param = True)
         self.assertEqual(btcrpass.count_and_check_eta(1.0), 100001)
 
+    # with --no-dupchecks, skipping and counting are done without generating the skipped passwords
+    def test_seek_skip(self):
+        self.do_generator_test(["one", "two", "three"], ["onethreetwo", "onetwothree"],
+                               "--no-dupchecks --skip 13", expected_skipped=13)
+    def test_seek_skip_wildcards(self):
+        self.do_generator_test(["%2d"], ["97", "98", "99"], "--no-dupchecks --skip 97", expected_skipped=97)
+    def test_seek_skip_typos(self):
+        self.do_generator_test(["ab", "c"], ["cab", "CAB", "abc", "ABC"],
+                               "--no-dupchecks --typos-capslock --skip 4", expected_skipped=4)
+    def test_seek_skip_typos_wildcards(self):
+        tokenlist = ["+ aa", "b Cd %0,1d"]
+        options = "--no-dupchecks --dsw --typos-repeat --typos 1"
+        btcrpass.parse_arguments(tstr("--tokenlist __funccall --listpass " + options + utf8_opt).split(),
+                                 tokenlist=StringIO(tstr("\n".join(tokenlist))), disable_security_warning_param=True)
+        all_passwords = btcrpass.password_generator_factory(sys.maxsize)[0].__next__()
+        # typos_sofar is counted from 0 while seeking, whether it's not yet defined or left
+        # over from a typo generator which was abandoned before it finished
+        if hasattr(btcrpass, "typos_sofar"):
+            del btcrpass.typos_sofar
+        self.do_generator_test(tokenlist, all_passwords[5:], options + " --skip 5", expected_skipped=5)
+        btcrpass.typos_sofar = 1
+        self.do_generator_test(tokenlist, all_passwords[58:], options + " --skip 58", expected_skipped=58)
+    def test_seek_skip_all(self):
+        self.do_generator_test(["one", "two"], [], "--no-dupchecks --skip 5", expected_skipped=4)
+    def test_seek_count(self):
+        btcrpass.parse_arguments(("--tokenlist __funccall --listpass --no-dupchecks"+utf8_opt).split(),
+                                 tokenlist = StringIO(tstr("%3d 1000\n%1,2d")), disable_security_warning_param = True)
+        self.assertTrue(btcrpass.password_space_is_seekable())
+        self.assertEqual(btcrpass.count_and_check_eta(1.0), 1001 + 110 + 2 * 1001 * 110)
+
     def test_token_counts_min_0(self):
         self.do_generator_test(["one"], ["", "one"], "--min-tokens 0")
     def test_token_counts_min_2(self):
@@ -338,6 +370,22 @@ class Test02Anchors(GeneratorTester):
     def test_relative_same(self):
         self.do_generator_test(["^r1^one", "^r1^two"], ["one", "two", "twoone", "onetwo"])
 
+    def test_relative_and_middle(self):
+        self.do_generator_test(["^r1^a", "^r2^b", "^2,2^m", "x"],
+            ["a", "b", "ab", "amb", "x", "xa", "ax", "xb", "bx", "xab", "axb", "abx", "xma", "amx", "xmb", "bmx",
+             "xmab", "amxb", "ambx"])
+        btcrpass.parse_arguments(("--tokenlist __funccall --listpass"+utf8_opt).split(),
+                                 tokenlist = StringIO(tstr("^r1^a\n^r2^b\n^r2^c\n^2,3^m\nx\n^4^p\nx")),
+                                 disable_security_warning_param = True)
+        # the anchor-aware orderings are the same as those left after filtering all the permutations
+        for tokens_combination in btcrpass.tokenlist_combinations_generator():
+            for permutations_function in itertools.permutations, btcrpass.permutations_nodups:
+                self.assertEqual(
+                    list(btcrpass.tokenlist_guesses_generator(tokens_combination,
+                        btcrpass.tokenlist_orderings(tokens_combination, permutations_function))),
+                    list(btcrpass.tokenlist_guesses_generator(tokens_combination,
+                        permutations_function(tokens_combination[0]))))
+
 
 LEET_MAP_FILE = os.path.join(TYPOS_DIR, "leet-map.txt")
 class Test03WildCards(GeneratorTester):
@@ -370,6 +418,14 @@ class Test03WildCards(GeneratorTester):
             ["{:02}".format(i) for i in range(100)],
             "--has-wildcards", True)
 
+    # (too many expansions for a single slot of a wildcard expansion plan, so it's expanded separately)
+    def test_length_range_large(self):
+        self.do_generator_test(["%3,4dz%d"],
+            ["{:03}z{}".format(i, j) for i in range(1000) for j in range(10)] +
+            ["{:04}z{}".format(i, j) for i in range(10000) for j in range(10)],
+            "--has-wildcards")
+        self.assertEqual(btcrpass.count_wildcard_expansions(tstr("%3,4dz%d")), 110000)
+
     def test_length_invalid_range(self):
         self.expect_syntax_failure(["%2,1d"], "on line 1: max wildcard length (1) must be >= min length (2)")
     def test_invalid_length_1(self):
@@ -586,6 +642,15 @@ class Test04Typos(GeneratorTester):
     def test_replace_max(self):
         self.do_generator_test(["abc"], ["abc", "Xbc", "aXc", "abX"],
             "--typos-replace X --max-typos-replace 1 --typos 2 -d", True)
+    def test_replace_min(self):
+        self.do_generator_test(["abc"], ["Xbc", "aXc", "abX", "XXc", "XbX", "aXX"],
+            "--typos-replace X --min-typos-replace 1 --typos 2 -d", True)
+    def test_replace_min_delete(self):
+        self.do_generator_test(["abc"], ["Xbc", "aXc", "abX", "Xc", "Xc", "XXc", "bX", "Xb", "XbX", "aX", "aX", "aXX"],
+            "--typos-replace X --typos-delete --min-typos-replace 1 --typos 2 -d", True)
+    def test_replace_min_invalid(self):
+        self.expect_syntax_failure(["abc"], "--min-typos-replace must be <= --typos",
+            "--typos-replace X --min-typos-replace 2 --typos 1")
     def test_replace_wildcard(self):
         self.do_generator_test(["abc"], ["abc", "Xbc", "Ybc", "aXc", "aYc", "abX", "abY"],
             "--typos-replace %[X-Y] -d", True)
@@ -771,6 +836,18 @@ class Test05CommandLine(GeneratorTester):
         self.do_generator_test(["one two three four five six seven eight"], ["one", "two", "three", "four", "five", "six", "seven", "eight"],
             "--worker 1,2,3/3")
 
+    def test_worker_seek(self):
+        self.do_generator_test(["a b", "%d"], ["3", "6", "9", "2a", "5a", "8a", "a1", "a4", "a7", "0b", "3b", "6b", "9b", "b2", "b5", "b8"],
+            "--no-dupchecks --worker 3/3 --skip 1", expected_skipped=1)
+        self.do_generator_test(["a b", "%d"], ["a0", "a3", "a4", "a7", "a8", "1b", "2b", "5b", "6b", "9b", "b0", "b3", "b4", "b7", "b8"],
+            "--no-dupchecks --worker 2,3/4 --skip 11", expected_skipped=11)
+
+    def test_worker_seek_wildcards(self):
+        self.do_generator_test(["%2d"], ["02", "42", "82"], "--no-dupchecks --worker 3/40", expected_skipped=0)
+        btcrpass.parse_arguments(("--tokenlist __funccall --listpass --no-dupchecks --worker 3/40"+utf8_opt).split(),
+                                 tokenlist = StringIO(tstr("%2d")), disable_security_warning_param = True)
+        self.assertEqual(btcrpass.count_and_check_eta(1.0), 3)
+
     def test_no_dupchecks_1(self):
         self.do_generator_test(["one", "one"], ["one", "one", "oneone", "oneone"], "-ddd")
         self.do_generator_test(["one", "one"], ["one", "one", "oneone"], "-dd")
@@ -800,6 +877,210 @@ class Test05CommandLine(GeneratorTester):
         self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], "--exclude-passwordlist __funccall --no-eta -dd",
                                exclude_passwordlist=StringIO(tstr("exc1\nexc2")))
 
+    def test_dupchecks_memory(self):
+        self.do_generator_test(["one", "one"], ["one", "oneone"], "--dupchecks-memory 1")
+        self.assertEqual(btcrpass.password_generator(3).__next__(), ["one", "oneone"])
+        self.do_generator_test(["%[ab] %[a-b]"], ["a", "b"], "--dupchecks-memory 1")
+        self.assertEqual(btcrpass.password_generator(3).__next__(), ["a", "b"])
+        self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], "--exclude-passwordlist __funccall --dupchecks-memory 1",
+                               exclude_passwordlist=StringIO(tstr("exc1\nexc2")))
+
+    # a HashedDuplicateChecker, even once it's spilled to disk, must agree with a DuplicateChecker in every run
+    def test_hashed_duplicate_checker(self):
+        import random
+        rand = random.Random(0)
+        items = [tstr(rand.randrange(30000)) for i in range(40000)] + [(tstr("a"), tstr(i)) for i in range(100)] * 2
+        excluded = [tstr(rand.randrange(30000)) for i in range(100)]
+        dups, hashed_dups = btcrpass.DuplicateChecker(), btcrpass.HashedDuplicateChecker(1 << 18)
+        for d in dups, hashed_dups:
+            for x in excluded:
+                d.exclude(x)
+        for run in range(3):
+            self.assertEqual([hashed_dups.is_duplicate(x) for x in items], [dups.is_duplicate(x) for x in items])
+            dups.run_finished()
+            hashed_dups.run_finished()
+        self.assertIsNotNone(hashed_dups._duplicates._file)  # (it did spill to disk)
+
+    def test_verify_passwords_unordered(self):
+        import multiprocessing.pool, threading
+        class UnevenWallet(object):  # later passwords take longer to check
+            def __init__(self, correct_password=None):
+                self.correct_password = correct_password
+                self.tried = []
+                self.chunk_lens = set()
+                self.lock = threading.Lock()
+            def return_verified_password_or_false(self, passwords):
+                with self.lock:
+                    self.tried.extend(passwords)
+                    self.chunk_lens.add(len(passwords))
+                for count, password in enumerate(passwords, 1):
+                    time.sleep(0.0002 if password >= "500" else 0.00002)
+                    if password == self.correct_password:
+                        return password, count
+                return False, len(passwords)
+
+        expected = ["{:03}".format(i) for i in range(1000)]
+        saved_wallet = btcrpass.loaded_wallet
+        pool = multiprocessing.pool.ThreadPool(3)
+        try:
+            for correct_password in (None, tstr("777")):
+                btcrpass.parse_arguments(["--tokenlist", "__funccall", "--listpass"], tokenlist=StringIO(tstr("%3d")),
+                                         disable_security_warning_param=True)
+                btcrpass.loaded_wallet = wallet = UnevenWallet(correct_password)
+                passwords_tried = 0
+                for password_found, passwords_tried_last in btcrpass.verify_passwords_unordered(
+                        pool, btcrpass.password_generator(10), 10, max_in_flight=6, target_seconds=0.005):
+                    if password_found:
+                        passwords_tried += passwords_tried_last - 1
+                        break
+                    self.assertGreater(passwords_tried_last, 0)
+                    passwords_tried += passwords_tried_last
+                    # the committed count never covers a password that hasn't been tried
+                    self.assertLessEqual(set(expected[:passwords_tried]), set(wallet.tried))
+                if correct_password:
+                    self.assertEqual(password_found, correct_password)
+                    self.assertEqual(passwords_tried, expected.index(correct_password))  # exactly those before it
+                else:
+                    self.assertFalse(password_found)
+                    self.assertEqual(passwords_tried, len(expected))
+                    self.assertEqual(sorted(wallet.tried), expected)  # each exactly once
+                    self.assertGreater(len(wallet.chunk_lens), 2)     # the chunks were resized
+        finally:
+            pool.terminate()
+            btcrpass.loaded_wallet = saved_wallet
+
+    def test_generate_and_verify_unordered(self):
+        import multiprocessing.pool, threading
+        class RecordingWallet(object):
+            def __init__(self, correct_password=None):
+                self.correct_password = correct_password
+                self.tried = []
+                self.lock = threading.Lock()
+            def return_verified_password_or_false(self, passwords):
+                with self.lock:
+                    self.tried.extend(passwords)
+                for count, password in enumerate(passwords, 1):
+                    if password == self.correct_password:
+                        return password, count
+                return False, len(passwords)
+
+        expected = ["{:03}".format(i) for i in range(1000)]
+        saved_wallet = btcrpass.loaded_wallet
+        pool = multiprocessing.pool.ThreadPool(3)
+        try:
+            for correct_password, skip in ((None, 0), (None, 123), (tstr("777"), 0)):
+                btcrpass.parse_arguments(["--tokenlist", "__funccall", "--listpass", "--no-dupchecks"],
+                                         tokenlist=StringIO(tstr("%3d")), disable_security_warning_param=True)
+                self.assertTrue(btcrpass.password_space_is_seekable())
+                btcrpass.loaded_wallet = wallet = RecordingWallet(correct_password)
+                passwords_tried = 0
+                for password_found, passwords_tried_last in btcrpass.generate_and_verify_unordered(
+                        pool, skip, 30, 10, max_in_flight=6, target_seconds=0.001, max_range_size=200):
+                    if password_found:
+                        passwords_tried += passwords_tried_last - 1
+                        break
+                    passwords_tried += passwords_tried_last
+                    self.assertLessEqual(set(expected[skip:skip + passwords_tried]), set(wallet.tried))
+                if correct_password:
+                    self.assertEqual(password_found, correct_password)
+                    self.assertEqual(passwords_tried, expected.index(correct_password))  # exactly those before it
+                else:
+                    self.assertFalse(password_found)
+                    self.assertEqual(passwords_tried, len(expected) - skip)
+                    self.assertEqual(sorted(wallet.tried), expected[skip:])  # each exactly once
+        finally:
+            pool.terminate()
+            btcrpass.loaded_wallet = saved_wallet
+
+    def test_pack_passwords(self):
+        for passwords in ([tstr("")], [tstr("a"), tstr(""), tstr("")], [tstr("p\u00e4ss"), tstr("\U0001f600"), tstr("\udc80x")]):
+            packed = btcrpass.pack_passwords(passwords)
+            self.assertIsInstance(packed, bytes)
+            self.assertEqual(btcrpass.unpack_passwords(packed), passwords)
+        # these are sent unpacked
+        for passwords in ([], [tstr("a\0b")], [(1, 2), (3, 4)]):
+            self.assertIs(btcrpass.pack_passwords(passwords), passwords)
+            self.assertIs(btcrpass.unpack_passwords(passwords), passwords)
+
+    def test_passwordlist_index(self):
+        passwords = [tstr(p) for p in ("one", "two", "", "päss", "three", "four", "five")]
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        saved_lines_per_offset = PasswordListIndex.LINES_PER_OFFSET
+        PasswordListIndex.LINES_PER_OFFSET = 2
+        try:
+            listfilename = os.path.join(temp_dir, "passwords.txt")
+            with open(listfilename, "wb") as listfile:  # (includes a BOM, an invalid line and an unterminated line)
+                listfile.write(b"\xef\xbb\xbfone\r\ntwo\n\n\xff\xfe\np\xc3\xa4ss\nthree\r\nfour")
+            index = PasswordListIndex.load(listfilename)
+            index.update()
+            self.assertEqual(len(index), 6)
+            self.assertEqual([line for line_num, line in index.lines()], passwords[:3] + [None] + passwords[3:6])
+            for start_index in range(7):
+                self.assertEqual([line for line_num, line in index.lines(start_index) if line is not None],
+                                 passwords[start_index:6])
+            #
+            # Only the lines appended since it was saved are indexed when it's loaded again
+            with open(listfilename, "ab") as listfile:
+                listfile.write(b"\nfive\n")
+            index = PasswordListIndex.load(listfilename)
+            self.assertEqual(index.line_count, 5)
+            index.update()
+            self.assertEqual(len(index), 7)
+            self.assertEqual([line for line_num, line in index.lines(5)], passwords[5:])
+
+            for extra_args, expected_passwords in (((), passwords), (("--skip", "5"), passwords[5:]),
+                                                   (("--worker", "2/3"), passwords[1::3])):
+                btcrpass.parse_arguments(["--passwordlist", listfilename, "--passwordlist-index", "--listpass", "-d"]
+                                         + list(extra_args) + utf8_opt.split(), disable_security_warning_param=True)
+                self.assertTrue(btcrpass.password_space_is_seekable())
+                self.assertEqual(btcrpass.count_and_check_eta(1.0), len(expected_passwords) +
+                                 (5 if extra_args and extra_args[0] == "--skip" else 0))
+                pwl_it, skipped = btcrpass.password_generator_factory(sys.maxsize)
+                self.assertEqual(list(pwl_it), [expected_passwords])
+        finally:
+            PasswordListIndex.LINES_PER_OFFSET = saved_lines_per_offset
+            shutil.rmtree(temp_dir)
+
+    def test_passwordlist_compressed(self):
+        passwords = [tstr("pass{}".format(i)) for i in range(3000)] + [tstr("päss")]
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        saved_block_size = btcrpass.READ_AHEAD_BLOCK_SIZE
+        btcrpass.READ_AHEAD_BLOCK_SIZE = 1000  # so the lines are read in several blocks
+        try:
+            for compression in (gzip, bz2, lzma):
+                listfilename = os.path.join(temp_dir, "passwords_" + compression.__name__)
+                with compression.open(listfilename, "wb") as listfile:
+                    listfile.write("\n".join(passwords).encode("utf_8"))
+                for extra_args, expected_passwords in (((), passwords), (("--skip", "2999"), passwords[2999:])):
+                    btcrpass.parse_arguments(["--passwordlist", listfilename, "--listpass"] + list(extra_args)
+                                             + utf8_opt.split(), disable_security_warning_param=True)
+                    pwl_it, skipped = btcrpass.password_generator_factory(sys.maxsize)
+                    self.assertEqual(list(pwl_it), [expected_passwords])
+                    # With an index, they're counted and skipped without being read
+                    btcrpass.parse_arguments(["--passwordlist", listfilename, "--passwordlist-index", "--listpass",
+                                              "-d"] + list(extra_args) + utf8_opt.split(),
+                                             disable_security_warning_param=True)
+                    self.assertEqual(btcrpass.count_and_check_eta(1.0), len(passwords))
+                    pwl_it, skipped = btcrpass.password_generator_factory(sys.maxsize)
+                    self.assertEqual(list(pwl_it), [expected_passwords])
+                self.assertTrue(os.path.isfile(listfilename + ".index"))
+        finally:
+            btcrpass.READ_AHEAD_BLOCK_SIZE = saved_block_size
+            shutil.rmtree(temp_dir)
+
+    def test_read_ahead_lines(self):
+        lines = [tstr("line {}\n".format(i)) for i in range(1000)]
+        saved_block_size = btcrpass.READ_AHEAD_BLOCK_SIZE
+        btcrpass.READ_AHEAD_BLOCK_SIZE = 100
+        try:
+            self.assertEqual(list(btcrpass.read_ahead_lines(StringIO(tstr("").join(lines)))), lines)
+            # stopping early stops the reading thread
+            lines_it = btcrpass.read_ahead_lines(StringIO(tstr("").join(lines)))
+            self.assertEqual(next(lines_it), lines[0])
+            lines_it.close()
+        finally:
+            btcrpass.READ_AHEAD_BLOCK_SIZE = saved_block_size
+
 
 SAVESLOT_SIZE = 4096
 class Test06AutosaveRestore(unittest.TestCase):
@@ -2053,6 +2334,13 @@ class Test08KeyDecryption(unittest.TestCase):
         self.assertEqual(btcrpass.return_verified_password_or_false(
             (tstr("btcr-wrong-password-3"), correct_pw, tstr("btcr-wrong-password-4"))), (correct_pw, 2))
 
+    def test_hash_iterations(self):
+        for iter_count in range(10):
+            data = b"btcr-test-password"
+            for i in range(iter_count):
+                data = hashlib.sha512(data).digest()
+            self.assertEqual(btcrpass.hash_iterations(hashlib.sha512, b"btcr-test-password", iter_count), data)
+
     @skipUnless(can_load_pycrypto, "requires PyCryptoDome")
     def test_bitcoincore(self):
         self.key_tester("YmM65iRhIMReOQ2qaldHbn++T1fYP3nXX5tMHbaA/lqEbLhFk6/1Y5F5x0QJAQBI/maR")
@@ -2963,6 +3251,30 @@ class Test13RawPrivateKeyRecovery(unittest.TestCase):
             (tstr("5db77aa7aea5ea7d6b4c64dab219972cf4763d4937d3e6e17f580436dcb10d36"), correct_pw, tstr("5db77aa7aea5ea7d6b4c64dab219972cf4763d4937d3e6e17f580436dcb10d37"))), (correct_pw, 2))
 
 
+class Test14Benchmarks(unittest.TestCase):
+
+    def test_run_benchmark(self):
+        result = benchmarks.run_benchmark("btcrpass", "electrum28-wallet", duration=0.2)
+        self.assertNotIn("error", result)
+        self.assertGreater(result["passwords"], 0)
+        self.assertGreaterEqual(result["chunksize"], 1)
+        self.assertAlmostEqual(result["passwords_per_second"],
+            result["passwords"] / (result["generator_seconds"] + result["verifier_seconds"]))
+
+        result = benchmarks.run_benchmark("btcrpass", "not-a-wallet-file", duration=0.2)
+        self.assertEqual(list(result), ["error"])
+
+    def test_compare_results(self):
+        def results(**rates):
+            return dict(version=benchmarks.RESULTS_VERSION, benchmarks={name: dict(passwords_per_second=rate,
+                        peak_rss=1000) if rate else dict(error="skipped") for name, rate in rates.items()})
+        baseline = results(a=100.0, b=100.0, c=100.0, d=100.0)
+        new = results(a=95.0, b=80.0, c=150.0, d=None, e=100.0)
+        new["benchmarks"]["c"]["peak_rss"] = 2000
+        self.assertEqual(benchmarks.compare_results(new, baseline, threshold=0.10),
+                         [("a", 0.95, 1.0, False), ("b", 0.80, 1.0, True), ("c", 1.5, 2.0, True)])
+
+
 # QuickTests: all of Test01Basics, Test02Anchors, Test03WildCards, and Test04Typos,
 # all of Test05CommandLine except the "large" tests, and select quick tests from
 # Test08KeyDecryption
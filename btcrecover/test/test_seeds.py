@@ -21,12 +21,14 @@
 # along with this program.  If not, see https://www.gnu.org/licenses/
 
 
-import warnings, unittest, os, tempfile, shutil, filecmp, sys, hashlib, random, mmap, pickle
+import warnings, unittest, os, tempfile, shutil, filecmp, sys, hashlib, hmac, random, mmap, pickle
 
 if __name__ == '__main__':
     sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from btcrecover import btcrseed, btcrpass
-from btcrecover.addressset import AddressSet
+from btcrecover.addressset import AddressSet, AddressFilter, create_address_db, merge_address_dbs
+from btcrecover import hash160batch
+from btcrecover.packedseeds import PackedSeedList
 import btcrecover.opencl_helpers
 
 wallet_dir = os.path.join(os.path.dirname(__file__), "test-wallets")
@@ -613,6 +615,23 @@ class TestRecoveryFromAddress(unittest.TestCase):
                             "certain come keen collect slab gauge photo inside mechanic deny leader drop",
                             ["m/44'/0'/0'/0"])
 
+    def test_bip44_addr_BTC_shared_path_prefixes(self):
+        wallet = btcrseed.WalletBIP39.create_from_params(addresses=["1AiAYaVJ7SCkDeNqgFz7UDecycgzb6LoT3"],
+                                                         address_limit=2,
+                                                         path=["m/44'/0'/1'/0", "m/44'/0'/0'/1", "m/44'/0'/0'/0"])
+        h = 2 ** 31
+        # Each path only derives from the deepest node it shares with an earlier one
+        self.assertEqual(wallet._compile_path_derivation_plan(), [
+            ((44 + h, 0 + h, 1 + h, 0), (), {2: (44 + h, 0 + h)}),
+            ((44 + h, 0 + h, 0 + h, 1), (44 + h, 0 + h), {3: (44 + h, 0 + h, 0 + h)}),
+            ((44 + h, 0 + h, 0 + h, 0), (44 + h, 0 + h, 0 + h), {})])
+
+        wallet.config_mnemonic("certain come keen collect slab gauge photo inside mechanic deny leader drop")
+        derived_seed, salt = next(iter(wallet._derive_seed(btcrseed.mnemonic_ids_guess)))
+        seed_bytes = hmac.new(b"Bitcoin seed", derived_seed, hashlib.sha512).digest()
+        self.assertTrue(wallet._verify_seed(seed_bytes, salt))
+        self.assertTrue(btcrseed.seedfoundpath.startswith("m/44'/0'/0'/0/"))
+
     def test_bip44_addr_TerraLuna(self):
         self.address_tester(btcrseed.WalletBIP39, "terra1negkjtkr6wu2uzcwcuz0kj8w4z64uax3w0dv5u", 2,
                             "earth jelly weapon word focus shaft danger cruel inflict strong palace barrel peace strike timber orbit orphan tower size series scatter kiwi fat filter",
@@ -1446,6 +1465,216 @@ class TestAddressSet(unittest.TestCase):
             dbfile.close()
             os.remove(dbfile.name)
 
+    def test_contains_many(self):
+        aset = AddressSet(1024, bytes_per_addr=8)
+        addrs = [os.urandom(20) for i in range(aset._max_len)]
+        for addr in addrs:
+            aset.add(addr)
+        addrs = addrs[::2] + [os.urandom(20) for i in range(aset._max_len)] + [20 * b"\0"]
+        random.shuffle(addrs)
+        expected = [addr in aset for addr in addrs]
+        self.assertEqual(aset.contains_many(addrs), expected)
+        self.assertEqual(aset.contains_many(addrs[:3]), expected[:3])  # (not batched)
+        dbfile = tempfile.TemporaryFile()
+        aset.tofile(dbfile)
+        dbfile.seek(0)
+        aset = AddressSet.fromfile(dbfile)  # now it's an mmap
+        try:
+            self.assertEqual(aset.contains_many(addrs), expected)
+        finally:
+            aset.close()
+
+    def test_checkpoint(self):
+        aset = AddressSet(self.TABLE_LEN)
+        dbfile = tempfile.NamedTemporaryFile(delete=False)
+        crashed_filename = dbfile.name + ".crashed"
+        try:
+            aset.tofile(dbfile)
+            dbfile.seek(0)
+            aset = AddressSet.fromfile(dbfile, mmap_access=mmap.ACCESS_WRITE)
+            aset._updating = True
+            aset.add("".join(chr(b) for b in range(20)))
+            aset.last_filenum = 1
+            aset.checkpoint()
+            aset.add("".join(chr(b) for b in range(1, 21)))  # (added after the checkpoint)
+            aset._data.flush()
+            shutil.copyfile(dbfile.name, crashed_filename)  # as if the update were interrupted here
+            aset._updating = False
+            aset.close()
+            aset = AddressSet.fromfile(open(crashed_filename, "rb"))
+            self.assertEqual(aset.last_filenum, 1)
+            self.assertEqual(len(aset), 2)  # recounted, since the header was saved at the checkpoint
+            aset.close()
+            aset = AddressSet.fromfile(open(dbfile.name, "rb"))
+            self.assertFalse(aset._updating)
+            self.assertEqual(len(aset), 2)
+        finally:
+            aset.close()
+            dbfile.close()
+            os.remove(dbfile.name)
+            os.remove(crashed_filename)
+
+    def test_add_many(self):
+        aset1 = AddressSet(1024, bytes_per_addr=8)
+        aset2 = AddressSet(1024, bytes_per_addr=8)
+        addrs = [os.urandom(20) for i in range(aset1._max_len // 2)]
+        addrs += random.sample(addrs, len(addrs) // 2) + [20 * b"\0"]
+        random.shuffle(addrs)
+        for addr in addrs:
+            aset1.add(addr)
+        aset2.add_many(addrs[:len(addrs) // 2])
+        aset2.add_many(addrs[len(addrs) // 2:])
+        self.assertEqual(len(aset1), len(aset2))
+        self.assertEqual(aset1._data, aset2._data)  # identical, including the order of any collisions
+
+    def test_filter(self):
+        aset = AddressSet(1024, bytes_per_addr=8)
+        addrs = [os.urandom(20) for i in range(aset._max_len - 1)]  # (leave room to add one more below)
+        for addr in addrs:
+            aset.add(addr)
+        dbfile = tempfile.NamedTemporaryFile(delete=False)
+        filter_filename = dbfile.name + AddressFilter.FILE_SUFFIX
+        try:
+            aset.tofile(dbfile)
+            dbfile.close()
+            with open(filter_filename, "wb") as filter_file:
+                AddressFilter.from_address_set(aset, 0.01).tofile(filter_file)
+            aset = AddressSet.fromfile(open(dbfile.name, "rb"))
+            self.assertIsNotNone(aset._filter)
+            for addr in addrs:
+                self.assertIn(addr, aset._filter)  # never any false negatives
+            not_addrs = [os.urandom(20) for i in range(aset._max_len)]
+            self.assertLess(sum(addr in aset._filter for addr in not_addrs), len(not_addrs) // 10)
+            addrs = addrs[::2] + not_addrs
+            self.assertEqual(aset.contains_many(addrs), [addr not in not_addrs for addr in addrs])
+            aset.close()
+            #
+            # A filter built from a different version of the database is ignored
+            aset = AddressSet.fromfile(open(dbfile.name, "r+b"), mmap_access=mmap.ACCESS_WRITE)
+            aset.add(os.urandom(20))
+            aset.close()
+            aset = AddressSet.fromfile(open(dbfile.name, "rb"))  # (also prints a warning)
+            self.assertIsNone(aset._filter)
+        finally:
+            aset.close()
+            os.remove(dbfile.name)
+            os.remove(filter_filename)
+
+    def test_share(self):
+        aset = AddressSet(1024, bytes_per_addr=8)
+        addrs = [os.urandom(20) for i in range(aset._max_len // 2)]
+        aset.add_many(addrs)
+        aset.share()
+        if aset._shm is None:
+            raise unittest.SkipTest("requires multiprocessing.shared_memory")
+        pickled = pickle.dumps(aset)
+        self.assertLess(len(pickled), aset._table_bytes)  # the table itself isn't pickled
+        aset2 = pickle.loads(pickled)
+        try:
+            not_addrs = [os.urandom(20) for i in range(aset._max_len // 2)]
+            self.assertEqual(aset2.contains_many(addrs + not_addrs), [True] * len(addrs) + [False] * len(not_addrs))
+            aset.add(not_addrs[0])
+            self.assertIn(not_addrs[0], aset2)  # both attach to the same table
+        finally:
+            aset2.close()
+            aset.close()
+
+    def test_merge(self):
+        aset1 = AddressSet(1024, bytes_per_addr=8)
+        aset2 = AddressSet(1024, bytes_per_addr=8)
+        addrs1 = [os.urandom(20) for i in range(aset1._max_len // 3)]
+        addrs2 = [os.urandom(20) for i in range(aset2._max_len // 3)] + addrs1[::3]
+        aset1.add_many(addrs1)
+        aset2.add_many(addrs2)
+        aset1.merge(aset2)
+        self.assertEqual(aset1.contains_many(addrs1 + addrs2), [True] * (len(addrs1) + len(addrs2)))
+        self.assertLessEqual(len(aset1), len(addrs1) + len(addrs2))
+        self.assertGreater(len(aset1), len(addrs1) + len(addrs2) - len(addrs1[::3]))
+        #
+        # Resizing to a smaller table
+        aset3 = AddressSet(512, bytes_per_addr=8)
+        self.assertEqual(aset3.merge(aset2), len(addrs2))
+        self.assertEqual(aset3.contains_many(addrs2), [True] * len(addrs2))
+        self.assertEqual(sum(aset3.contains_many([os.urandom(20) for i in range(1000)])), 0)
+        self.assertRaises(ValueError, AddressSet(2048, bytes_per_addr=8).merge, aset2)
+        self.assertRaises(ValueError, AddressSet(512, bytes_per_addr=8).merge, aset1)  # (too many addresses)
+
+    def test_merge_address_dbs(self):
+        addrs = [os.urandom(20) for i in range(300)]
+        filenames = []
+        try:
+            for i in range(2):
+                aset = AddressSet(1024, bytes_per_addr=8)
+                aset.add_many(addrs[i * 150: i * 150 + 200])
+                with tempfile.NamedTemporaryFile(delete=False) as dbfile:
+                    filenames.append(dbfile.name)
+                    aset.tofile(dbfile)
+            filenames.append(filenames[0] + ".merged")
+            merge_address_dbs(filenames[2], filenames[:2], 9)
+            aset = AddressSet.fromfile(open(filenames[2], "rb"))
+            try:
+                self.assertEqual(aset._dbLength, 512)
+                self.assertFalse(aset._updating)
+                self.assertEqual(aset.contains_many(addrs), [True] * len(addrs))
+            finally:
+                aset.close()
+            self.assertRaises(ValueError, merge_address_dbs, filenames[2], filenames[:2], 11)
+            # Resizing an AddressDB to itself would truncate it while it's being read
+            self.assertRaises(ValueError, merge_address_dbs, filenames[0], filenames[:1], 9)
+            aset = AddressSet.fromfile(open(filenames[0], "rb"))
+            try:
+                self.assertEqual(aset.contains_many(addrs[:200]), [True] * 200)
+            finally:
+                aset.close()
+        finally:
+            for filename in filenames:
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def test_address_list(self):
+        addresses = ["1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2", "3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy",
+                     "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq", "LVg2kJoFNg45Nbpy53h7Fe1wKyeXVRhMH9",
+                     "qpm2qsznhks23z7629mms6s4cwef74vcwvy22gdx6a", "rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh",
+                     "0x52908400098527886e0f7030069857d2e4169ee7", "0xde709f2102306220921060314715629080e2fb77"]
+        hash160s = [btcrseed.WalletEthereum._addresses_to_hash160s([address]).pop() if address.startswith("0x")
+                    else btcrseed.WalletBase._addresses_to_hash160s([address]).pop() for address in addresses]
+        lines = addresses + addresses[::2] + ['{"addresses":["1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2"]}',
+                                              "1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN3"]  # (an invalid checksum)
+        listfile = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False)
+        dbfilename = listfile.name + ".db"
+        try:
+            listfile.write("\n".join(lines) + "\n")
+            listfile.close()
+            for threads in 1, 2:
+                create_address_db(dbfilename, None, 10, addresslistfile=listfile.name, threads=threads)
+                aset = AddressSet.fromfile(open(dbfilename, "rb"))
+                try:
+                    self.assertEqual(len(aset), len(hash160s))
+                    self.assertEqual(aset.contains_many(hash160s), [True] * len(hash160s))
+                finally:
+                    aset.close()
+        finally:
+            os.remove(listfile.name)
+            if os.path.exists(dbfilename):
+                os.remove(dbfilename)
+
+
+
+class TestHash160Batch(unittest.TestCase):
+
+    def test_hash160_many(self):
+        pubkey = bytes.fromhex("0279be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798")  # (the generator)
+        self.assertEqual(hash160batch.hash160_many([pubkey] * 3),
+                         [bytes.fromhex("751e76e8199196d454941c45d1b3a323f1433bd6")] * 3)
+        self.assertEqual(hash160batch.hash160_many([]), [])
+
+    def test_ripemd160_32_many(self):
+        if hash160batch.numpy is None:
+            raise unittest.SkipTest("requires numpy")
+        msgs = [os.urandom(32) for i in range(100)]
+        self.assertEqual(hash160batch._ripemd160_32_many(msgs), [hash160batch.py_ripemd160(msg) for msg in msgs])
+        self.assertEqual(hash160batch._ripemd160_32_many(msgs[:1]), [hash160batch.py_ripemd160(msgs[0])])
+
 
 class TestRecoveryFromAddressDB(unittest.TestCase):
 
@@ -1594,18 +1823,21 @@ class TestRecoveryFromAddressDB(unittest.TestCase):
 class TestSeedTypos(unittest.TestCase):
     XPUB = "xpub6BgCDhMefYxRS1gbVbxyokYzQji65v1eGJXGEiGdoobvFBShcNeJt97zoJBkNtbASLyTPYXJHRvkb3ahxaVVGEtC1AD4LyuBXULZcfCjBZx"
 
-    def seed_tester(self, the_mpk, correct_mnemonic, mnemonic_guess, typos=None, big_typos=0, mnemonic_length=None):
+    def seed_tester(self, the_mpk, correct_mnemonic, mnemonic_guess, typos=None, big_typos=0, mnemonic_length=None,
+                    exact_big_typos=False):
         correct_mnemonic = correct_mnemonic.split()
         assert mnemonic_guess.split() != correct_mnemonic
         assert typos or big_typos
         btcrseed.loaded_wallet = btcrseed.WalletBIP39.create_from_params(mpk=the_mpk)
+        btcrseed.loaded_wallet._savevalidseeds = False  # (seeds must be checked to be found)
         if mnemonic_length:
             btcrseed.loaded_wallet.config_mnemonic(mnemonic_guess, expected_len=mnemonic_length)
         else:
             btcrseed.loaded_wallet.config_mnemonic(mnemonic_guess)
         self.assertEqual(
-            btcrseed.run_btcrecover(typos or big_typos, big_typos, extra_args="--threads 1".split()),
-            tuple(correct_mnemonic))
+            btcrseed.run_btcrecover(typos or big_typos, big_typos, extra_args="--threads 1".split(),
+                                    exact_big_typos=exact_big_typos),
+            tuple(correct_mnemonic) if correct_mnemonic else False)
 
     def test_delete(self):
         self.seed_tester(self.XPUB,
@@ -1638,6 +1870,23 @@ class TestSeedTypos(unittest.TestCase):
                          "disagree come keen collect slab gauge photo inside mechanic deny leader drop",  # guess
                          big_typos=1)
 
+    def test_replace_exact(self):
+        self.seed_tester(self.XPUB,
+                         "certain  come keen collect slab gauge photo inside mechanic deny leader drop",  # correct
+                         "disagree come keen collect slab gauge photo inside mechanic deny leader drop",  # guess
+                         big_typos=1, exact_big_typos=True)
+
+    # With exact_big_typos, close words (and guesses with no big typos) are left to an earlier phase
+    def test_replaceclose_exact(self):
+        self.seed_tester(self.XPUB,
+                         "certain come   keen collect slab gauge photo inside mechanic deny leader drop",  # correct
+                         "certain become keen collect slab gauge photo inside mechanic deny leader drop",  # guess
+                         big_typos=1)
+        self.seed_tester(self.XPUB,
+                         "",  # not found
+                         "certain become keen collect slab gauge photo inside mechanic deny leader drop",  # guess
+                         big_typos=1, exact_big_typos=True)
+
     def test_replaceclose(self):
         self.seed_tester(self.XPUB,
                          "certain come   keen collect slab gauge photo inside mechanic deny leader drop",  # correct
@@ -1651,6 +1900,26 @@ class TestSeedTypos(unittest.TestCase):
                          # "cere" is close to "cert" in the en-firstfour language, even though "cereal" is not close to "certain"
                          typos=1)
 
+    def test_final_word_checksum_in_generator(self):
+        btcrseed.loaded_wallet = btcrseed.WalletBIP39.create_from_params(mpk=self.XPUB)
+        btcrseed.loaded_wallet.config_mnemonic(
+            "certain come keen collect slab gauge photo inside mechanic deny leader X")
+        btcrseed.loaded_wallet._checksum_in_generator = True
+        self.addCleanup(setattr, btcrseed.loaded_wallet, "_checksum_in_generator", False)
+        mnemonic_ids_guess = btcrseed.mnemonic_ids_guess
+        btcrpass.parse_arguments("--typos 1 --typos-replacewrongword".split(),
+                                 wallet=btcrseed.loaded_wallet, base_iterator=(mnemonic_ids_guess,),
+                                 check_only=btcrseed.loaded_wallet.verify_mnemonic_syntax,
+                                 disable_security_warning_param=True)
+        generated_mnemonics = [m for chunk in btcrpass.password_generator_factory(sys.maxsize)[0] for m in chunk]
+        # Only the 128 final words which produce a valid checksum should be generated, in wordlist order
+        expected_mnemonics = [mnemonic_ids_guess[:-1] + (word,) for word in btcrseed.loaded_wallet.word_ids
+                              if btcrseed.loaded_wallet._verify_checksum(mnemonic_ids_guess[:-1] + (word,))]
+        self.assertEqual(len(expected_mnemonics), 128)
+        self.assertEqual(generated_mnemonics, expected_mnemonics)
+        self.assertIn(tuple("certain come keen collect slab gauge photo inside mechanic deny leader drop".split()),
+                      generated_mnemonics)
+
 
 class TestRecoverySeedListsGenerators(unittest.TestCase):
     # Both the tokenlist generator and seedlist generator should generate the same output, the list of passwords below.
@@ -1693,6 +1962,46 @@ class TestRecoverySeedListsGenerators(unittest.TestCase):
     def test_seedlist_pytupe(self):
         self.seedlist_tester("SeedListTest_pytupe.txt")
 
+    def test_seedlist_packed(self):
+        seeds = self.expected_passwordlist[0]
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            words = btcrseed.load_wordlist("bip39", "en")
+            packed_seeds = PackedSeedList(words, 12, "en")
+            for file_num, file_seeds in enumerate((seeds[:4], seeds[4:])):
+                with packed_seeds.append_to(os.path.join(temp_dir, "seeds_{:04d}.bin".format(file_num))) as seedfile:
+                    seedfile.write(packed_seeds.pack(file_seeds))
+            with self.assertRaises(ValueError):  # a different seed length
+                PackedSeedList(words, 24, "en").append_to(os.path.join(temp_dir, "seeds_0000.bin"))
+
+            seedlist = PackedSeedList.fromfiles([os.path.join(temp_dir, "seeds_0000.bin"),
+                                                 os.path.join(temp_dir, "seeds_0001.bin")])
+            self.assertEqual(len(seedlist), len(seeds))
+            self.assertEqual(list(seedlist.seeds()), seeds)
+            self.assertEqual(list(seedlist.seeds(3)), seeds[3:])
+            self.assertEqual(list(seedlist.seeds(len(seeds))), [])
+            seedlist.close()
+
+            # Read back by btcrpass (as a multi-file seedlist), where it's seekable
+            class MultiFileSeedlistWallet(object):
+                load_multi_file_seedlist = True
+            saved_wallet = btcrpass.loaded_wallet
+            btcrpass.loaded_wallet = MultiFileSeedlistWallet()
+            try:
+                for extra_args, expected_seeds in (((), seeds), (("--skip", "5"), seeds[5:]),
+                                                   (("--worker", "2/3"), seeds[1::3])):
+                    btcrpass.parse_arguments(["--passwordlist", os.path.join(temp_dir, "seeds_0000.bin"),
+                                              "--listpass", "--seedgenerator"] + list(extra_args),
+                                             disable_security_warning_param=True)
+                    self.assertTrue(btcrpass.password_space_is_seekable())
+                    pwl_it, skipped = btcrpass.password_generator_factory(sys.maxsize)
+                    self.assertEqual(list(pwl_it), [expected_seeds])
+                    btcrpass.packed_seedlist.close()
+            finally:
+                btcrpass.loaded_wallet = saved_wallet
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_seedlist_allpositional(self):
         self.tokenlist_tester("tokenlist-allpositional.txt", [[['elbow', 'text', 'print', 'census', 'battle', 'push',
                                                                 'oyster', 'team', 'home', 'april', 'travel',
@@ -56,9 +56,10 @@ if __name__ == "__main__":
                         help="Append all found addresses to address.txt in the working directory while creating "
                              "addressDB (Useful for debugging, will slow down AddressDB creation and produce a "
                              "really big file, about 4x the size of the required AddressDB, about 32GB as of Jan 2020)")
-    parser.add_argument("--dblength", default=31,
+    parser.add_argument("--dblength",
                         help="The Maximum Number of Addresses the AddressDB can old, as a power of 2. "
-                             "Default = 31 ==> 2^31 Addresses. (Enough for BTC Blockchain @ April 2021",
+                             "Default = 31 ==> 2^31 Addresses. (Enough for BTC Blockchain @ April 2021, "
+                             "with --merge the default is the smallest --dblength of the merged AddressDBs)",
                         type=int)
     parser.add_argument("--first-block-file", default=0,
                         help="Start creating the AddressDB from a specific block file (Useful to keep DB size down)",
@@ -77,6 +78,20 @@ if __name__ == "__main__":
     parser.add_argument("--multifileinputlist", action="store_true",
                         help="Whether to try and load multiple sequential input list files "
                              "(incrementing the last 4 letters of file name from 0 to 9998)")
+    parser.add_argument("--merge", nargs="+", metavar="DBFILE",
+                        help="Merge these AddressDB files into --dbfilename instead of parsing block files, "
+                             "eg to combine AddressDBs for different coins (with one file, this resizes it to "
+                             "--dblength, which can't be larger than that of any of the merged AddressDBs)")
+    parser.add_argument("--threads", type=int, metavar="COUNT",
+                        help="number of processes used to parse block files or decode the --inputlistfile "
+                             "(default: number of logical CPU cores)")
+    parser.add_argument("--checkpoint-minutes", type=float, default=10, metavar="MINUTES",
+                        help="how often to save progress while parsing block files, so that if interrupted, "
+                             "--update can resume from there (default: 10)")
+    parser.add_argument("--filter-fpr", type=float, metavar="RATE",
+                        help="Also create a compact filter file (DBFILENAME.filter) with the given false positive "
+                             "rate, eg 0.01, which is used to avoid most lookups in the much larger database "
+                             "(Requires about 10 bits per address for a rate of 0.01, ~1GB for BTC)")
 
     args = parser.parse_args()
 
@@ -86,6 +101,12 @@ if __name__ == "__main__":
     if not args.update and not args.force and path.exists(args.dbfilename):
         sys.exit("Address database file already exists (use --update to update or --force to overwrite)")
 
+    if args.merge:
+        addressset.merge_address_dbs(args.dbfilename, args.merge, args.dblength, args.update, args.filter_fpr)
+        sys.exit(0)
+    if args.dblength is None:
+        args.dblength = 31
+
     if args.datadir:
         blockdir = args.datadir
     elif sys.platform == "win32":
@@ -101,4 +122,5 @@ if __name__ == "__main__":
     addressset.create_address_db(args.dbfilename, blockdir, args.dblength, args.blocks_startdate, args.blocks_enddate,
                                  args.first_block_file, args.dbyolo, args.addrs_to_text, args.update,
                                  progress_bar=not args.no_progress, addresslistfile=args.inputlistfile,
-                                 multiFile=args.multifileinputlist)
+                                 multiFile=args.multifileinputlist, filter_fpr=args.filter_fpr,
+                                 threads=args.threads, checkpoint_interval=args.checkpoint_minutes * 60)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+# run-benchmarks.py -- measures the single-core performance of each wallet type
+# Copyright (C) 2024 Stephen Rothery
+#
+# This file is part of btcrecover.
+#
+# btcrecover is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version
+# 2 of the License, or (at your option) any later version.
+#
+# btcrecover is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/
+
+# If you find this program helpful, please consider a small
+# donation to the developer at the following Bitcoin address:
+#
+#           3Au8ZodNHPei7MQiSVAWb7NB2yqsb48GW4
+#
+#                      Thank You!
+
+import sys
+
+from btcrecover import benchmarks
+
+if __name__ == "__main__":
+    sys.exit(benchmarks.main(sys.argv[1:]))